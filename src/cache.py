@@ -0,0 +1,70 @@
+"""In-process caches shared by the bot modules."""
+
+import time
+from collections import OrderedDict
+
+# Sentinel so that cached falsy values (False, None, "") are still hits
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL.
+
+    The cache is meant to be used from the event loop thread and does no
+    locking of its own. Hit and miss counts are kept so the effect of the
+    cache can be observed.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Default time to live in seconds, None for entries that never expire
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=_MISSING):
+        """Store a value, optionally overriding the default TTL for this entry."""
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single entry if present."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        self._data.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+    def __contains__(self, key):
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,86 @@
+"""Packing of long, line-based texts into Telegram-sized messages."""
+
+# Telegram rejects message texts longer than 4096 characters, counted in UTF-16 code units
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def message_length(text):
+    """Length of a text as Telegram counts it (emoji outside the BMP count twice)."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _split_long_line(line, limit):
+    """Cut a single line that does not fit into one message into pieces that do."""
+    # Every character is at most two UTF-16 code units
+    step = max(1, limit // 2)
+    return [line[i:i + step] for i in range(0, len(line), step)]
+
+
+async def iter_chunks(lines, limit=TELEGRAM_MESSAGE_LIMIT, continuation_header=""):
+    """Pack lines into message texts of at most ``limit`` characters.
+
+    Lines are consumed lazily from a sync or async iterable and never split
+    unless a single line is longer than a message. A chunk is yielded as soon
+    as the next line would not fit, so the caller can send it while the rest
+    is still being rendered.
+
+    Args:
+        lines: Iterable or async iterable of text pieces, each ending with its own newline
+        limit: Maximum message length
+        continuation_header: Text put in front of every chunk after the first
+
+    Yields:
+        str: Message texts; whitespace-only chunks are dropped
+    """
+    header = ""  # the first message has no continuation header
+    parts = []
+    size = 0  # length of parts, without the header
+    room = limit
+    # Long lines are cut to fit even a message that carries the header
+    max_line = limit - message_length(continuation_header)
+
+    async for line in _aiter(lines):
+        pieces = _split_long_line(line, max_line) if message_length(line) > max_line else [line]
+        for piece in pieces:
+            piece_size = message_length(piece)
+            if parts and size + piece_size > room:
+                text = header + "".join(parts)
+                if text.strip():
+                    yield text
+                header = continuation_header
+                room = limit - message_length(header)
+                parts, size = [], 0
+            parts.append(piece)
+            size += piece_size
+
+    if parts:
+        text = header + "".join(parts)
+        if text.strip():
+            yield text
+
+
+async def _aiter(lines):
+    """Iterate a sync or async iterable asynchronously."""
+    if hasattr(lines, '__aiter__'):
+        async for line in lines:
+            yield line
+    else:
+        for line in lines:
+            yield line
+
+
+async def send_chunked(send, lines, limit=TELEGRAM_MESSAGE_LIMIT, continuation_header=""):
+    """Send lines as a series of messages, each one as soon as it is full.
+
+    Args:
+        send: Coroutine function called with the text of each message
+        lines: Iterable or async iterable of lines (see iter_chunks)
+
+    Returns:
+        int: Number of messages sent
+    """
+    sent = 0
+    async for chunk in iter_chunks(lines, limit, continuation_header):
+        await send(chunk)
+        sent += 1
+    return sent
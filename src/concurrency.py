@@ -0,0 +1,113 @@
+"""Concurrent update processing that keeps each user's updates in order."""
+
+import asyncio
+import logging
+from collections import deque
+
+from telegram import Update
+from telegram.ext import Application
+# Private to python-telegram-bot: the fetcher below replaces Application._update_fetcher
+# and must recognize its stop signal. requirements.txt pins the exact version this
+# was written against; fail at import rather than losing updates on another one.
+from telegram.ext._application import _STOP_SIGNAL
+
+from profiling import profiler
+
+if not callable(getattr(Application, '_update_fetcher', None)):
+    raise ImportError("OrderedApplication needs Application._update_fetcher of python-telegram-bot 20.0")
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def update_key(update):
+    """Return the key whose updates must be processed in order: the user, else the chat."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class OrderedApplication(Application):
+    """Application that processes updates of different users concurrently.
+
+    Used together with ``ApplicationBuilder.concurrent_updates()``, which sets
+    how many updates may be processed at once. Updates are routed into a queue
+    per user before a processing slot is taken: only the update at the head of
+    a user's queue waits for a slot, the ones behind it wait in the queue. So
+    e.g. two results sent in quick succession are compared and saved one after
+    the other, and a user with a backlog holds at most one slot while other
+    users' updates keep flowing.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.user_queues = {}  # key -> deque of (update, future) waiting behind the running one
+        # Processing slots; taken by the update at the head of each user's queue
+        self._slots = asyncio.BoundedSemaphore(max(1, self.concurrent_updates))
+
+    def dispatch(self, update):
+        """Schedule an update for processing in its user's order.
+
+        Returns:
+            asyncio.Future: Resolved once the update has been processed
+        """
+        done = asyncio.get_running_loop().create_future()
+        key = update_key(update)
+        if key is None:
+            self.create_task(self._process_one(update, done), update=update)
+        elif key in self.user_queues:
+            self.user_queues[key].append((update, done))
+        else:
+            self.user_queues[key] = deque()
+            self.create_task(self._process_user(key, update, done), update=update)
+        return done
+
+    async def _process_one(self, update, done):
+        try:
+            async with self._slots:
+                await self.process_update(update)
+        finally:
+            if not done.done():
+                done.set_result(None)
+
+    async def _process_user(self, key, update, done):
+        """Process a user's updates one after the other until their queue is empty."""
+        pending = self.user_queues[key]
+        try:
+            while True:
+                await self._process_one(update, done)
+                if not pending:
+                    break
+                update, done = pending.popleft()
+        finally:
+            del self.user_queues[key]
+            # Only reached with updates left if the task was cancelled
+            for _, waiting in pending:
+                waiting.cancel()
+
+    async def process_update(self, update: object) -> None:
+        await super().process_update(update)
+        # Sessions started with /profile_start can stop after a number of updates
+        profiler.update_processed()
+
+    async def _update_fetcher(self) -> None:
+        # Same as Application._update_fetcher, but hands updates to dispatch()
+        # instead of starting one task per update that competes for a slot
+        if not self.concurrent_updates:
+            await super()._update_fetcher()
+            return
+        while True:
+            update = await self.update_queue.get()
+            if update is _STOP_SIGNAL:
+                logger.debug("Dropping pending updates")
+                while not self.update_queue.empty():
+                    self.update_queue.task_done()
+                # For the _STOP_SIGNAL
+                self.update_queue.task_done()
+                return
+            done = self.dispatch(update)
+            done.add_done_callback(lambda _: self.update_queue.task_done())
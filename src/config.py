@@ -10,11 +10,94 @@ load_dotenv()
 # Bot configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
+# Bot API server the token is appended to; point it at tools/fake_bot_api.py for offline tests
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "https://api.telegram.org/bot")
+
+# Updates processed at the same time (updates of one user always run in order); 0 = one by one
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+
+# Outbound message pacing (Telegram allows ~30 messages/s overall and ~20 messages/min per group)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))  # per second
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", "20"))  # per minute
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+# Leaderboard publication: groups sent to at once, send attempts per group and the
+# first retry delay in seconds (doubled after every failed attempt)
+PUBLISH_CONCURRENCY = int(os.getenv("PUBLISH_CONCURRENCY", "5"))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "4"))
+PUBLISH_RETRY_BASE_DELAY = float(os.getenv("PUBLISH_RETRY_BASE_DELAY", "1"))
+# When the results are reset after publishing: 'any' group, 'all' groups or a 'majority' of groups reached
+PUBLISH_DELIVERY_POLICY = os.getenv("PUBLISH_DELIVERY_POLICY", "any").strip().lower()
+
+# How updates are received: 'polling' (default) or 'webhook'
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Webhook listener. Telegram is told to post to WEBHOOK_URL + "/" + WEBHOOK_PATH,
+# e.g. a reverse proxy at https://bot.example.com forwarding to WEBHOOK_LISTEN:WEBHOOK_PORT
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Checked against the X-Telegram-Bot-Api-Secret-Token header of every request;
+# a random token is generated at startup when unset and written to WEBHOOK_SECRET_FILE
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
 
 # Database configuration
 DATA_DIR = os.environ.get('DATA_DIR', './data')
 os.makedirs(DATA_DIR, exist_ok=True)
 DB_PATH = os.path.join(DATA_DIR, 'scoreboard.db')
+CONSENT_DB_PATH = os.path.join(DATA_DIR, 'consent.db')
+MEMBERSHIP_DB_PATH = os.path.join(DATA_DIR, 'membership.db')
+# Results of all finished seasons, including the scoreboard_YYYY-MM-DD.db files of older versions
+ARCHIVE_DB_PATH = os.path.join(DATA_DIR, 'archive.db')
+# Generated webhook secret of the running bot, read by tools/webhook_sender.py
+WEBHOOK_SECRET_FILE = os.path.join(DATA_DIR, 'webhook_secret')
+
+# SQLite connection profile shared by all database modules
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '-8000'))  # negative value = KiB
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', '4'))
+SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get('SQLITE_STATEMENT_CACHE_SIZE', '128'))
+# Threads that run blocking database calls on behalf of the async handlers
+DB_EXECUTOR_THREADS = int(os.environ.get('DB_EXECUTOR_THREADS', str(SQLITE_READ_POOL_SIZE + 1)))
+
+# How often (seconds) the bot checks whether the publish script started a new season
+SEASON_CHECK_INTERVAL = int(os.environ.get('SEASON_CHECK_INTERVAL', '10'))
+
+# Online backups of scoreboard.db and consent.db
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join(DATA_DIR, 'backups'))
+BACKUP_INTERVAL_HOURS = float(os.environ.get('BACKUP_INTERVAL_HOURS', '24'))  # 0 disables scheduled backups
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', '14'))  # snapshots kept per database
+BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', '100'))
+BACKUP_STEP_PAUSE_MS = int(os.environ.get('BACKUP_STEP_PAUSE_MS', '5'))
+
+# Prometheus-text metrics endpoint at http://METRICS_LISTEN:METRICS_PORT/metrics; port 0 disables it
+METRICS_LISTEN = os.environ.get('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9108'))
+
+# Profiles taken with /profile_start; a session never runs longer than PROFILE_MAX_SECONDS
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+PROFILE_DEFAULT_SECONDS = int(os.environ.get('PROFILE_DEFAULT_SECONDS', '30'))
+PROFILE_MAX_SECONDS = int(os.environ.get('PROFILE_MAX_SECONDS', '600'))
+
+# Write-behind queue for result submissions: a batch is committed once it holds
+# WRITE_BATCH_SIZE submissions or WRITE_FLUSH_INTERVAL_MS after its first one
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', '64'))
+WRITE_FLUSH_INTERVAL_MS = int(os.environ.get('WRITE_FLUSH_INTERVAL_MS', '5'))
+WRITE_QUEUE_SIZE = int(os.environ.get('WRITE_QUEUE_SIZE', '1000'))
+# A submission is acknowledged once its batch is durable: batch commits are
+# fsynced at this level even when SQLITE_SYNCHRONOUS is NORMAL
+WRITE_BATCH_SYNCHRONOUS = os.environ.get('WRITE_BATCH_SYNCHRONOUS', 'FULL')
+
+# Group membership cache (seconds / entries)
+MEMBERSHIP_POSITIVE_TTL = int(os.environ.get('MEMBERSHIP_POSITIVE_TTL', '600'))
+MEMBERSHIP_NEGATIVE_TTL = int(os.environ.get('MEMBERSHIP_NEGATIVE_TTL', '60'))
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', '10000'))
+# Upper bound for a single group's membership request
+MEMBERSHIP_CHECK_TIMEOUT = float(os.environ.get('MEMBERSHIP_CHECK_TIMEOUT', '5'))
 
 # Ensure critical values are set
 if not BOT_TOKEN:
@@ -22,3 +105,15 @@ if not BOT_TOKEN:
 
 if not CHAT_ID:
     logging.critical("CHAT_ID not found in environment variables!")
+
+if BOT_MODE not in ("polling", "webhook"):
+    logging.critical(f"Unknown BOT_MODE '{BOT_MODE}', expected 'polling' or 'webhook'")
+
+if PUBLISH_DELIVERY_POLICY not in ("any", "all", "majority"):
+    logging.critical(f"Unknown PUBLISH_DELIVERY_POLICY '{PUBLISH_DELIVERY_POLICY}', expected 'any', 'all' or 'majority'")
+
+if PUBLISH_MAX_ATTEMPTS < 1:
+    logging.critical(f"PUBLISH_MAX_ATTEMPTS is {PUBLISH_MAX_ATTEMPTS}, every group gets a single attempt")
+
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    logging.critical("BOT_MODE is 'webhook' but WEBHOOK_URL is not set!")
@@ -4,28 +4,130 @@ from .consent_db import (
     init_consent_db,
     save_user_consent,
     check_user_consent,
-    revoke_user_consent
+    revoke_user_consent,
+    get_child_status_map,
+    get_consent_user,
+    update_child_status
 )
 
 from .results_db import (
     create_database,
     add_user_result,
+    submit_user_result,
+    submit_user_results,
+    SubmitResult,
+    SUBMIT_CREATED,
+    SUBMIT_IMPROVED,
+    SUBMIT_UNCHANGED,
+    SUBMIT_WORSE,
     get_user_result,
+    get_submission_history,
     validate_input,
     get_all_results,
+    delete_user_result,
+    has_results,
+    get_bracket_results,
+    load_rank_index,
+    get_current_season,
+    start_new_season,
+    check_season,
+    get_user_bracket,
+    get_user_rank,
+    BRACKET_PRO,
+    BRACKET_ADVANCED,
+    BRACKET_AMATEUR,
+    BRACKET_CHILDREN,
     format_display_name  # Import from results_db.py instead of defining here
 )
 
+from .rank_index import get_bracket, BRACKETS
+
+from .membership_db import (
+    init_membership_db,
+    get_member_status,
+    is_chat_tracked
+)
+
+from .archive_db import (
+    init_archive_db,
+    sync_archive,
+    get_user_seasons,
+    get_all_time_results
+)
+
+from .changes import get_results_version, bump_results_version
+
+from .connection import get_manager, close_connections
+
+from .backup import run_backup, BackupResult
+
+from .executor import run_in_db_thread, shutdown_db_executor
+
+from .write_queue import write_queue
+
+from .async_api import (
+    results,
+    consent,
+    membership,
+    archive
+)
+
 # Export all functions
 __all__ = [
     'init_consent_db',
     'save_user_consent',
     'check_user_consent',
     'revoke_user_consent',
+    'get_child_status_map',
+    'get_consent_user',
+    'update_child_status',
     'create_database',
     'add_user_result',
+    'submit_user_result',
+    'submit_user_results',
+    'SubmitResult',
+    'SUBMIT_CREATED',
+    'SUBMIT_IMPROVED',
+    'SUBMIT_UNCHANGED',
+    'SUBMIT_WORSE',
     'get_user_result',
+    'get_submission_history',
     'validate_input',
     'get_all_results',
-    'format_display_name'
+    'delete_user_result',
+    'has_results',
+    'get_bracket_results',
+    'get_bracket',
+    'load_rank_index',
+    'get_current_season',
+    'start_new_season',
+    'check_season',
+    'get_user_bracket',
+    'get_user_rank',
+    'BRACKET_PRO',
+    'BRACKET_ADVANCED',
+    'BRACKET_AMATEUR',
+    'BRACKET_CHILDREN',
+    'BRACKETS',
+    'format_display_name',
+    'init_membership_db',
+    'get_member_status',
+    'is_chat_tracked',
+    'init_archive_db',
+    'sync_archive',
+    'get_user_seasons',
+    'get_all_time_results',
+    'get_results_version',
+    'bump_results_version',
+    'get_manager',
+    'close_connections',
+    'results',
+    'consent',
+    'membership',
+    'archive',
+    'run_in_db_thread',
+    'shutdown_db_executor',
+    'write_queue',
+    'run_backup',
+    'BackupResult'
 ]
@@ -0,0 +1,226 @@
+"""Module for the cross-season results archive.
+
+Older versions of the bot closed a season by renaming scoreboard.db to
+``scoreboard_YYYY-MM-DD.db``; newer ones keep finished seasons in the
+season_results table. sync_archive() copies both into one indexed archive
+database (archive.db) with ATTACH and INSERT ... SELECT, once per source.
+Historical queries then read archive.db, with scoreboard.db attached for the
+current season, in a single pass instead of opening every season file.
+
+Legacy files get season numbers counting down from 0 (newest first), so they
+sort before the seasons numbered by scoreboard.db.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from config import ARCHIVE_DB_PATH, DB_PATH, DATA_DIR, SQLITE_BUSY_TIMEOUT_MS
+from .connection import get_manager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Season files left behind by older versions: scoreboard_YYYY-MM-DD.db
+_LEGACY_FILE = re.compile(
+    rf"^{re.escape(os.path.splitext(os.path.basename(DB_PATH))[0])}_(\d{{4}}-\d{{2}}-\d{{2}})\.db$"
+)
+
+_SEASON_SOURCE_PREFIX = 'season:'
+
+# Current season's results next to the archived ones
+_ALL_SEASONS = '''
+    SELECT user_id, first_name, last_name, username, best_series, total_tens, season FROM archive_results
+    UNION ALL
+    SELECT user_id, first_name, last_name, username, best_series, total_tens,
+           (SELECT MAX(id) FROM scoreboard.seasons)
+    FROM scoreboard.user_results
+'''
+
+def _db():
+    """Return the shared connection manager for the archive database."""
+    # scoreboard.db is attached to the readers so queries can include the current season
+    return get_manager(ARCHIVE_DB_PATH, reader_attach={'scoreboard': DB_PATH})
+
+def init_archive_db():
+    """Create the archive tables if they don't exist."""
+    with _db().write() as conn:
+        # One row per imported season: a legacy file name or season:<n> of scoreboard.db
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive_sources (
+                source TEXT PRIMARY KEY,
+                season INTEGER NOT NULL UNIQUE,
+                ended_on TEXT,
+                results INTEGER NOT NULL,
+                imported_at INTEGER NOT NULL
+            )
+        ''')
+        # Final standings per season; the key serves per-user lookups across seasons
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive_results (
+                user_id INTEGER NOT NULL,
+                season INTEGER NOT NULL,
+                first_name TEXT,
+                last_name TEXT,
+                username TEXT,
+                best_series INTEGER,
+                total_tens INTEGER,
+                PRIMARY KEY (user_id, season)
+            ) WITHOUT ROWID
+        ''')
+    logger.info("Archive database initialized")
+
+def _connect():
+    """Open a dedicated connection for imports (ATTACH is not allowed inside the pooled transactions)."""
+    return sqlite3.connect(ARCHIVE_DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+
+def _import(conn, source, season, ended_on, select, params):
+    """Copy one season into the archive and record its source, in one transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        imported = conn.execute(f'''
+            INSERT OR REPLACE INTO archive_results
+                (user_id, season, first_name, last_name, username, best_series, total_tens)
+            {select}
+        ''', params).rowcount
+        conn.execute('''
+            INSERT INTO archive_sources (source, season, ended_on, results, imported_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (source, season, ended_on, imported, int(time.time())))
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return imported
+
+def _import_legacy_files(conn, data_dir):
+    """Import the scoreboard_YYYY-MM-DD.db files that are not archived yet."""
+    imported = {source for (source,) in conn.execute('SELECT source FROM archive_sources')}
+    files = sorted(
+        (match.group(1), filename)
+        for filename in os.listdir(data_dir)
+        for match in [_LEGACY_FILE.match(filename)] if match and filename not in imported
+    )
+    lowest = conn.execute(
+        'SELECT MIN(season) FROM archive_sources WHERE source NOT LIKE ?', (_SEASON_SOURCE_PREFIX + '%',)
+    ).fetchone()[0]
+    next_season = min(lowest, 1) - 1 if lowest is not None else 0
+
+    count = 0
+    # Newest first, so season numbers keep counting down into the past
+    for ended_on, filename in reversed(files):
+        path = os.path.join(data_dir, filename)
+        try:
+            conn.execute('ATTACH DATABASE ? AS legacy', (path,))
+        except sqlite3.Error as e:
+            logger.error(f"Could not open legacy season file {path}: {e}")
+            continue
+        try:
+            has_results = conn.execute(
+                "SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = 'user_results'"
+            ).fetchone()
+            if has_results:
+                select = '''
+                    SELECT user_id, ?, first_name, last_name, username, best_series, total_tens
+                    FROM legacy.user_results
+                '''
+            else:
+                # Recorded anyway so the file is not looked at again
+                select = 'SELECT NULL, ?, NULL, NULL, NULL, NULL, NULL WHERE 0'
+            rows = _import(conn, filename, next_season, ended_on, select, (next_season,))
+            logger.info(f"Archived {filename} as season {next_season} ({rows} results)")
+            next_season -= 1
+            count += 1
+        except sqlite3.Error as e:
+            logger.error(f"Could not archive legacy season file {path}: {e}")
+        finally:
+            conn.execute('DETACH DATABASE legacy')
+    return count
+
+def _import_closed_seasons(conn):
+    """Import the finished seasons of scoreboard.db that are not archived yet."""
+    conn.execute('ATTACH DATABASE ? AS scoreboard', (DB_PATH,))
+    try:
+        if not conn.execute(
+            "SELECT 1 FROM scoreboard.sqlite_master WHERE type = 'table' AND name = 'season_results'"
+        ).fetchone():
+            return 0
+        # A season ends when the next one starts; the latest season is still running
+        closed = conn.execute('''
+            SELECT s.id, (SELECT MIN(n.started_at) FROM scoreboard.seasons n WHERE n.id > s.id) AS ended_at
+            FROM scoreboard.seasons s
+            WHERE s.id < (SELECT MAX(id) FROM scoreboard.seasons)
+              AND ? || s.id NOT IN (SELECT source FROM archive_sources)
+            ORDER BY s.id
+        ''', (_SEASON_SOURCE_PREFIX,)).fetchall()
+        for season, ended_at in closed:
+            ended_on = datetime.fromtimestamp(ended_at).strftime('%Y-%m-%d')
+            rows = _import(conn, f"{_SEASON_SOURCE_PREFIX}{season}", season, ended_on, '''
+                SELECT user_id, season, first_name, last_name, username, best_series, total_tens
+                FROM scoreboard.season_results WHERE season = ?
+            ''', (season,))
+            logger.info(f"Archived season {season} ({rows} results)")
+        return len(closed)
+    finally:
+        conn.execute('DETACH DATABASE scoreboard')
+
+def sync_archive(data_dir=DATA_DIR):
+    """Bring the archive up to date with the legacy season files and closed seasons.
+
+    Every source is imported once; running it again only picks up what is new.
+
+    Returns:
+        int: Number of seasons imported
+    """
+    init_archive_db()
+    conn = _connect()
+    try:
+        imported = _import_legacy_files(conn, data_dir) + _import_closed_seasons(conn)
+    finally:
+        conn.close()
+    if imported:
+        logger.info(f"Archive synced: {imported} new season(s)")
+    return imported
+
+def get_user_seasons(user_id):
+    """Get a user's result in every season they took part in, newest season first.
+
+    Returns:
+        list: (season, ended_on, best_series, total_tens) rows; ended_on is None for the current season
+    """
+    with _db().read() as conn:
+        return conn.execute('''
+            SELECT a.season, s.ended_on, a.best_series, a.total_tens
+            FROM archive_results a JOIN archive_sources s ON s.season = a.season
+            WHERE a.user_id = ?
+            UNION ALL
+            SELECT (SELECT MAX(id) FROM scoreboard.seasons), NULL, best_series, total_tens
+            FROM scoreboard.user_results WHERE user_id = ?
+            ORDER BY 1 DESC
+        ''', (user_id, user_id)).fetchall()
+
+def get_all_time_results(limit=None):
+    """Get every user's best result across all seasons, best first.
+
+    Returns:
+        list: (user_id, first_name, last_name, username, best_series, total_tens, season, seasons)
+              rows, where season is the one the best result was set in and seasons is the
+              number of seasons the user took part in
+    """
+    with _db().read() as conn:
+        return conn.execute(f'''
+            SELECT user_id, first_name, last_name, username, best_series, total_tens, season, seasons
+            FROM (
+                SELECT *,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY user_id ORDER BY best_series DESC, total_tens DESC, season DESC
+                       ) AS place,
+                       COUNT(*) OVER (PARTITION BY user_id) AS seasons
+                FROM ({_ALL_SEASONS})
+            )
+            WHERE place = 1
+            ORDER BY best_series DESC, total_tens DESC, user_id
+            LIMIT ?
+        ''', (-1 if limit is None else limit,)).fetchall()
@@ -0,0 +1,171 @@
+"""Async data-access API used by the bot handlers.
+
+SQLite calls block, so they must never run on the event loop thread. Every
+method below hands the synchronous database function to a dedicated pool of
+DB threads (see database.executor) and awaits the result, e.g.
+``await results.get(user_id)``. Result submissions go through the
+write-behind queue in database.write_queue.
+"""
+
+import logging
+
+from . import results_db, consent_db, membership_db, archive_db
+from .executor import run_in_db_thread, run_named_in_db_thread
+from .write_queue import write_queue
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+async def _stream_pages(pages, name):
+    """Iterate the rows of a blocking page generator, fetching each page in the DB executor.
+
+    Args:
+        pages: Generator of row pages, e.g. results_db.iter_all_results()
+        name: Name the page fetches are recorded under in the metrics
+    """
+    while True:
+        page = await run_named_in_db_thread(name, next, pages, None)
+        if page is None:
+            return
+        for row in page:
+            yield row
+
+
+class ResultsStore:
+    """Async wrappers around database.results_db."""
+
+    async def get(self, user_id):
+        return await run_in_db_thread(results_db.get_user_result, user_id)
+
+    async def all(self):
+        return await run_in_db_thread(results_db.get_all_results)
+
+    async def exists(self):
+        return await run_in_db_thread(results_db.has_results)
+
+    async def bracket(self, bracket, limit=None):
+        return await run_in_db_thread(results_db.get_bracket_results, bracket, limit)
+
+    def stream_all(self):
+        """Async iterator over all results, best first, read page by page."""
+        return _stream_pages(results_db.iter_all_results(), 'iter_all_results')
+
+    def stream_bracket(self, bracket, limit=None):
+        """Async iterator over the results of a bracket, best first, read page by page."""
+        return _stream_pages(results_db.iter_bracket_results(bracket, limit), 'iter_bracket_results')
+
+    async def history(self, user_id, before=None, limit=10):
+        return await run_in_db_thread(results_db.get_submission_history, user_id, before, limit)
+
+    async def bracket_of(self, user_id):
+        # Served from the in-memory rank index, no DB access needed
+        return results_db.get_user_bracket(user_id)
+
+    async def rank(self, user_id):
+        # Served from the in-memory rank index, no DB access needed
+        return results_db.get_user_rank(user_id)
+
+    async def add(self, user_id, first_name, last_name, username, best_series, total_tens):
+        return await run_in_db_thread(
+            results_db.add_user_result,
+            user_id, first_name, last_name, username, best_series, total_tens
+        )
+
+    async def submit(self, user_id, first_name, last_name, username, best_series, total_tens):
+        # Group-committed with other pending submissions by the write-behind queue
+        return await write_queue.submit(user_id, first_name, last_name, username, best_series, total_tens)
+
+    async def check_season(self):
+        return await run_in_db_thread(results_db.check_season)
+
+    async def refresh_season(self):
+        """Pick up a season rollover made by another process, archiving the closed season.
+
+        Called before answering from the rank index or the leaderboard cache, so
+        a new season shows at once. Costs one indexed read while nothing changed.
+
+        Returns:
+            bool: True if a new season was picked up
+        """
+        if not await run_in_db_thread(results_db.check_season):
+            return False
+        try:
+            await run_in_db_thread(archive_db.sync_archive)
+        except Exception as e:
+            # The next pickup or restart syncs again; the new season is served either way
+            logger.error(f"Archiving the closed season failed: {e}")
+        return True
+
+    async def start_new_season(self):
+        return await run_in_db_thread(results_db.start_new_season)
+
+    async def delete(self, user_id):
+        return await run_in_db_thread(results_db.delete_user_result, user_id)
+
+
+class ConsentStore:
+    """Async wrappers around database.consent_db.
+
+    Consent and child lookups are served from the in-memory consent registry,
+    so they are answered directly without a trip to the DB executor.
+    """
+
+    async def check(self, user_id):
+        return consent_db.check_user_consent(user_id)
+
+    async def save(self, user_id, username, first_name):
+        return await run_in_db_thread(consent_db.save_user_consent, user_id, username, first_name)
+
+    async def revoke(self, user_id):
+        return await run_in_db_thread(consent_db.revoke_user_consent, user_id)
+
+    async def is_child(self, user_id):
+        return consent_db.is_child_user(user_id)
+
+    async def child_ids(self):
+        return consent_db.get_all_child_user_ids()
+
+    async def child_status_map(self):
+        return consent_db.get_child_status_map()
+
+    async def get_user(self, user_id):
+        return await run_in_db_thread(consent_db.get_consent_user, user_id)
+
+    async def set_child_status(self, user_id, is_child):
+        return await run_in_db_thread(consent_db.update_child_status, user_id, is_child)
+
+
+class MembershipStore:
+    """Async wrappers around the write side of database.membership_db.
+
+    Lookups are served from memory and can be called directly.
+    """
+
+    async def record(self, chat_id, user_id, is_member):
+        return await run_in_db_thread(membership_db.record_member_status, chat_id, user_id, is_member)
+
+    async def track_chat(self, chat_id):
+        return await run_in_db_thread(membership_db.track_chat, chat_id)
+
+    async def untrack_chat(self, chat_id):
+        return await run_in_db_thread(membership_db.untrack_chat, chat_id)
+
+
+class ArchiveStore:
+    """Async wrappers around database.archive_db."""
+
+    async def seasons_of(self, user_id):
+        return await run_in_db_thread(archive_db.get_user_seasons, user_id)
+
+    async def all_time(self, limit=None):
+        return await run_in_db_thread(archive_db.get_all_time_results, limit)
+
+    async def sync(self):
+        return await run_in_db_thread(archive_db.sync_archive)
+
+
+results = ResultsStore()
+consent = ConsentStore()
+membership = MembershipStore()
+archive = ArchiveStore()
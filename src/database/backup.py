@@ -0,0 +1,149 @@
+"""Online backups of the bot databases.
+
+Snapshots are taken with SQLite's backup API on a dedicated connection,
+copying a few pages per step and pausing between steps, so the running bot
+keeps reading and writing while a backup is in progress. The copy is taken
+from a single read snapshot, so it is consistent as of the moment it started. Each snapshot is
+written to a temporary file, checked with ``PRAGMA integrity_check`` and only
+then moved into the backup directory. Older snapshots beyond the retention
+count are deleted.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from config import (
+    DB_PATH,
+    CONSENT_DB_PATH,
+    BACKUP_DIR,
+    BACKUP_KEEP,
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_STEP_PAUSE_MS,
+    SQLITE_BUSY_TIMEOUT_MS
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Databases that are backed up, by backup name
+BACKUP_SOURCES = {
+    'scoreboard': DB_PATH,
+    'consent': CONSENT_DB_PATH
+}
+
+# Outcome of backing up one database
+BackupResult = namedtuple('BackupResult', ['name', 'path', 'size', 'seconds', 'ok', 'error'])
+
+# Only one backup run at a time (scheduled and admin-triggered runs may overlap)
+_backup_lock = threading.Lock()
+
+
+def backup_database(name, source_path, backup_dir=BACKUP_DIR, pages=BACKUP_PAGES_PER_STEP,
+                    pause_ms=BACKUP_STEP_PAUSE_MS):
+    """Take an online snapshot of one database file and verify it.
+
+    Args:
+        name: Backup name, used as the file name prefix
+        source_path: Database file to back up
+        backup_dir: Directory the snapshot is written to
+        pages: Pages copied per step
+        pause_ms: Pause between steps, giving the bot's writers room
+
+    Returns:
+        BackupResult: Outcome of the backup
+    """
+    started = time.monotonic()
+    os.makedirs(backup_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(backup_dir, f"{name}-{timestamp}.db")
+    tmp_path = path + '.tmp'
+
+    def pause(status, remaining, total):
+        if pause_ms and remaining:
+            time.sleep(pause_ms / 1000)
+
+    source = target = None
+    try:
+        # A dedicated connection, so the pooled connections stay available to the bot
+        source = sqlite3.connect(source_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        target = sqlite3.connect(tmp_path)
+        # Pin one WAL snapshot for the whole copy: without it every commit by the
+        # bot restarts the backup, which then never finishes under steady writes
+        source.execute('BEGIN')
+        source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=max(1, pages), progress=pause)
+        source.execute('COMMIT')
+
+        check = target.execute('PRAGMA integrity_check').fetchone()[0]
+        if check != 'ok':
+            raise sqlite3.DatabaseError(f"integrity check failed: {check}")
+        target.close()
+        target = None
+
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        seconds = time.monotonic() - started
+        logger.info(f"Backed up {source_path} to {path} ({size} bytes in {seconds:.2f} s)")
+        return BackupResult(name, path, size, seconds, True, None)
+    except Exception as e:
+        logger.error(f"Backup of {source_path} failed: {e}")
+        return BackupResult(name, None, 0, time.monotonic() - started, False, str(e))
+    finally:
+        if target is not None:
+            target.close()
+        if source is not None:
+            source.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune_backups(name, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Delete the oldest snapshots of a database beyond the newest ``keep``.
+
+    Returns:
+        list: Paths of the deleted snapshots
+    """
+    if keep <= 0 or not os.path.isdir(backup_dir):
+        return []
+    # The timestamp in the file name sorts chronologically
+    snapshots = sorted(
+        f for f in os.listdir(backup_dir)
+        if f.startswith(f"{name}-") and f.endswith('.db')
+    )
+    removed = []
+    for filename in snapshots[:-keep]:
+        path = os.path.join(backup_dir, filename)
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            logger.warning(f"Could not remove old backup {path}: {e}")
+    return removed
+
+
+def run_backup():
+    """Back up every database in BACKUP_SOURCES and apply the retention.
+
+    Returns:
+        list: One BackupResult per database, or None if a backup is already running
+    """
+    if not _backup_lock.acquire(blocking=False):
+        logger.info("Backup already running, skipping")
+        return None
+    try:
+        backup_results = []
+        for name, source_path in BACKUP_SOURCES.items():
+            result = backup_database(name, source_path)
+            backup_results.append(result)
+            if result.ok:
+                removed = prune_backups(name)
+                if removed:
+                    logger.info(f"Removed {len(removed)} old {name} backup(s)")
+        return backup_results
+    finally:
+        _backup_lock.release()
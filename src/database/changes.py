@@ -0,0 +1,16 @@
+"""Change counter for the data that rendered leaderboards depend on."""
+
+import threading
+
+_results_version = 0
+_lock = threading.Lock()
+
+def bump_results_version():
+    """Record that results or bracket membership changed."""
+    global _results_version
+    with _lock:
+        _results_version += 1
+
+def get_results_version():
+    """Return the current results version; cached views built for an older one are stale."""
+    return _results_version
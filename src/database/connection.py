@@ -0,0 +1,205 @@
+"""Shared, long-lived SQLite connections for the database modules."""
+
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import (
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_READ_POOL_SIZE,
+    SQLITE_STATEMENT_CACHE_SIZE
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# One manager per database file, shared by the whole process
+_managers = {}
+_managers_lock = threading.Lock()
+
+# Values accepted by the pragmas that take a keyword; they are built into the
+# statement text, since pragma values cannot be bound as parameters
+JOURNAL_MODES = frozenset({'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'})
+SYNCHRONOUS_LEVELS = frozenset({'OFF', 'NORMAL', 'FULL', 'EXTRA', '0', '1', '2', '3'})
+
+
+def pragma_keyword(name, value, allowed):
+    """Return a pragma keyword in upper case, checked against its allowed values.
+
+    Raises:
+        ValueError: If the value is not one of the allowed keywords
+    """
+    keyword = str(value).strip().upper()
+    if keyword not in allowed:
+        raise ValueError(f"Invalid {name} '{value}', expected one of {', '.join(sorted(allowed))}")
+    return keyword
+
+
+def _default_synchronous():
+    return pragma_keyword('SQLITE_SYNCHRONOUS', SQLITE_SYNCHRONOUS, SYNCHRONOUS_LEVELS)
+
+
+class ConnectionManager:
+    """Holds one writer connection and a small pool of reader connections.
+
+    Connections are opened lazily, configured once with the pragma profile
+    from config and then reused for the lifetime of the process. Each
+    connection keeps its own prepared statement cache (``cached_statements``),
+    so the SQL strings used by the database modules are only compiled once.
+    """
+
+    def __init__(self, path, read_pool_size=SQLITE_READ_POOL_SIZE, reader_attach=None):
+        """
+        Args:
+            path: Database file
+            read_pool_size: Maximum number of reader connections
+            reader_attach: Optional mapping of schema name to database file, ATTACHed to
+                every reader connection. The writer never attaches it: BEGIN IMMEDIATE
+                would also take the write lock of every attached file.
+        """
+        self.path = path
+        self.read_pool_size = max(1, read_pool_size)
+        self.reader_attach = dict(reader_attach or {})
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._idle_readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+
+    def _open(self, read_only=False):
+        """Open and configure a new connection to the database file."""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,  # transactions are managed explicitly in write()
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE
+        )
+        journal_mode = pragma_keyword('SQLITE_JOURNAL_MODE', SQLITE_JOURNAL_MODE, JOURNAL_MODES)
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute(f"PRAGMA synchronous={_default_synchronous()}")
+        conn.execute(f"PRAGMA cache_size={int(SQLITE_CACHE_SIZE)}")
+        conn.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            for schema, attached_path in self.reader_attach.items():
+                conn.execute("ATTACH DATABASE ? AS " + schema, (attached_path,))
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Borrow a reader connection from the pool.
+
+        Blocks until a reader is free once ``read_pool_size`` connections are open.
+        """
+        conn = None
+        try:
+            conn = self._idle_readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                if self._reader_count < self.read_pool_size:
+                    self._reader_count += 1
+                    try:
+                        conn = self._open(read_only=True)
+                    except Exception:
+                        self._reader_count -= 1
+                        raise
+        if conn is None:
+            conn = self._idle_readers.get()
+
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put(conn)
+
+    @property
+    def write_lock(self):
+        """The lock write() holds for its transaction.
+
+        Hold it around a write() block to do follow-up work after the commit,
+        e.g. updating in-memory state, in the same order as the commits.
+        """
+        return self._write_lock
+
+    @contextmanager
+    def write(self, synchronous=None):
+        """Run a block inside a transaction on the single writer connection.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises.
+
+        Args:
+            synchronous: Optional ``PRAGMA synchronous`` level for this transaction
+                only, e.g. ``FULL`` to fsync the commit before returning
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            if synchronous is not None:
+                synchronous = pragma_keyword('synchronous', synchronous, SYNCHRONOUS_LEVELS)
+                conn.execute(f"PRAGMA synchronous={synchronous}")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                else:
+                    conn.commit()
+            finally:
+                if synchronous is not None:
+                    conn.execute(f"PRAGMA synchronous={_default_synchronous()}")
+
+    def close(self):
+        """Checkpoint the WAL and close every open connection."""
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    logger.warning(f"WAL checkpoint failed for {self.path}: {e}")
+                self._writer.close()
+                self._writer = None
+        with self._pool_lock:
+            while True:
+                try:
+                    self._idle_readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reader_count = 0
+
+
+def get_manager(path, reader_attach=None):
+    """Return the process-wide connection manager for a database file.
+
+    ``reader_attach`` only takes effect when the manager is first created.
+    """
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = ConnectionManager(path, reader_attach=reader_attach)
+            _managers[path] = manager
+        return manager
+
+
+def close_connections(path=None):
+    """Close the pooled connections of one database file, or of all of them."""
+    with _managers_lock:
+        if path is None:
+            managers = list(_managers.values())
+            _managers.clear()
+        else:
+            manager = _managers.pop(path, None)
+            managers = [manager] if manager else []
+    for manager in managers:
+        manager.close()
+        logger.info(f"Closed database connections for {manager.path}")
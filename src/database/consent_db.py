@@ -1,48 +1,136 @@
-"""Module for managing user consent data."""
+"""Module for managing user consent data.
+
+Consent and child flags are loaded into memory once and served from there;
+every change is written to consent.db first and then applied to memory.
+The registry lock is never held while waiting for SQLite.
+"""
 
-import os
-import sqlite3
 import logging
+import threading
+from config import CONSENT_DB_PATH
+from .connection import get_manager
+from .rank_index import rank_index
+from .changes import bump_results_version
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Get data directory from environment variable or use default
-DATA_DIR = os.environ.get('DATA_DIR', './data')
-os.makedirs(DATA_DIR, exist_ok=True)
-
 # Constants
-CONSENT_DB = os.path.join(DATA_DIR, 'consent.db')
+CONSENT_DB = CONSENT_DB_PATH
+
+# Per-user flag bits stored in the registry
+FLAG_CONSENT = 1
+FLAG_CHILD = 2
+
+
+class ConsentRegistry:
+    """In-memory copy of user_consent: one small int of flags per user."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._flags = {}
+        self._child_ids = set()  # children who have given consent
+        self._child_snapshot = None
+
+    def load(self, rows):
+        """Replace the registry contents with (user_id, consent_given, is_child) rows."""
+        with self.lock:
+            self._flags.clear()
+            self._child_ids.clear()
+            self._child_snapshot = None
+            for user_id, consent_given, is_child in rows:
+                self.set_flags(user_id, (FLAG_CONSENT if consent_given == 1 else 0)
+                               | (FLAG_CHILD if is_child == 1 else 0))
+            self.loaded = True
+
+    def get_flags(self, user_id):
+        return self._flags.get(user_id, 0)
+
+    def has_user(self, user_id):
+        return user_id in self._flags
+
+    def set_flags(self, user_id, flags):
+        with self.lock:
+            self._flags[user_id] = flags
+            was_child = user_id in self._child_ids
+            is_child = bool(flags & FLAG_CONSENT and flags & FLAG_CHILD)
+            if is_child == was_child:
+                return
+            if is_child:
+                self._child_ids.add(user_id)
+            else:
+                self._child_ids.discard(user_id)
+            self._child_snapshot = None
+            # Keep the leaderboard rank index in the right bracket
+            rank_index.set_child(user_id, is_child)
+            bump_results_version()
+
+    def child_ids(self):
+        """Return the consenting children as an immutable set."""
+        with self.lock:
+            if self._child_snapshot is None:
+                self._child_snapshot = frozenset(self._child_ids)
+            return self._child_snapshot
+
+    def child_status_map(self):
+        with self.lock:
+            return {user_id: bool(flags & FLAG_CHILD) for user_id, flags in self._flags.items()}
+
+
+_registry = ConsentRegistry()
+
+def _db():
+    """Return the shared connection manager for the consent database."""
+    return get_manager(CONSENT_DB)
+
+def _get_registry():
+    """Return the consent registry, loading it from consent.db on first use."""
+    if not _registry.loaded:
+        load_consent_registry()
+    return _registry
+
+def load_consent_registry():
+    """Load every user's consent and child flags from consent.db into memory."""
+    with _db().read() as conn:
+        rows = conn.execute(
+            'SELECT user_id, consent_given, is_child FROM user_consent'
+        ).fetchall()
+    _registry.load(rows)
+    logger.info(f"Consent registry loaded: {len(rows)} users")
 
 def init_consent_db():
     """Initialize the consent database tables."""
-    conn = sqlite3.connect(CONSENT_DB)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_consent (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            consent_given INTEGER,
-            is_child INTEGER DEFAULT 0,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with _db().write() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_consent (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                consent_given INTEGER,
+                is_child INTEGER DEFAULT 0,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Lets the leaderboard queries find the children bracket without a full scan
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_user_consent_children
+            ON user_consent (user_id) WHERE is_child = 1 AND consent_given = 1
+        ''')
+    load_consent_registry()
     logger.info("Consent database initialized")
 
 def save_user_consent(user_id, username, first_name):
     """Save user consent to the database."""
     try:
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_consent (user_id, username, first_name, consent_given)
-            VALUES (?, ?, ?, 1)
-        ''', (user_id, username, first_name))
-        conn.commit()
-        conn.close()
+        registry = _get_registry()
+        with _db().write() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO user_consent (user_id, username, first_name, consent_given)
+                VALUES (?, ?, ?, 1)
+            ''', (user_id, username, first_name))
+        # INSERT OR REPLACE resets is_child to its default
+        registry.set_flags(user_id, FLAG_CONSENT)
         logger.info(f"User {username} (ID: {user_id}) has given consent")
         return True
     except Exception as e:
@@ -52,61 +140,90 @@ def save_user_consent(user_id, username, first_name):
 def check_user_consent(user_id):
     """Check if user has given consent."""
     try:
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        cursor.execute('SELECT consent_given FROM user_consent WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result is not None and result[0] == 1
+        return bool(_get_registry().get_flags(user_id) & FLAG_CONSENT)
     except Exception as e:
         logger.error(f"Error checking user consent: {e}")
         return False
 
 def is_child_user(user_id):
     """Check if a user is marked as a child in the consent database.
-    
+
     Args:
         user_id: The user's ID
-        
+
     Returns:
         bool: True if the user is marked as a child, False otherwise
     """
     try:
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        cursor.execute('SELECT is_child FROM user_consent WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result is not None and result[0] == 1
+        return bool(_get_registry().get_flags(user_id) & FLAG_CHILD)
     except Exception as e:
         logger.error(f"Error checking if user is a child: {e}")
         return False
-        
+
 def get_all_child_user_ids():
-    """Get a list of all user IDs marked as children in the consent database.
-    
+    """Get the IDs of all consenting users marked as children.
+
     Returns:
-        list: List of user IDs marked as children
+        frozenset: User IDs marked as children
     """
     try:
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id FROM user_consent WHERE is_child = 1 AND consent_given = 1')
-        results = cursor.fetchall()
-        conn.close()
-        return [result[0] for result in results]  # Extract user_ids from results
+        return _get_registry().child_ids()
     except Exception as e:
         logger.error(f"Error retrieving child users: {e}")
-        return []
+        return frozenset()
+
+def get_child_status_map():
+    """Get the child flag of every user in the consent database.
+
+    Returns:
+        dict: Mapping of user ID to True if the user is marked as a child
+    """
+    return _get_registry().child_status_map()
+
+def get_consent_user(user_id):
+    """Get a user's consent record.
+
+    Returns:
+        tuple: (user_id, first_name, username, is_child) or None if the user is unknown
+    """
+    with _db().read() as conn:
+        return conn.execute(
+            'SELECT user_id, first_name, username, is_child FROM user_consent WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+
+def update_child_status(user_id, is_child):
+    """Mark a user as a child (1) or an adult (0).
+
+    Returns:
+        tuple: The updated (user_id, first_name, username, is_child) record,
+        or None if the user is not in the consent database
+    """
+    registry = _get_registry()
+    with _db().write() as conn:
+        cursor = conn.execute(
+            'UPDATE user_consent SET is_child = ? WHERE user_id = ?', (is_child, user_id)
+        )
+        if cursor.rowcount == 0:
+            return None
+        updated_user = conn.execute(
+            'SELECT user_id, first_name, username, is_child FROM user_consent WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+    with registry.lock:
+        flags = registry.get_flags(user_id) & ~FLAG_CHILD
+        registry.set_flags(user_id, flags | (FLAG_CHILD if is_child == 1 else 0))
+    return updated_user
 
 def revoke_user_consent(user_id):
     """Revoke a user's consent."""
     try:
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE user_consent SET consent_given = 0 WHERE user_id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        registry = _get_registry()
+        with _db().write() as conn:
+            cursor = conn.execute('UPDATE user_consent SET consent_given = 0 WHERE user_id = ?', (user_id,))
+        if cursor.rowcount:
+            with registry.lock:
+                registry.set_flags(user_id, registry.get_flags(user_id) & ~FLAG_CONSENT)
         logger.info(f"User ID {user_id} has revoked consent")
         return True
     except Exception as e:
@@ -0,0 +1,71 @@
+"""Dedicated thread pool for blocking database calls.
+
+SQLite calls block, so they must never run on the event loop thread. They are
+handed to this pool instead and awaited, e.g.
+``await run_in_db_thread(get_user_result, user_id)``. Every call is timed
+in the metrics under the function's name.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_EXECUTOR_THREADS
+from metrics import DB_SECONDS, DB_WAIT_SECONDS, DB_ERRORS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the DB thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DB_EXECUTOR_THREADS,
+                thread_name_prefix='db'
+            )
+            logger.info(f"Started database executor with {DB_EXECUTOR_THREADS} threads")
+        return _executor
+
+
+def _timed_call(name, queued_at, func, args, kwargs):
+    """Run func in a DB thread, recording how long it waited and how long it ran."""
+    started = time.perf_counter()
+    DB_WAIT_SECONDS.observe(started - queued_at, function=name)
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        DB_ERRORS.inc(function=name)
+        raise
+    finally:
+        DB_SECONDS.observe(time.perf_counter() - started, function=name)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking database function in the DB executor and await its result."""
+    return await run_named_in_db_thread(getattr(func, '__name__', repr(func)), func, *args, **kwargs)
+
+
+async def run_named_in_db_thread(name, func, *args, **kwargs):
+    """Like run_in_db_thread, with the name the call is recorded under in the metrics."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_timed_call, name, time.perf_counter(), func, args, kwargs)
+    return await loop.run_in_executor(_get_executor(), call)
+
+
+def shutdown_db_executor(wait=True):
+    """Stop the DB executor, waiting for queued calls to finish by default."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+        logger.info("Database executor stopped")
@@ -0,0 +1,104 @@
+"""Module for the local group membership table.
+
+The table is fed by ChatMemberUpdated updates for the configured groups and
+is mirrored in memory, so membership checks can be answered without calling
+the Telegram API. A chat is only "tracked" once the bot receives member
+updates for it (it has to be an administrator there); answers for chats that
+are not tracked could go stale and are therefore never stored.
+"""
+
+import logging
+import threading
+from config import MEMBERSHIP_DB_PATH
+from .connection import get_manager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+MEMBERSHIP_DB = MEMBERSHIP_DB_PATH
+
+# In-memory mirror of the tables, loaded by init_membership_db()
+_members = {}  # (chat_id, user_id) -> bool
+_tracked_chats = set()
+_lock = threading.Lock()
+
+def _db():
+    """Return the shared connection manager for the membership database."""
+    return get_manager(MEMBERSHIP_DB)
+
+def init_membership_db():
+    """Initialize the membership tables and load them into memory."""
+    with _db().write() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS group_members (
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                is_member INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chat_id, user_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tracked_chats (
+                chat_id INTEGER PRIMARY KEY,
+                since TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    with _db().read() as conn:
+        members = conn.execute('SELECT chat_id, user_id, is_member FROM group_members').fetchall()
+        tracked = conn.execute('SELECT chat_id FROM tracked_chats').fetchall()
+
+    with _lock:
+        _members.clear()
+        _members.update({(chat_id, user_id): bool(is_member) for chat_id, user_id, is_member in members})
+        _tracked_chats.clear()
+        _tracked_chats.update(chat_id for (chat_id,) in tracked)
+    logger.info(f"Membership database initialized: {len(members)} members in {len(tracked)} tracked chats")
+
+def get_member_status(chat_id, user_id):
+    """Look up a user's membership in a chat from memory.
+
+    Returns:
+        True or False if the membership is known, None if it is not
+    """
+    with _lock:
+        return _members.get((chat_id, user_id))
+
+def is_chat_tracked(chat_id):
+    """Check if member updates are being received for a chat."""
+    with _lock:
+        return chat_id in _tracked_chats
+
+def track_chat(chat_id):
+    """Mark a chat as tracked, e.g. after the bot was made an administrator there."""
+    with _db().write() as conn:
+        conn.execute('INSERT OR IGNORE INTO tracked_chats (chat_id) VALUES (?)', (chat_id,))
+    with _lock:
+        _tracked_chats.add(chat_id)
+
+def record_member_status(chat_id, user_id, is_member):
+    """Store a user's membership in a chat and mark the chat as tracked."""
+    with _db().write() as conn:
+        conn.execute('INSERT OR IGNORE INTO tracked_chats (chat_id) VALUES (?)', (chat_id,))
+        conn.execute('''
+            INSERT INTO group_members (chat_id, user_id, is_member) VALUES (?, ?, ?)
+            ON CONFLICT(chat_id, user_id) DO UPDATE SET
+                is_member = excluded.is_member,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (chat_id, user_id, int(is_member)))
+    with _lock:
+        _tracked_chats.add(chat_id)
+        _members[(chat_id, user_id)] = bool(is_member)
+
+def untrack_chat(chat_id):
+    """Forget everything known about a chat, e.g. after the bot lost admin rights there."""
+    with _db().write() as conn:
+        conn.execute('DELETE FROM group_members WHERE chat_id = ?', (chat_id,))
+        conn.execute('DELETE FROM tracked_chats WHERE chat_id = ?', (chat_id,))
+    with _lock:
+        _tracked_chats.discard(chat_id)
+        for key in [key for key in _members if key[0] == chat_id]:
+            del _members[key]
+    logger.info(f"Stopped tracking members of chat {chat_id}")
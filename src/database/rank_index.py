@@ -0,0 +1,186 @@
+"""In-memory rank index over the bounded score domain.
+
+best_series is 0-100 and total_tens is 0-10, so every result falls into one
+of 1,111 score buckets. Per bracket the index keeps the members of each
+bucket and a Fenwick tree of bucket counts, which gives rank and percentile
+lookups in a handful of steps and top-k in O(k) plus empty-bucket skips,
+independent of the number of shooters.
+"""
+
+import heapq
+import threading
+
+MAX_SERIES = 100
+MAX_TENS = 10
+SCORE_BUCKETS = (MAX_SERIES + 1) * (MAX_TENS + 1)
+
+# Leaderboard brackets
+BRACKET_PRO = 'pro'
+BRACKET_ADVANCED = 'advanced'
+BRACKET_AMATEUR = 'amateur'
+BRACKET_CHILDREN = 'children'
+BRACKETS = [BRACKET_PRO, BRACKET_ADVANCED, BRACKET_AMATEUR, BRACKET_CHILDREN]
+
+
+def get_bracket(best_series, is_child=False):
+    """Return the leaderboard bracket for a best series score."""
+    if is_child:
+        return BRACKET_CHILDREN
+    if best_series >= 93:
+        return BRACKET_PRO
+    if best_series >= 80:
+        return BRACKET_ADVANCED
+    return BRACKET_AMATEUR
+
+
+def score_key(best_series, total_tens):
+    """Map a (best_series, total_tens) pair to its bucket; higher is better."""
+    return best_series * (MAX_TENS + 1) + total_tens
+
+
+class _BracketIndex:
+    """Bucket members and a Fenwick tree of "how many are better than bucket k"."""
+
+    def __init__(self):
+        self.members = [None] * SCORE_BUCKETS  # bucket -> {user_id: None}
+        self.total = 0
+        # Fenwick tree indexed by reversed bucket, so prefix sums count better scores
+        self._tree = [0] * (SCORE_BUCKETS + 1)
+
+    def _tree_add(self, key, delta):
+        i = SCORE_BUCKETS - key
+        while i <= SCORE_BUCKETS:
+            self._tree[i] += delta
+            i += i & -i
+
+    def count_better(self, key):
+        """Number of members with a strictly higher score bucket."""
+        i = SCORE_BUCKETS - key - 1
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def count_in(self, key):
+        bucket = self.members[key]
+        return len(bucket) if bucket else 0
+
+    def add(self, user_id, key):
+        bucket = self.members[key]
+        if bucket is None:
+            bucket = self.members[key] = {}
+        bucket[user_id] = None
+        self.total += 1
+        self._tree_add(key, 1)
+
+    def remove(self, user_id, key):
+        del self.members[key][user_id]
+        self.total -= 1
+        self._tree_add(key, -1)
+
+    def top(self, k):
+        # Ties within a bucket are ordered by user ID, like the SQL bracket queries
+        top_ids = []
+        for key in range(SCORE_BUCKETS - 1, -1, -1):
+            bucket = self.members[key]
+            if not bucket:
+                continue
+            top_ids.extend(heapq.nsmallest(k - len(top_ids), bucket))
+            if len(top_ids) == k:
+                return top_ids
+        return top_ids
+
+
+class RankIndex:
+    """Rank index for every bracket, kept in step with user_results."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._brackets = {}
+        self._users = {}  # user_id -> (bracket, key)
+
+    def _bracket(self, bracket):
+        index = self._brackets.get(bracket)
+        if index is None:
+            index = self._brackets[bracket] = _BracketIndex()
+        return index
+
+    def load(self, rows, child_ids):
+        """Rebuild the index from (user_id, best_series, total_tens) rows."""
+        with self.lock:
+            self._brackets = {}
+            self._users = {}
+            for user_id, best_series, total_tens in rows:
+                bracket = get_bracket(best_series, user_id in child_ids)
+                self._set(user_id, bracket, score_key(best_series, total_tens))
+            self.loaded = True
+
+    def _set(self, user_id, bracket, key):
+        previous = self._users.get(user_id)
+        if previous == (bracket, key):
+            return
+        if previous is not None:
+            self._bracket(previous[0]).remove(user_id, previous[1])
+        self._bracket(bracket).add(user_id, key)
+        self._users[user_id] = (bracket, key)
+
+    def update(self, user_id, best_series, total_tens, is_child):
+        """Insert or move a user after their result changed."""
+        with self.lock:
+            if self.loaded:
+                self._set(user_id, get_bracket(best_series, is_child), score_key(best_series, total_tens))
+
+    def set_child(self, user_id, is_child):
+        """Move a user between the children and adult brackets, keeping their score."""
+        with self.lock:
+            previous = self._users.get(user_id)
+            if self.loaded and previous is not None:
+                key = previous[1]
+                self._set(user_id, get_bracket(key // (MAX_TENS + 1), is_child), key)
+
+    def remove(self, user_id):
+        """Drop a user whose result was deleted."""
+        with self.lock:
+            previous = self._users.pop(user_id, None)
+            if previous is not None:
+                self._bracket(previous[0]).remove(user_id, previous[1])
+
+    def get_bracket(self, user_id):
+        """Return the bracket a user is ranked in, or None if they have no result."""
+        with self.lock:
+            previous = self._users.get(user_id)
+            return previous[0] if previous else None
+
+    def rank(self, user_id):
+        """Return (bracket, rank, total, percentile) for a user, or None if they have no result.
+
+        Rank is 1 + the number of shooters with a strictly better score, so ties
+        share a rank. Percentile is the share of the other shooters in the bracket
+        with a strictly worse score.
+        """
+        with self.lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            bracket, key = entry
+            index = self._brackets[bracket]
+            better = index.count_better(key)
+            worse = index.total - better - index.count_in(key)
+            percentile = 100 if index.total == 1 else round(100 * worse / (index.total - 1))
+            return bracket, better + 1, index.total, percentile
+
+    def top(self, bracket, k):
+        """Return the user IDs of the k best shooters in a bracket, ties by user ID."""
+        with self.lock:
+            index = self._brackets.get(bracket)
+            return index.top(k) if index else []
+
+    def size(self, bracket):
+        with self.lock:
+            index = self._brackets.get(bracket)
+            return index.total if index else 0
+
+
+rank_index = RankIndex()
@@ -1,39 +1,170 @@
 """Module for managing shooting results data."""
 
-import os
-import sqlite3
 import logging
-from datetime import datetime
-from config import DATA_DIR, DB_PATH  # Changed from: from ..config import DATA_DIR, DB_PATH
+import time
+from collections import namedtuple
+from config import DB_PATH, CONSENT_DB_PATH, WRITE_BATCH_SYNCHRONOUS
+from .connection import get_manager
+from .consent_db import get_all_child_user_ids
+from .changes import bump_results_version
+from .rank_index import (
+    rank_index,
+    BRACKET_PRO,
+    BRACKET_ADVANCED,
+    BRACKET_AMATEUR,
+    BRACKET_CHILDREN,
+    MAX_SERIES
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def create_connection():
-    """Create a database connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+_RESULT_COLUMNS = 'r.user_id, r.first_name, r.last_name, r.username, r.best_series, r.total_tens'
+
+# Consenting children are excluded from the adult brackets and make up the children bracket
+_IS_CHILD = '''
+    EXISTS (SELECT 1 FROM consent.user_consent c
+            WHERE c.user_id = r.user_id AND c.is_child = 1 AND c.consent_given = 1)
+'''
+
+# Where each bracket's rows come from and which of them belong to it.
+# Consenting children are taken out of the adult brackets and make up the children bracket.
+_BRACKET_SOURCES = {
+    BRACKET_PRO: ('user_results r', f'r.best_series >= 93 AND NOT {_IS_CHILD}'),
+    BRACKET_ADVANCED: ('user_results r', f'r.best_series BETWEEN 80 AND 92 AND NOT {_IS_CHILD}'),
+    BRACKET_AMATEUR: ('user_results r', f'r.best_series <= 79 AND NOT {_IS_CHILD}'),
+    BRACKET_CHILDREN: (
+        'consent.user_consent c JOIN user_results r ON r.user_id = c.user_id',
+        'c.is_child = 1 AND c.consent_given = 1'
+    )
+}
+
+# Best first; ties keep the order of the score index (by user ID)
+_RESULT_ORDER = 'ORDER BY r.best_series DESC, r.total_tens DESC, r.user_id'
+
+# Keyset condition selecting the rows after the last row of the previous page
+_AFTER_ROW = '(r.best_series, r.total_tens, -r.user_id) < (?, ?, ?)'
+
+# One fixed statement per bracket so each is prepared once per connection.
+# Filtering, ordering and LIMIT run in SQLite on the score index.
+_BRACKET_QUERIES = {
+    bracket: f'SELECT {_RESULT_COLUMNS} FROM {source} WHERE {condition} {_RESULT_ORDER} LIMIT ?'
+    for bracket, (source, condition) in _BRACKET_SOURCES.items()
+}
+
+# When streaming a bracket the keyset must drive the index range, or every page
+# rescans the bracket from its top. The unary + keeps SQLite from ranging on
+# the bracket's upper bound instead; the lower bound still ends the scan.
+_BRACKET_PAGE_CONDITIONS = {
+    **{bracket: condition for bracket, (_, condition) in _BRACKET_SOURCES.items()},
+    BRACKET_ADVANCED: f'+r.best_series <= 92 AND r.best_series >= 80 AND NOT {_IS_CHILD}',
+    BRACKET_AMATEUR: f'+r.best_series <= 79 AND NOT {_IS_CHILD}'
+}
+
+# Page queries used when streaming a bracket
+_BRACKET_PAGE_QUERIES = {
+    bracket: f'SELECT {_RESULT_COLUMNS} FROM {source} WHERE {_BRACKET_PAGE_CONDITIONS[bracket]} '
+             f'AND {_AFTER_ROW} {_RESULT_ORDER} LIMIT ?'
+    for bracket, (source, _) in _BRACKET_SOURCES.items()
+}
+
+_ALL_RESULTS_PAGE_QUERY = f'SELECT {_RESULT_COLUMNS} FROM user_results r WHERE {_AFTER_ROW} {_RESULT_ORDER} LIMIT ?'
+
+# Sorts before every real row in _AFTER_ROW, i.e. "start from the top"
+_FIRST_PAGE = (MAX_SERIES + 1, 0, 0)
+
+# Season the in-memory rank index was built for; a different current season
+# in the database means another process rolled the season over
+_loaded_season = None
+
+# Rows fetched per step when results are streamed
+STREAM_PAGE_SIZE = 200
+
+# Outcomes of submit_user_result
+SUBMIT_CREATED = 'created'      # first result of the user
+SUBMIT_IMPROVED = 'improved'    # beats the stored best, overwritten
+SUBMIT_UNCHANGED = 'unchanged'  # identical to the stored best, nothing written
+SUBMIT_WORSE = 'worse'          # below the stored best, nothing written
+
+# status is one of the SUBMIT_* values, previous is the stored row before the call (or None)
+SubmitResult = namedtuple('SubmitResult', ['status', 'previous'])
+
+# Improve-only upsert: an existing row is only overwritten by a better (best_series, total_tens) pair
+_IMPROVE_ONLY_UPSERT = '''
+    INSERT INTO user_results (user_id, first_name, last_name, username, best_series, total_tens)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        username = excluded.username,
+        best_series = excluded.best_series,
+        total_tens = excluded.total_tens,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (excluded.best_series, excluded.total_tens) > (user_results.best_series, user_results.total_tens)
+'''
+
+def _db():
+    """Return the shared connection manager for the results database."""
+    # consent.db is attached to the readers so that bracket queries can join on the child flag
+    return get_manager(DB_PATH, reader_attach={'consent': CONSENT_DB_PATH})
 
 def create_tables():
     """Create the necessary tables if they don't exist."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    
-    # Create user_results table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_results (
-        user_id INTEGER PRIMARY KEY,
-        first_name TEXT,
-        last_name TEXT,
-        username TEXT,
-        best_series INTEGER,
-        total_tens INTEGER,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with _db().write() as conn:
+        # Create user_results table if it doesn't exist
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_results (
+            user_id INTEGER PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            username TEXT,
+            best_series INTEGER,
+            total_tens INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        # Serves the leaderboard ordering and bracket ranges
+        conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_results_score
+        ON user_results (best_series DESC, total_tens DESC)
+        ''')
+        # One row per leaderboard period; the latest is the current season
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS seasons (
+            id INTEGER PRIMARY KEY,
+            started_at INTEGER NOT NULL
+        )
+        ''')
+        conn.execute('INSERT INTO seasons (started_at) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM seasons)',
+                     (int(time.time()),))
+        # Final standings of finished seasons; user_results only holds the current season
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS season_results (
+            season INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            first_name TEXT,
+            last_name TEXT,
+            username TEXT,
+            best_series INTEGER,
+            total_tens INTEGER,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (season, user_id)
+        ) WITHOUT ROWID
+        ''')
+        # Append-only history of every accepted submission (ts is a Unix timestamp)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            best_series INTEGER NOT NULL,
+            total_tens INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            season INTEGER NOT NULL
+        )
+        ''')
+        # Per-user timelines (/history) and per-season scans
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_submissions_user_ts ON submissions (user_id, ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_submissions_season_ts ON submissions (season, ts)')
 
 def create_database():
     """Create the database and necessary tables."""
@@ -49,32 +180,142 @@ def format_display_name(first_name, last_name):
 
 def add_user_result(user_id, first_name, last_name, username, best_series, total_tens):
     """Add or update a user's shooting results."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO user_results (user_id, first_name, last_name, username, best_series, total_tens)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            first_name = excluded.first_name,
-            last_name = excluded.last_name,
-            username = excluded.username,
-            best_series = excluded.best_series,
-            total_tens = excluded.total_tens
-    ''', (user_id, first_name, last_name, username, best_series, total_tens))
-    conn.commit()
-    conn.close()
+    manager = _db()
+    with manager.write_lock:
+        with manager.write() as conn:
+            conn.execute('''
+                INSERT INTO user_results (user_id, first_name, last_name, username, best_series, total_tens)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    username = excluded.username,
+                    best_series = excluded.best_series,
+                    total_tens = excluded.total_tens
+            ''', (user_id, first_name, last_name, username, best_series, total_tens))
+        rank_index.update(user_id, best_series, total_tens, user_id in get_all_child_user_ids())
+    bump_results_version()
 
-def get_user_result(user_id):
-    """Get a user's shooting result."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
+def _submit_in_transaction(conn, user_id, first_name, last_name, username, best_series, total_tens, ts, season):
+    """Apply one submission on a writer connection inside an open transaction."""
+    # Every accepted attempt is kept, whether or not it beats the stored best
+    conn.execute('''
+        INSERT INTO submissions (user_id, best_series, total_tens, ts, season) VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, best_series, total_tens, ts, season))
+    
+    previous = conn.execute('''
         SELECT user_id, first_name, last_name, username, best_series, total_tens FROM user_results 
         WHERE user_id = ?
-    ''', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    ''', (user_id,)).fetchone()
+    
+    if previous is not None:
+        previous_pair = (previous[4], previous[5])
+        if (best_series, total_tens) == previous_pair:
+            return SubmitResult(SUBMIT_UNCHANGED, previous)
+        if (best_series, total_tens) < previous_pair:
+            return SubmitResult(SUBMIT_WORSE, previous)
+    
+    conn.execute(_IMPROVE_ONLY_UPSERT, (user_id, first_name, last_name, username, best_series, total_tens))
+    return SubmitResult(SUBMIT_CREATED if previous is None else SUBMIT_IMPROVED, previous)
+
+def submit_user_result(user_id, first_name, last_name, username, best_series, total_tens):
+    """Save a submitted result only if it beats the user's stored best.
+
+    The previous row is read and the improve-only upsert applied in one
+    transaction on the writer connection, so concurrent submissions of the
+    same user cannot interleave. Identical and worse submissions leave the
+    best row untouched; every submission is recorded in the history.
+
+    Returns:
+        SubmitResult: (status, previous) where status is one of the SUBMIT_* values
+    """
+    return submit_user_results([(user_id, first_name, last_name, username, best_series, total_tens)])[0]
+
+def submit_user_results(submissions):
+    """Apply a batch of submissions in a single transaction (one commit for the batch).
+
+    Submissions are applied in order, so two results of the same user in one
+    batch are compared with each other just as if they had been sent one by one.
+    Each submission is also appended to the submissions history.
+
+    Args:
+        submissions: List of (user_id, first_name, last_name, username, best_series, total_tens)
+
+    Returns:
+        list: One SubmitResult per submission, in the same order
+    """
+    ts = int(time.time())
+    manager = _db()
+    with manager.write_lock:
+        # Callers are told their result is saved once this returns, so fsync the commit
+        with manager.write(synchronous=WRITE_BATCH_SYNCHRONOUS) as conn:
+            season = _current_season(conn)
+            outcomes = [_submit_in_transaction(conn, *submission, ts, season) for submission in submissions]
+            written = [
+                submission for submission, outcome in zip(submissions, outcomes)
+                if outcome.status in (SUBMIT_CREATED, SUBMIT_IMPROVED)
+            ]
+            season_changed = season != _loaded_season and rank_index.loaded
+            if season_changed:
+                # The season was rolled over elsewhere; rebuild from the new season's rows
+                rows = _rank_rows(conn)
+        # The index only follows committed data. No SQLite lock is held from here on,
+        # so waiting for the consent registry cannot block a consent.db writer.
+        if season_changed:
+            _load_rank_index(rows, season)
+        elif written:
+            child_ids = get_all_child_user_ids()
+            for user_id, _, _, _, best_series, total_tens in written:
+                rank_index.update(user_id, best_series, total_tens, user_id in child_ids)
+    if written or season_changed:
+        bump_results_version()
+    return outcomes
+
+def delete_user_result(user_id):
+    """Delete a user's shooting result and submission history. Returns True if a result was removed."""
+    manager = _db()
+    with manager.write_lock:
+        with manager.write() as conn:
+            conn.execute('DELETE FROM submissions WHERE user_id = ?', (user_id,))
+            cursor = conn.execute('DELETE FROM user_results WHERE user_id = ?', (user_id,))
+        rank_index.remove(user_id)
+    bump_results_version()
+    return cursor.rowcount > 0
+
+def _current_season(conn):
+    return conn.execute('SELECT MAX(id) FROM seasons').fetchone()[0]
+
+def get_submission_history(user_id, before=None, limit=10):
+    """Get one page of a user's submissions, newest first.
+
+    Pages are chained with a keyset instead of OFFSET: pass the (ts, id) of
+    the last row of the previous page as ``before`` to get the next one.
+
+    Returns:
+        list: (id, best_series, total_tens, ts, season) rows
+    """
+    with _db().read() as conn:
+        if before is None:
+            return conn.execute('''
+                SELECT id, best_series, total_tens, ts, season FROM submissions
+                WHERE user_id = ?
+                ORDER BY ts DESC, id DESC
+                LIMIT ?
+            ''', (user_id, limit)).fetchall()
+        return conn.execute('''
+            SELECT id, best_series, total_tens, ts, season FROM submissions
+            WHERE user_id = ? AND (ts, id) < (?, ?)
+            ORDER BY ts DESC, id DESC
+            LIMIT ?
+        ''', (user_id, before[0], before[1], limit)).fetchall()
+
+def get_user_result(user_id):
+    """Get a user's shooting result."""
+    with _db().read() as conn:
+        return conn.execute('''
+            SELECT user_id, first_name, last_name, username, best_series, total_tens FROM user_results 
+            WHERE user_id = ?
+        ''', (user_id,)).fetchone()
 
 def validate_input(best_series, total_tens):
     """Validate that the input values are in acceptable ranges."""
@@ -85,12 +326,146 @@ def validate_input(best_series, total_tens):
 
 def get_all_results():
     """Get all user results, ordered by best series and total tens."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT user_id, first_name, last_name, username, best_series, total_tens FROM user_results 
-        ORDER BY best_series DESC, total_tens DESC
-    ''')
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with _db().read() as conn:
+        return conn.execute('''
+            SELECT user_id, first_name, last_name, username, best_series, total_tens FROM user_results 
+            ORDER BY best_series DESC, total_tens DESC, user_id
+        ''').fetchall()
+
+def iter_all_results(page_size=STREAM_PAGE_SIZE):
+    """Yield all user results page by page, best first (see iter_bracket_results)."""
+    return _iter_pages(_ALL_RESULTS_PAGE_QUERY, None, page_size)
+
+def has_results():
+    """Check if at least one result has been submitted."""
+    with _db().read() as conn:
+        return conn.execute('SELECT EXISTS (SELECT 1 FROM user_results)').fetchone()[0] == 1
+
+def get_bracket_results(bracket, limit=None):
+    """Get the results of one bracket, best first.
+
+    Args:
+        bracket: One of BRACKETS
+        limit: Maximum number of rows, None for the whole bracket
+
+    Returns:
+        list: (user_id, first_name, last_name, username, best_series, total_tens) rows
+    """
+    with _db().read() as conn:
+        return conn.execute(_BRACKET_QUERIES[bracket], (-1 if limit is None else limit,)).fetchall()
+
+def iter_bracket_results(bracket, limit=None, page_size=STREAM_PAGE_SIZE):
+    """Yield the results of one bracket page by page, best first.
+
+    Every page is a separate keyset query on a pooled reader that is released
+    before the page is yielded, so a slow consumer never holds a connection and
+    only one page is in memory at a time.
+
+    Yields:
+        list: Up to page_size (user_id, first_name, last_name, username, best_series, total_tens) rows
+    """
+    return _iter_pages(_BRACKET_PAGE_QUERIES[bracket], limit, page_size)
+
+def _iter_pages(query, limit, page_size):
+    after = _FIRST_PAGE
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        with _db().read() as conn:
+            rows = conn.execute(query, (*after, size)).fetchall()
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        last = rows[-1]
+        after = (last[4], last[5], -last[0])
+        if remaining is not None:
+            remaining -= len(rows)
+
+def _rank_rows(conn):
+    return conn.execute('SELECT user_id, best_series, total_tens FROM user_results').fetchall()
+
+def _load_rank_index(rows, season):
+    """Rebuild the rank index from _rank_rows(); call it outside of any transaction."""
+    global _loaded_season
+    rank_index.load(rows, get_all_child_user_ids())
+    _loaded_season = season
+    logger.info(f"Rank index loaded: {len(rows)} results in season {season}")
+
+def load_rank_index():
+    """Build the in-memory rank index from the results table."""
+    with _db().read() as conn:
+        rows = _rank_rows(conn)
+        season = _current_season(conn)
+    _load_rank_index(rows, season)
+
+def get_current_season():
+    """Return the number of the current season."""
+    with _db().read() as conn:
+        return _current_season(conn)
+
+def start_new_season():
+    """Close the current season and start a new one, atomically.
+
+    The current standings are copied to season_results, user_results is
+    emptied and a new seasons row is added, all in one transaction on the
+    shared database file. Writers are serialized by SQLite, so a submission
+    lands either in the old season before the rollover or in the new one
+    after it. A bot running in another process picks the new season up
+    through check_season().
+
+    Returns:
+        int: Number of the new season
+    """
+    manager = _db()
+    with manager.write_lock:
+        with manager.write() as conn:
+            season = _current_season(conn)
+            conn.execute('''
+                INSERT OR REPLACE INTO season_results
+                    (season, user_id, first_name, last_name, username, best_series, total_tens, updated_at)
+                SELECT ?, user_id, first_name, last_name, username, best_series, total_tens, updated_at
+                FROM user_results
+            ''', (season,))
+            archived = conn.execute('DELETE FROM user_results').rowcount
+            new_season = conn.execute('INSERT INTO seasons (started_at) VALUES (?)', (int(time.time()),)).lastrowid
+        if rank_index.loaded:
+            _load_rank_index([], new_season)
+    bump_results_version()
+    logger.info(f"Season {season} closed with {archived} results, season {new_season} started")
+    return new_season
+
+def check_season():
+    """Reload the in-memory state if the season was rolled over by another process.
+
+    Returns:
+        bool: True if a new season was picked up
+    """
+    with _db().read() as conn:
+        season = _current_season(conn)
+    if season == _loaded_season or not rank_index.loaded:
+        return False
+    # Reload under the writer lock so no submission updates the index meanwhile
+    manager = _db()
+    with manager.write_lock:
+        with manager.write() as conn:
+            season = _current_season(conn)
+            if season == _loaded_season:
+                return False
+            rows = _rank_rows(conn)
+        _load_rank_index(rows, season)
+    bump_results_version()
+    logger.info(f"Picked up new season {season}")
+    return True
+
+def get_user_bracket(user_id):
+    """Get the bracket a user is ranked in from the rank index, or None if they have no result."""
+    return rank_index.get_bracket(user_id)
+
+def get_user_rank(user_id):
+    """Get a user's place in their bracket from the rank index.
+
+    Returns:
+        tuple: (bracket, rank, total, percentile) or None if the user has no result
+    """
+    return rank_index.rank(user_id)
@@ -0,0 +1,179 @@
+"""Write-behind queue that group-commits result submissions.
+
+Every submission used to commit its own transaction. After a competition
+session hundreds of shooters submit within minutes, so pending submissions are
+collected here and written in one transaction once the batch is full or the
+flush interval has passed. Each caller awaits a future that is resolved with
+its own SubmitResult after the batch transaction has committed and been
+fsynced (WRITE_BATCH_SYNCHRONOUS).
+
+The queue is bounded: when it is full, ``submit`` waits for room instead of
+buffering without limit. ``drain`` flushes everything still pending and is
+called on shutdown before the DB executor is stopped.
+"""
+
+import asyncio
+import logging
+
+from config import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL_MS, WRITE_QUEUE_SIZE
+from metrics import WRITE_BATCH_SIZE as BATCH_SIZE_HISTOGRAM
+from . import results_db
+from .executor import run_in_db_thread
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Queued by drain() to tell the flusher to write what it holds and exit
+_STOP = object()
+
+
+class WriteQueue:
+    """Bounded queue of result submissions flushed in batches by one background task."""
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_interval_ms=WRITE_FLUSH_INTERVAL_MS, maxsize=WRITE_QUEUE_SIZE):
+        """
+        Args:
+            batch_size: Flush as soon as this many submissions are pending
+            flush_interval_ms: Longest time the first submission of a batch waits for company
+            maxsize: Pending submissions allowed before submit() applies backpressure
+        """
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.maxsize = maxsize
+        self.batches = 0
+        self.written = 0
+        self._queue = None
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+        self._putting = 0  # submit() calls waiting for room in the queue
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def depth(self):
+        """Number of submissions waiting to be flushed."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the background flusher on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._run(), name='write-queue')
+        logger.info(
+            f"Write queue started (batch size {self.batch_size}, "
+            f"flush interval {self.flush_interval * 1000:.0f} ms, capacity {self.maxsize})"
+        )
+
+    async def submit(self, user_id, first_name, last_name, username, best_series, total_tens):
+        """Queue a submission and wait until its batch is committed.
+
+        Falls back to a direct, individually committed write when the queue is
+        not running (e.g. in scripts) or is being drained.
+
+        Returns:
+            SubmitResult: Same as results_db.submit_user_result
+        """
+        submission = (user_id, first_name, last_name, username, best_series, total_tens)
+        if not self.running or self._closing:
+            return await run_in_db_thread(results_db.submit_user_result, *submission)
+
+        future = asyncio.get_running_loop().create_future()
+        self._putting += 1
+        try:
+            await self._queue.put((submission, future))  # waits while the queue is full
+        finally:
+            self._putting -= 1
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return await future
+
+    async def drain(self):
+        """Flush every pending submission and stop the flusher."""
+        if not self.running:
+            return
+        # Later submissions take the direct path instead of queueing behind _STOP
+        self._closing = True
+        await self._queue.put(_STOP)
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logger.info(f"Write queue drained: {self.written} submissions in {self.batches} batches")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+
+            # Collect more submissions until the batch is full or the interval is over
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Submissions that were waiting for room when drain() queued _STOP land
+        # behind it; flush them too so no caller is left waiting on its future
+        leftovers = []
+        while self._putting or not self._queue.empty():
+            try:
+                item = await asyncio.wait_for(self._queue.get(), 0.1)
+            except asyncio.TimeoutError:
+                continue  # a waiting submit() was cancelled
+            if item is not _STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.batch_size):
+            await self._flush(leftovers[start:start + self.batch_size])
+
+    async def _flush(self, batch):
+        """Write one batch in a single transaction and resolve the callers' futures."""
+        submissions = [submission for submission, _ in batch]
+        try:
+            outcomes = await run_in_db_thread(results_db.submit_user_results, submissions)
+        except Exception as e:
+            # The whole transaction was rolled back; retry one by one so a single
+            # bad submission does not fail the rest of the batch
+            logger.error(f"Batch of {len(batch)} submissions failed, retrying individually: {e}")
+            outcomes = []
+            for submission in submissions:
+                try:
+                    outcomes.append(await run_in_db_thread(results_db.submit_user_result, *submission))
+                except Exception as item_error:
+                    outcomes.append(item_error)
+
+        self.batches += 1
+        self.written += len(batch)
+        BATCH_SIZE_HISTOGRAM.observe(len(batch))
+        for (_, future), outcome in zip(batch, outcomes):
+            if future.done():  # the waiting handler was cancelled
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+
+write_queue = WriteQueue()
@@ -1,7 +1,9 @@
 import asyncio
 import logging
 import os
+import secrets
 import random  # Добавляем импорт модуля random для выбора случайных сообщений
+from typing import Optional
 # Removed unused import: sqlite3
 # Removed unused import: datetime
 
@@ -11,35 +13,72 @@ from telegram.ext import (
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    ChatMemberHandler,
     filters,
     ContextTypes
 )
 # Fix the incorrect import for command scopes
 from telegram import BotCommandScopeDefault, BotCommandScopeAllGroupChats
+from telegram.request import BaseRequest
 
 # Import from the refactored database package
 from database import (
     create_database,
-    add_user_result,
-    get_user_result,
     validate_input,
-    init_consent_db  # Now imported from database package
+    init_consent_db,  # Now imported from database package
+    init_membership_db,
+    load_rank_index,
+    sync_archive,
+    close_connections,
+    shutdown_db_executor,
+    write_queue,
+    run_backup,
+    get_bracket,
+    SUBMIT_IMPROVED,
+    SUBMIT_WORSE,
+    results,  # Async data-access API, runs queries off the event loop
+    consent
 )
 # Import from the new user module
 from user import (
     is_user_in_group,
-    save_user_consent,
-    check_user_consent,
-    revoke_user_consent,
+    invalidate_membership,
+    track_chat_member,
     handle_group_message,  # Updated to import from user module
     leaderboard,
     leaderboard_all,  # Import leaderboard functions from user package
+    history,
+    history_page_callback,
+    mybest,
+    get_leaderboard_cache_stats,
+    get_membership_cache_stats,
+    HISTORY_CALLBACK_PREFIX,
+    BRACKET_NAMES,
     # Add these imports for admin functionality
     register_admin_handlers
 )
 # Remove this import as it's now included in the user package
 # from leaderboard import leaderboard, leaderboard_all
-from config import BOT_TOKEN
+from concurrency import OrderedApplication
+from outbound import OutboundScheduler
+from metrics import instrument_handlers, register_gauge, start_metrics_server, uptime_seconds
+from config import (
+    BOT_TOKEN,
+    TELEGRAM_BASE_URL,
+    UPDATE_CONCURRENCY,
+    BOT_MODE,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_SECRET_FILE,
+    WEBHOOK_MAX_CONNECTIONS,
+    SEASON_CHECK_INTERVAL,
+    BACKUP_INTERVAL_HOURS,
+    METRICS_LISTEN,
+    METRICS_PORT
+)
 
 # Get data directory from environment variable or use default
 DATA_DIR = os.environ.get('DATA_DIR', './data')
@@ -90,12 +129,22 @@ ENCOURAGING_MESSAGES = [
 
 
 
+# Update types requested from Telegram; chat_member updates feed the local membership table
+ALLOWED_UPDATES = [
+    Update.MESSAGE,
+    Update.CALLBACK_QUERY,
+    Update.CHAT_MEMBER,
+    Update.MY_CHAT_MEMBER
+]
+
 # Help text constant to avoid duplication
 HELP_TEXT = (
     "📋 Список команд бота:\n\n"
     "/status - Проверить ваш текущий результат\n"
     "/leaderboard - Посмотреть таблицу лидеров вашей группы\n"
     "/leaderboard_all - Посмотреть таблицу лидеров всех групп\n"
+    "/history - История ваших результатов\n"
+    "/mybest - Лучший результат за все сезоны\n"
     "/revoke - Отозвать согласие на обработку данных\n"
     "/help - Показать это сообщение\n\n"
     "Чтобы внести результаты стрельбы, просто отправьте два числа:\n"
@@ -128,12 +177,13 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     user = update.effective_user
     
     # Check consent first
-    if check_user_consent(user.id):
+    if await consent.check(user.id):
         logger.info(f"User {user.username} (ID: {user.id}) already gave consent, proceeding")
         await update.message.reply_text(f"С возвращением, {user.first_name}! 👋\nСогласие на обработку персональных данных уже получено — первый выстрел сделан. Можем продолжать.")
         
-        # Check group membership
+        # Check group membership, skipping cached answers since /start is an explicit re-check
         user_id = update.message.from_user.id
+        invalidate_membership(user_id)
         is_member, error_message = await is_user_in_group(user_id, context.bot)
 
         if not is_member:
@@ -164,7 +214,7 @@ async def handle_consent(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await query.answer()
 
     if query.data == 'agree':
-        success = save_user_consent(
+        success = await consent.save(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name
@@ -178,6 +228,7 @@ async def handle_consent(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             
             # Check group membership after consent
+            invalidate_membership(user.id)
             is_member, error_message = await is_user_in_group(user.id, context.bot)
             if not is_member:
                 await context.bot.send_message(
@@ -257,11 +308,11 @@ async def revoke_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
         
     user = update.effective_user
-    if not check_user_consent(user.id):
+    if not await consent.check(user.id):
         await update.message.reply_text("Ты ещё не давал согласие или уже его отозвал.")
         return
 
-    success = revoke_user_consent(user.id)
+    success = await consent.revoke(user.id)
     if success:
         await update.message.reply_text(
             "Ты сделал свой выбор — спокойно, сосредоточенно, как перед последним выстрелом в финале. "
@@ -298,7 +349,7 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.message.from_user.id
     
     # Check consent first
-    if not check_user_consent(user_id):
+    if not await consent.check(user_id):
         await update.message.reply_text(
             "Перед выходом на линию нужен чёткий сигнал согласия. 📝\n"
             "Без этого — ни одного выстрела.\n\n"
@@ -306,8 +357,11 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
         return
     
+    # A season started by the publish script shows at once, not at the next season check
+    await results.refresh_season()
+    
     # Get user result and extract data using the helper function
-    result = get_user_result(user_id)
+    result = await results.get(user_id)
     if result:
         best_series, total_tens = extract_shooting_data(result)
         if best_series >= 93:
@@ -315,6 +369,14 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         else:
             message = f"Ваш текущий результат:\nЛучшая серия: {best_series}, количество десяток: {total_tens}"
         
+        # Place in the user's group, answered by the in-memory rank index
+        user_rank = await results.rank(user_id)
+        if user_rank:
+            bracket, rank, total, percentile = user_rank
+            message += f"\nМесто в группе «{BRACKET_NAMES[bracket]}»: {rank} из {total}"
+            if total > 1:
+                message += f" — лучше, чем {percentile}% участников"
+        
         await update.message.reply_text(message)
     else:
         await update.message.reply_text("Вы еще не отправили никаких результатов.")
@@ -336,7 +398,7 @@ async def handle_result(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     user_id = update.message.from_user.id
     
     # Check if user has given consent
-    if not check_user_consent(user_id):
+    if not await consent.check(user_id):
         await update.message.reply_text(CONSENT_REQUIRED_TEXT)
         return
 
@@ -392,44 +454,17 @@ async def handle_result(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     # Validate and compare with previous results
     if validate_input(best_series, total_tens):
-        # Import the child status check function
-        from database.consent_db import is_child_user
-        
         # Check if the user is a child
-        user_is_child = is_child_user(user_id)
-        
-        previous_result = get_user_result(user_id)
-        previous_group = None
+        user_is_child = await consent.is_child(user_id)
         
-        # Determine previous group if there was a previous result
-        if previous_result:
-            prev_best_series = previous_result[4]  # Updated index for best_series
-            prev_total_tens = previous_result[5]   # Updated index for total_tens
-            
-            # Determine the previous group
-            if prev_best_series >= 93:
-                previous_group = "Профи"
-            elif prev_best_series >= 80:
-                previous_group = "Продвинутые"
-            else:
-                previous_group = "Любители"
-
-            # If new results are worse, ignore them
-            if best_series < prev_best_series or \
-               (best_series == prev_best_series and total_tens < prev_total_tens):
-                await update.message.reply_text(
-                    'Пока оставим старые результаты — новые чуть скромнее. Но это всего лишь шаг в пути 💫 Не останавливайся, ты растёшь с каждым выстрелом!'
-                )
-                return
-                
         # Get user details from Telegram
         first_name = update.message.from_user.first_name
         last_name = update.message.from_user.last_name or ""
         username = update.message.from_user.username or ""
 
-        # Save the new result with separated user fields
-        # Modified to save results for children too when they improve
-        add_user_result(
+        # Compare with the stored best and save in one step; only improvements are written
+        # (results are saved for children too when they improve)
+        outcome = await results.submit(
             user_id,
             first_name,
             last_name,
@@ -437,41 +472,37 @@ async def handle_result(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             best_series,
             total_tens
         )
-        
-        # Determine the new group
-        new_group = None
-        if best_series >= 93:
-            new_group = "Профи"
-        elif best_series >= 80:
-            new_group = "Продвинутые"
-        else:
-            new_group = "Любители"
+        previous_result = outcome.previous
+
+        # If new results are worse, the old ones are kept
+        if outcome.status == SUBMIT_WORSE:
+            await update.message.reply_text(
+                'Пока оставим старые результаты — новые чуть скромнее. Но это всего лишь шаг в пути 💫 Не останавливайся, ты растёшь с каждым выстрелом!'
+            )
+            return
         
         # Check if user moved to a higher group
-        if previous_result and previous_group != new_group and not user_is_child:
-            # Group upgrade hierarchy: Любители -> Продвинутые -> Профи
-            if (previous_group == "Любители" and new_group in ["Продвинутые", "Профи"]) or \
-               (previous_group == "Продвинутые" and new_group == "Профи"):
+        # An improvement never lowers best_series, so a different group is always a higher one
+        if outcome.status == SUBMIT_IMPROVED and not user_is_child:
+            previous_group = get_bracket(previous_result[4])
+            new_group = get_bracket(best_series)
+            if previous_group != new_group:
                 # Send congratulation message
                 await update.message.reply_text(
                     f'🏆 Отличная серия, {update.effective_user.first_name}! 🏆\n'
-                    f'Ты поднялся на новый уровень и теперь в группе **"{new_group}"**!\n'
+                    f'Ты поднялся на новый уровень и теперь в группе **"{BRACKET_NAMES[new_group]}"**!\n'
                     f'Твой результат: {best_series}, {total_tens} — уверенное попадание в прогресс! 🎯'
                 )
                 return
         
         # Special message for children who improved their results
-        if user_is_child and previous_result:
-            improvement = best_series - previous_result[4]
-            tens_improvement = total_tens - previous_result[5]
-            
-            if improvement > 0 or (improvement == 0 and tens_improvement > 0):
-                await update.message.reply_text(
-                    f'🌟 Вау! {update.effective_user.first_name}, ты становишься настоящим снайпером! 🌟\n'
-                    f'Твой новый рекорд: {best_series}, {total_tens} {"десяток" if best_series < 93 else "центральных десяток"}.\n'
-                    f'Продолжай тренироваться, и скоро тебя будут знать все стрелки! 🎯✨'
-                )
-                return
+        if user_is_child and outcome.status == SUBMIT_IMPROVED:
+            await update.message.reply_text(
+                f'🌟 Вау! {update.effective_user.first_name}, ты становишься настоящим снайпером! 🌟\n'
+                f'Твой новый рекорд: {best_series}, {total_tens} {"десяток" if best_series < 93 else "центральных десяток"}.\n'
+                f'Продолжай тренироваться, и скоро тебя будут знать все стрелки! 🎯✨'
+            )
+            return
 
         # Regular success message if no group change and not a child with improved score
         await update.message.reply_text(random.choice(ENCOURAGING_MESSAGES))
@@ -495,7 +526,7 @@ async def handle_unsupported_content(update: Update, context: ContextTypes.DEFAU
     user_id = update.message.from_user.id
     
     # Check if user has given consent
-    if not check_user_consent(user_id):
+    if not await consent.check(user_id):
         await update.message.reply_text(CONSENT_REQUIRED_TEXT)
         return
         
@@ -506,50 +537,119 @@ async def handle_unsupported_content(update: Update, context: ContextTypes.DEFAU
         )
 
 # Update the main function to initialize consent DB and add new handlers
-async def main() -> None:
-    """Set up the database, configure the bot, add handlers, and run polling."""
-    # Initialize databases - pass the data directory where needed
-    create_database()  # Remove the DATA_DIR parameter
-    init_consent_db()
-
-    # Create the bot application
-    application = Application.builder().token(BOT_TOKEN).build()
+async def check_season_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Pick up a season rollover made by the publish script."""
+    try:
+        await results.refresh_season()
+    except Exception as e:
+        logger.error(f"Season check failed: {e}")
+
+async def backup_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Take the scheduled online backup of the databases."""
+    backup_results = await asyncio.to_thread(run_backup)
+    if backup_results and not all(result.ok for result in backup_results):
+        logger.error("Scheduled backup finished with errors")
+
+async def start_receiving_updates(application: Application) -> None:
+    """Start fetching updates with long polling or the webhook listener, depending on BOT_MODE."""
+    if BOT_MODE != "webhook":
+        await application.updater.start_polling(allowed_updates=ALLOWED_UPDATES)
+        logger.info("Receiving updates with long polling")
+        return
 
-    # Set up bot commands for the menu button
-    private_commands = [
-        # BotCommand("start", "Начать использование бота"),  # Removed from menu
-        BotCommand("status", "Проверить ваш текущий результат"),
-        BotCommand("leaderboard", "Таблица лидеров вашей группы"),
-        BotCommand("leaderboard_all", "Таблица лидеров всех групп"),
-        BotCommand("revoke", "Отозвать согласие на обработку данных"),
-        BotCommand("help", "Показать список команд")
-    ]
-    
-    # Set commands for private chats only
-    await application.bot.set_my_commands(
-        commands=private_commands,
-        scope=BotCommandScopeDefault()
+    secret_token = WEBHOOK_SECRET_TOKEN
+    if not secret_token:
+        # Telegram accepts A-Z, a-z, 0-9, _ and -; the webhook is registered anew on every start
+        secret_token = secrets.token_urlsafe(32)
+        # Readable by the owner only, e.g. for tools/webhook_sender.py
+        fd = os.open(WEBHOOK_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secret_token)
+        logger.info(f"WEBHOOK_SECRET_TOKEN not set, generated a random secret for this run in {WEBHOOK_SECRET_FILE}")
+
+    # Requests without the matching X-Telegram-Bot-Api-Secret-Token header are rejected
+    # by the listener; only the update types the handlers use are requested from Telegram
+    await application.updater.start_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        secret_token=secret_token,
+        allowed_updates=ALLOWED_UPDATES,
+        max_connections=WEBHOOK_MAX_CONNECTIONS
     )
-    
-    # Remove commands from group chats by setting an empty list
-    await application.bot.set_my_commands(
-        commands=[],  # empty command list
-        scope=BotCommandScopeAllGroupChats()
+    logger.info(f"Receiving updates with a webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+
+def register_metrics(application: Application) -> None:
+    """Expose cache counters and queue depths of the running bot as metrics."""
+    caches = {
+        'leaderboard': get_leaderboard_cache_stats,
+        'membership': get_membership_cache_stats
+    }
+
+    def cache_stat(field):
+        return lambda: {name: stats()[field] for name, stats in caches.items()}
+
+    register_gauge('bot_cache_hits_total', 'Cache lookups answered from the cache', cache_stat('hits'),
+                   ('cache',), 'counter')
+    register_gauge('bot_cache_misses_total', 'Cache lookups that missed', cache_stat('misses'),
+                   ('cache',), 'counter')
+    register_gauge('bot_cache_entries', 'Entries held by a cache', cache_stat('size'), ('cache',))
+    register_gauge('bot_write_queue_depth', 'Submissions waiting in the write-behind queue', write_queue.depth)
+    register_gauge('bot_write_batches_total', 'Batches committed by the write-behind queue',
+                   lambda: write_queue.batches, metric_type='counter')
+    register_gauge('bot_outbound_queue_depth', 'Messages waiting for an outbound send slot',
+                   lambda: application.bot.rate_limiter.queue_depth() if application.bot.rate_limiter else 0)
+    register_gauge('bot_users_in_flight', 'Users with updates being processed or waiting',
+                   lambda: len(application.user_queues))
+    register_gauge('bot_uptime_seconds', 'Seconds since the bot started', uptime_seconds)
+
+def build_application(request: Optional[BaseRequest] = None, paced: bool = True) -> Application:
+    """Create the bot application with every handler and job registered.
+
+    Nothing is sent to Telegram here, so the load-test harness can build the
+    same handler graph as the bot.
+
+    Args:
+        request: Request object for Bot API calls; the default talks to Telegram
+        paced: Whether outgoing requests go through the OutboundScheduler
+
+    Returns:
+        Application: The configured, not yet initialized application
+    """
+    # Updates of different users are handled concurrently, those of one user in order
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_BASE_URL)
+        .application_class(OrderedApplication)
+        .concurrent_updates(UPDATE_CONCURRENCY)
     )
-    
-    logger.info("Bot menu commands have been set up for private chats only")
+    if paced:
+        builder = builder.rate_limiter(OutboundScheduler())  # paces every outgoing request
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
 
     # Register command handlers
     application.add_handler(CommandHandler("start", start_command))  # Use new consent-aware start handler
     application.add_handler(CommandHandler("status", status))
     application.add_handler(CommandHandler("leaderboard", leaderboard))
     application.add_handler(CommandHandler("leaderboard_all", leaderboard_all))
+    application.add_handler(CommandHandler("history", history))
+    application.add_handler(CommandHandler("mybest", mybest))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("revoke", revoke_command))  # Add the revoke command handler
     
+    # Keep the local membership table up to date from the configured groups
+    application.add_handler(ChatMemberHandler(track_chat_member, ChatMemberHandler.ANY_CHAT_MEMBER))
+    
     # Register admin handlers
     register_admin_handlers(application)
     
+    # Paging through /history; registered before the catch-all consent handler
+    application.add_handler(CallbackQueryHandler(history_page_callback, pattern=f"^{HISTORY_CALLBACK_PREFIX}"))
+    
     # Add callback query handler for consent buttons
     application.add_handler(CallbackQueryHandler(handle_consent))
 
@@ -567,12 +667,68 @@ async def main() -> None:
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_result)
     )
 
-    # Start the bot and run until user presses Ctrl-C
+    # The publish script starts new seasons in the shared database; reload in-memory state when it does
+    application.job_queue.run_repeating(check_season_job, interval=SEASON_CHECK_INTERVAL, first=SEASON_CHECK_INTERVAL)
+    
+    # Online backups while the bot keeps running
+    if BACKUP_INTERVAL_HOURS > 0:
+        application.job_queue.run_repeating(backup_job, interval=BACKUP_INTERVAL_HOURS * 3600, first=60)
+
+    # Time every handler and expose the bot's internal counters
+    instrument_handlers(application)
+    register_metrics(application)
+
+    return application
+
+async def main() -> None:
+    """Set up the database, configure the bot, add handlers, and run polling."""
+    # Initialize databases - pass the data directory where needed
+    create_database()  # Remove the DATA_DIR parameter
+    init_consent_db()
+    init_membership_db()
+    load_rank_index()
+    # Imports legacy season files and closed seasons not archived yet
+    sync_archive()
+
+    application = build_application()
+
+    write_queue.start()
+    # Also initializes the outbound scheduler, which every Bot API call below goes through
     await application.initialize()
+
+    # Set up bot commands for the menu button
+    private_commands = [
+        # BotCommand("start", "Начать использование бота"),  # Removed from menu
+        BotCommand("status", "Проверить ваш текущий результат"),
+        BotCommand("leaderboard", "Таблица лидеров вашей группы"),
+        BotCommand("leaderboard_all", "Таблица лидеров всех групп"),
+        BotCommand("history", "История ваших результатов"),
+        BotCommand("mybest", "Лучший результат за все сезоны"),
+        BotCommand("revoke", "Отозвать согласие на обработку данных"),
+        BotCommand("help", "Показать список команд")
+    ]
+    
+    # Set commands for private chats only
+    await application.bot.set_my_commands(
+        commands=private_commands,
+        scope=BotCommandScopeDefault()
+    )
+    
+    # Remove commands from group chats by setting an empty list
+    await application.bot.set_my_commands(
+        commands=[],  # empty command list
+        scope=BotCommandScopeAllGroupChats()
+    )
+    
+    logger.info("Bot menu commands have been set up for private chats only")
+
+    # Start the bot and run until user presses Ctrl-C
     await application.start()
+
+    metrics_server = start_metrics_server(METRICS_LISTEN, METRICS_PORT) if METRICS_PORT else None
     
     try:
-        await application.updater.start_polling()
+        await start_receiving_updates(application)
         logger.info("Bot started and running...")
         # Keep the program running until user cancels
         await asyncio.Event().wait()
@@ -580,8 +736,15 @@ async def main() -> None:
         logger.info("User initiated shutdown...")
     finally:
         logger.info("Shutting down...")
+        if metrics_server is not None:
+            metrics_server.stop()
+        if application.updater.running:
+            await application.updater.stop()
         await application.stop()
         await application.shutdown()
+        await write_queue.drain()  # commit pending submissions before the DB threads stop
+        shutdown_db_executor()
+        close_connections()
         logger.info("Bot has been shut down.")
 
 if __name__ == "__main__":
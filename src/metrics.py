@@ -0,0 +1,310 @@
+"""In-process metrics: latency histograms, counters and gauges.
+
+Handlers, database calls and Bot API requests record their latency in
+histograms defined here; counters count errors, retries and written
+batches. Values that already live elsewhere (cache hit counters, queue
+depths) are read by callbacks registered with ``register_gauge`` each time
+the metrics are collected, so they cost nothing in between.
+
+Everything is served in the Prometheus text format by a small HTTP endpoint
+(``start_metrics_server``) and summarised for admins by /metrics. Metrics
+are recorded from the event loop and from the DB threads, so every update
+takes a short lock.
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import tornado.web
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Label sets kept per metric; further ones are counted under "other" so that
+# unexpected label values cannot grow memory without bound
+MAX_SERIES = 500
+
+_OTHER = 'other'
+
+_registry = []
+
+_started_at = time.time()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [(name, value) for name, value in zip(names, values) if value != ''] + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base of the metric types: a name, a help text and one series per label set."""
+
+    type = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        if key not in self._series and len(self._series) >= MAX_SERIES:
+            key = (_OTHER,) * len(self.labelnames)
+        return key
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for the text format."""
+        raise NotImplementedError
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, values, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def values(self):
+        """Return {label values: count}."""
+        with self._lock:
+            return dict(self._series)
+
+    def samples(self):
+        for values, count in sorted(self.values().items()):
+            yield '', values, (), count
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """Return {label values: (per-bucket counts, sum, count)}."""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def quantile(self, counts, share):
+        """Estimate a quantile from per-bucket counts by interpolating inside the bucket."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = share * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # beyond the last bucket, only the lower bound is known
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self):
+        for values, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield '_bucket', values, (('le', _format_value(float(bound))),), cumulative
+            yield '_sum', values, (), total
+            yield '_count', values, (), count
+
+
+class Gauge(_Metric):
+    """Value read from a callback whenever the metrics are collected.
+
+    The callback returns a number, or a dict of {label values: number} when
+    the gauge has labels. ``type`` may be set to 'counter' for totals that are
+    counted elsewhere, such as cache hits.
+    """
+
+    def __init__(self, name, help_text, read, labelnames=(), metric_type='gauge'):
+        super().__init__(name, help_text, labelnames)
+        self.type = metric_type
+        self._read = read
+
+    def values(self):
+        try:
+            value = self._read()
+        except Exception as e:
+            logger.error(f"Could not read metric {self.name}: {e}")
+            return {}
+        if isinstance(value, dict):
+            return {key if isinstance(key, tuple) else (key,): number for key, number in value.items()}
+        return {(): value}
+
+    def samples(self):
+        for values, value in sorted(self.values().items()):
+            yield '', values, (), value
+
+
+def register_gauge(name, help_text, read, labelnames=(), metric_type='gauge'):
+    """Register a gauge read from ``read()`` at collection time; replaces one of the same name."""
+    _registry[:] = [metric for metric in _registry if metric.name != name]
+    return Gauge(name, help_text, read, labelnames, metric_type)
+
+
+def get_metric(name):
+    """Return the registered metric with this name, or None."""
+    for metric in _registry:
+        if metric.name == name:
+            return metric
+    return None
+
+
+def uptime_seconds():
+    return time.time() - _started_at
+
+
+def render_prometheus():
+    """Return every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# --- metrics of the bot ------------------------------------------------------
+
+HANDLER_SECONDS = Histogram(
+    'bot_handler_seconds', 'Time spent in an update handler', ('handler', 'action')
+)
+HANDLER_ERRORS = Counter(
+    'bot_handler_errors_total', 'Exceptions raised by an update handler', ('handler', 'action')
+)
+DB_SECONDS = Histogram(
+    'bot_db_call_seconds', 'Time a database function ran in a DB thread', ('function',)
+)
+DB_WAIT_SECONDS = Histogram(
+    'bot_db_wait_seconds', 'Time a database call waited for a free DB thread', ('function',)
+)
+DB_ERRORS = Counter(
+    'bot_db_errors_total', 'Exceptions raised by a database function', ('function',)
+)
+TELEGRAM_SECONDS = Histogram(
+    'bot_telegram_request_seconds', 'Duration of one Bot API request attempt', ('method',)
+)
+TELEGRAM_REQUESTS = Counter(
+    'bot_telegram_requests_total', 'Bot API request attempts by outcome (ok, retry_after, error)',
+    ('method', 'outcome')
+)
+TELEGRAM_RETRIES = Counter(
+    'bot_telegram_retries_total', 'Bot API requests retried after a RetryAfter', ('method',)
+)
+WRITE_BATCH_SIZE = Histogram(
+    'bot_write_batch_size', 'Submissions committed per write-behind batch', (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+
+# --- handler instrumentation -------------------------------------------------
+
+def _callback_action(update):
+    """Label of a button press: its callback data up to the first ':' (e.g. 'admin_backup', 'history')."""
+    query = getattr(update, 'callback_query', None)
+    if query is None or not query.data:
+        return ''
+    return query.data.split(':', 1)[0]
+
+
+def timed_handler(callback):
+    """Wrap a handler callback so its duration and exceptions are recorded."""
+    name = getattr(callback, '__name__', type(callback).__name__)
+
+    @functools.wraps(callback)
+    async def timed(update, context):
+        action = _callback_action(update)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name, action=action)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name, action=action)
+
+    return timed
+
+
+def instrument_handlers(application):
+    """Time every handler registered on the application so far."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = timed_handler(handler.callback)
+
+
+# --- HTTP endpoint -----------------------------------------------------------
+
+class _MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(render_prometheus())
+
+
+def start_metrics_server(address, port):
+    """Serve /metrics on the running event loop.
+
+    Returns:
+        tornado.httpserver.HTTPServer: The server, to be stopped on shutdown
+    """
+    app = tornado.web.Application([(r'/metrics', _MetricsHandler)])
+    server = app.listen(port, address=address)
+    logger.info(f"Metrics served at http://{address}:{port}/metrics")
+    return server
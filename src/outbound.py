@@ -0,0 +1,217 @@
+"""Outbound scheduler for Bot API requests.
+
+Every request the bot makes passes through ``OutboundScheduler``, which is
+plugged into python-telegram-bot as its rate limiter. Message sends are paced
+by token buckets that mirror Telegram's limits: about 30 messages per second
+overall and about 20 messages per minute per group. Replies to users are
+handed tokens before bulk traffic (leaderboard publication, long admin
+listings). A ``RetryAfter`` from Telegram pauses all requests for the
+requested time before the failed one is retried. Every attempt is timed in
+the metrics per Bot API method.
+
+Bulk requests are marked with ``rate_limit_args=PRIORITY_BULK``, e.g.
+``await bot.send_message(chat_id, text, rate_limit_args=PRIORITY_BULK)``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import OUTBOUND_GLOBAL_RATE, OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES
+from metrics import TELEGRAM_SECONDS, TELEGRAM_REQUESTS, TELEGRAM_RETRIES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Priorities, lower is served first
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+_PRIORITY_RANKS = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 1}
+
+# Endpoints that post a message into a chat and count against the message limits
+_MESSAGE_ENDPOINT_PREFIXES = ('send', 'copyMessage', 'forwardMessage', 'editMessage')
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per ``period`` seconds."""
+
+    def __init__(self, rate, period, capacity=None):
+        self.rate = rate / period  # tokens per second
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self):
+        """Seconds until a token is available, 0 if one is available now."""
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def reserve(self):
+        """Take a token, going into debt if necessary, and return how long to wait for it."""
+        delay = self.delay()
+        self.tokens -= 1
+        return delay
+
+
+class _PriorityGate:
+    """Hands out the tokens of a bucket to waiting requests, highest priority first.
+
+    One dispatcher task serves the waiters; because it looks at the head of the
+    heap again after every wait, an interactive request that arrives while bulk
+    requests are queued is served next.
+    """
+
+    def __init__(self, bucket, resume):
+        self.bucket = bucket
+        self._resume = resume
+        self._heap = []
+        self._sequence = itertools.count()
+        self._task = None
+
+    def waiting(self):
+        return len(self._heap)
+
+    async def acquire(self, rank):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (rank, next(self._sequence), future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._heap:
+            future = self._heap[0][2]
+            if future.done():  # the waiting request was cancelled
+                heapq.heappop(self._heap)
+                continue
+            await self._resume.wait()
+            delay = self.bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self.bucket.take()
+            heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        for _, _, future in self._heap:
+            future.cancel()
+        self._heap.clear()
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Rate limiter with a global and a per-group token bucket and two priorities."""
+
+    def __init__(
+        self,
+        global_rate=OUTBOUND_GLOBAL_RATE,
+        group_rate=OUTBOUND_GROUP_RATE,
+        max_retries=OUTBOUND_MAX_RETRIES
+    ):
+        """
+        Args:
+            global_rate: Messages per second across all chats
+            group_rate: Messages per minute into a single group
+            max_retries: Retries of a request after a RetryAfter before giving up
+        """
+        self.global_rate = global_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.retries = 0
+        self._resume = None
+        self._gate = None
+        self._group_buckets = {}
+
+    async def initialize(self) -> None:
+        self._resume = asyncio.Event()
+        self._resume.set()
+        self._gate = _PriorityGate(TokenBucket(self.global_rate, 1), self._resume)
+        self._group_buckets = {}
+
+    async def shutdown(self) -> None:
+        if self._gate is not None:
+            self._gate.close()
+
+    def queue_depth(self):
+        """Number of messages waiting for a global token."""
+        return self._gate.waiting() if self._gate is not None else 0
+
+    def _group_bucket(self, chat_id):
+        bucket = self._group_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._group_buckets[chat_id] = TokenBucket(self.group_rate, 60)
+        return bucket
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        rank = _PRIORITY_RANKS.get(rate_limit_args, 0)
+        is_message = endpoint.startswith(_MESSAGE_ENDPOINT_PREFIXES)
+
+        group_id = None
+        if is_message:
+            try:
+                chat_id = int(data.get('chat_id'))
+            except (TypeError, ValueError):
+                chat_id = None
+            # Negative IDs are groups, supergroups and channels
+            if chat_id is not None and chat_id < 0:
+                group_id = chat_id
+
+        for attempt in range(self.max_retries + 1):
+            if group_id is not None:
+                delay = self._group_bucket(group_id).reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if is_message:
+                await self._gate.acquire(rank)
+            else:
+                await self._resume.wait()
+
+            started = time.perf_counter()
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+                TELEGRAM_REQUESTS.inc(method=endpoint, outcome='retry_after')
+                if attempt == self.max_retries:
+                    logger.error(f"{endpoint} still rate limited after {self.max_retries} retries")
+                    raise
+                self.retries += 1
+                TELEGRAM_RETRIES.inc(method=endpoint)
+                await self._pause(e.retry_after)
+            except Exception:
+                TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+                TELEGRAM_REQUESTS.inc(method=endpoint, outcome='error')
+                raise
+            else:
+                TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+                TELEGRAM_REQUESTS.inc(method=endpoint, outcome='ok')
+                return result
+
+    async def _pause(self, retry_after):
+        """Hold back every request for the time Telegram asked for."""
+        if not self._resume.is_set():
+            await self._resume.wait()
+            return
+        logger.warning(f"Telegram asked to retry after {retry_after} s, pausing outbound requests")
+        self._resume.clear()
+        try:
+            await asyncio.sleep(retry_after + 0.1)
+        finally:
+            self._resume.set()
@@ -0,0 +1,106 @@
+"""On-demand profiler of the update dispatch path.
+
+Admins start ``profiler`` for a number of seconds or a number of processed
+updates (/profile_start) and get the hotspots and the raw profile back when
+it stops (/profile_stop or automatically). cProfile is enabled on the event
+loop thread only while a session runs, so it sees every handler, the
+dispatch code of python-telegram-bot and the async database wrappers.
+Blocking database work in the DB threads is not included; the metrics have
+its timings. While no session runs, the only cost is one attribute check
+per update in ``OrderedApplication.process_update``.
+"""
+
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import time
+from collections import namedtuple
+
+from config import PROFILE_DIR, PROFILE_MAX_SECONDS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Outcome of a profiling session
+ProfileResult = namedtuple('ProfileResult', ['stats', 'path', 'seconds', 'updates'])
+
+
+class UpdateProfiler:
+    """A cProfile session that stops after a time or a number of updates."""
+
+    def __init__(self):
+        self._profile = None
+        self._started = None
+        self._updates = 0
+        self._update_limit = None
+        self._timer = None
+        self._on_finish = None
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def start(self, seconds=None, updates=None, on_finish=None):
+        """Start profiling the event loop thread.
+
+        Args:
+            seconds: Stop after this many seconds
+            updates: Stop after this many processed updates
+            on_finish: Coroutine function called with the ProfileResult when the
+                session stops on its own
+
+        Returns:
+            bool: False if a session is already running
+        """
+        if self.active:
+            return False
+        limit = min(seconds, PROFILE_MAX_SECONDS) if seconds else PROFILE_MAX_SECONDS
+        self._timer = asyncio.get_running_loop().call_later(limit, self._finish)
+        self._update_limit = updates
+        self._updates = 0
+        self._on_finish = on_finish
+        self._started = time.monotonic()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        logger.info(f"Profiling started for {f'{updates} updates' if updates else f'{limit:.0f} s'}")
+        return True
+
+    def update_processed(self):
+        """Count an update handled while a session runs; called for every update."""
+        if self._profile is None:
+            return
+        self._updates += 1
+        if self._update_limit is not None and self._updates >= self._update_limit:
+            self._finish()
+
+    def stop(self):
+        """Stop the running session and save the profile.
+
+        Returns:
+            ProfileResult: The collected profile, or None if no session was running
+        """
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+        self._timer.cancel()
+        self._on_finish = None
+        seconds = time.monotonic() - self._started
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"profile_{time.strftime('%Y-%m-%d_%H-%M-%S')}.prof")
+        profile.dump_stats(path)
+        logger.info(f"Profiling stopped after {seconds:.1f} s and {self._updates} updates, saved to {path}")
+        return ProfileResult(pstats.Stats(profile), path, seconds, self._updates)
+
+    def _finish(self):
+        """Stop on reaching the limit and hand the result to the on_finish callback."""
+        on_finish, self._on_finish = self._on_finish, None
+        result = self.stop()
+        if result is not None and on_finish is not None:
+            asyncio.get_running_loop().create_task(on_finish(result))
+
+
+profiler = UpdateProfiler()
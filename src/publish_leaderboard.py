@@ -1,14 +1,34 @@
 import logging
-import os
 import asyncio
 import re
 import random  # Import the random module
-from telegram import Bot
-from telegram.error import TelegramError
-from database import get_all_results, create_database, format_display_name
-from database.consent_db import get_all_child_user_ids  # Import the function to get child user IDs
-from config import BOT_TOKEN, CHAT_ID, DB_PATH
-from datetime import datetime
+import time
+from collections import deque, namedtuple
+from telegram.ext import ExtBot
+from telegram.error import TelegramError, NetworkError, BadRequest
+from database import (
+    results,
+    create_database,
+    init_consent_db,
+    format_display_name,
+    start_new_season,
+    sync_archive,
+    BRACKET_PRO,
+    BRACKET_ADVANCED,
+    BRACKET_AMATEUR,
+    BRACKET_CHILDREN
+)
+from chunking import iter_chunks
+from outbound import OutboundScheduler, PRIORITY_BULK
+from config import (
+    BOT_TOKEN,
+    TELEGRAM_BASE_URL,
+    CHAT_ID,
+    PUBLISH_CONCURRENCY,
+    PUBLISH_MAX_ATTEMPTS,
+    PUBLISH_RETRY_BASE_DELAY,
+    PUBLISH_DELIVERY_POLICY
+)
 
 # Configure logging
 logging.basicConfig(
@@ -56,143 +76,273 @@ def parse_chat_ids(chat_id_config):
     return [id.strip() for id in ids if id.strip()]
 
 def reset_database():
-    """Backup the old database with timestamp and create a new one."""
+    """Close the current season and start a new one inside the results database.
+
+    The rollover is a single transaction on the shared database file, so the
+    running bot keeps its connections and picks the new season up on its own.
+    """
     try:
-        # Use the centralized database path from config
-        if os.path.exists(DB_PATH):
-            # Create a timestamp in format YYYY-MM-DD
-            timestamp = datetime.now().strftime('%Y-%m-%d')
-            
-            # Generate backup filename with timestamp
-            db_name = os.path.basename(DB_PATH)
-            db_dir = os.path.dirname(DB_PATH)
-            backup_filename = f"{db_name.split('.')[0]}_{timestamp}.db"
-            backup_path = os.path.join(db_dir, backup_filename)
-            
-            # Rename the old database file instead of deleting it
-            os.rename(DB_PATH, backup_path)
-            logger.info(f"Old database backed up to: {backup_path}")
-        
-        # Create a new database using the function from database module
-        create_database()
-        logger.info("New database initialized")
+        new_season = start_new_season()
+        logger.info(f"Season {new_season} started")
     except Exception as e:
         logger.error(f"Error resetting database: {e}")
         raise
 
+    # The season is closed either way; the bot syncs the archive again when it picks the season up
+    try:
+        sync_archive()
+    except Exception as e:
+        logger.error(f"Error archiving the closed season: {e}")
+
+# Outcome of sending the publication to one group
+Delivery = namedtuple('Delivery', ['chat_id', 'delivered', 'attempts', 'error', 'elapsed'])
+
+class SharedChunks:
+    """Message texts of the publication, rendered as the groups ask for them.
+
+    Every group reads the same sequence of chunks at its own pace. A chunk is
+    rendered when the first group needs it and dropped once every group still
+    being delivered to has sent it, so only the tail between the slowest and
+    the fastest group is kept in memory. Groups waiting for a send slot hold
+    their place at the first chunk.
+    """
+
+    def __init__(self, chunks, readers):
+        """
+        Args:
+            chunks: Async iterable of message texts
+            readers: Keys of the groups that will read the chunks
+        """
+        self._chunks = chunks.__aiter__()
+        self._buffer = deque()
+        self._first = 0  # index of the first buffered chunk
+        self._positions = dict.fromkeys(readers, 0)  # reader -> index of its next chunk
+        self._render_lock = asyncio.Lock()
+        self._finished = False
+        self.rendered = 0
+        self.error = None
+
+    async def get(self, reader):
+        """Return the reader's next chunk, or None once it has sent them all.
+
+        Raises:
+            Exception: The error that stopped rendering, once the reader reaches it
+        """
+        index = self._positions[reader]
+        async with self._render_lock:
+            while index >= self.rendered and not self._finished:
+                try:
+                    chunk = await self._chunks.__anext__()
+                except StopAsyncIteration:
+                    self._finished = True
+                except Exception as e:
+                    self.error = e
+                    self._finished = True
+                else:
+                    self._buffer.append(chunk)
+                    self.rendered += 1
+        if index < self.rendered:
+            return self._buffer[index - self._first]
+        if self.error is not None:
+            raise self.error
+        return None
+
+    def advance(self, reader):
+        """Mark the reader's current chunk as sent."""
+        self._positions[reader] += 1
+        self._trim()
+
+    def release(self, reader):
+        """Stop keeping chunks for a reader that is done, successfully or not."""
+        del self._positions[reader]
+        self._trim()
+
+    async def close(self):
+        """Stop rendering, e.g. when every group failed before the end."""
+        await self._chunks.aclose()
+
+    def _trim(self):
+        oldest = min(self._positions.values(), default=self.rendered)
+        while self._first < oldest:
+            self._buffer.popleft()
+            self._first += 1
+
+def _is_retryable(error):
+    """Timeouts and connection problems are worth retrying, rejected requests are not."""
+    # BadRequest (and its subclasses) derive from NetworkError but will fail again
+    return isinstance(error, NetworkError) and not isinstance(error, BadRequest)
+
+async def deliver(bot, chat_id, chunks, reader, semaphore):
+    """Send the publication to one group, retrying transient errors with exponential backoff.
+
+    The messages are sent in order, each as soon as it is rendered; after a
+    transient error the failed message is retried, so a group never gets the
+    publication with a part missing in the middle. A timed out request may
+    still have reached Telegram, so a retry can occasionally post a message
+    twice; losing a group's publication is the worse outcome.
+
+    Args:
+        bot: Bot used for sending
+        chat_id: Group chat ID as configured
+        chunks: SharedChunks of the publication
+        reader: This group's key in ``chunks``
+        semaphore: Bounds the number of groups sent to at once
+
+    Returns:
+        Delivery: Outcome for the group
+    """
+    started = time.monotonic()
+    error = None
+    attempts = 0
+    sent = 0
+    try:
+        async with semaphore:
+            failures = 0
+            while True:
+                try:
+                    text = await chunks.get(reader)
+                except Exception as e:
+                    error = e
+                    logger.error(f"Rendering the leaderboard for group {chat_id} failed: {e}")
+                    break
+                if text is None:
+                    logger.info(f"Leaderboard published successfully to group {chat_id}")
+                    return Delivery(chat_id, True, attempts, None, time.monotonic() - started)
+                attempts += 1
+                try:
+                    await bot.send_message(chat_id=int(chat_id), text=text, rate_limit_args=PRIORITY_BULK)
+                    chunks.advance(reader)
+                    sent += 1
+                    failures = 0
+                except TelegramError as e:
+                    error = e
+                    failures += 1
+                    if not _is_retryable(e) or failures >= max(1, PUBLISH_MAX_ATTEMPTS):
+                        break
+                    delay = PUBLISH_RETRY_BASE_DELAY * 2 ** (failures - 1) * random.uniform(0.8, 1.2)
+                    logger.warning(f"Sending to group {chat_id} failed ({e}), retrying in {delay:.1f} s")
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    error = e
+                    logger.error(f"Unexpected error sending to group {chat_id}: {e}")
+                    break
+    finally:
+        chunks.release(reader)
+    logger.error(
+        f"Failed to send leaderboard to group {chat_id} after {attempts} attempt(s), "
+        f"{sent} messages sent: {error}"
+    )
+    return Delivery(chat_id, False, attempts, error, time.monotonic() - started)
+
+def delivery_policy_met(deliveries, policy=PUBLISH_DELIVERY_POLICY):
+    """Check whether enough groups received the publication to reset the results."""
+    delivered = sum(1 for d in deliveries if d.delivered)
+    if policy == "all":
+        return delivered == len(deliveries)
+    if policy == "majority":
+        return delivered * 2 > len(deliveries)
+    return delivered > 0
+
+def format_delivery_report(deliveries):
+    """Format the per-group delivery report for the log."""
+    delivered = sum(1 for d in deliveries if d.delivered)
+    lines = [f"Delivery report: {delivered}/{len(deliveries)} groups"]
+    for d in deliveries:
+        status = "delivered" if d.delivered else f"FAILED ({d.error})"
+        lines.append(f"  {d.chat_id}: {status}, attempts: {d.attempts}, {d.elapsed:.1f} s")
+    return "\n".join(lines)
+
+def _format_winner(label, result, suffix=""):
+    """Format a group winner line with the Telegram username if there is one."""
+    _, first_name, last_name, username, score, tens = result
+    winner = format_display_name(first_name, last_name)
+    username_display = f" (@{username})" if username else ""
+    return f"{label}: {winner}{username_display} {score}-{tens}{suffix}\n"
+
+def _format_table_row(position, result, suffix=""):
+    """Format one line of a group's full table."""
+    _, first_name, last_name, _, best_series, total_tens = result
+    display_name = format_display_name(first_name, last_name)
+    return f"{position}. {display_name}: {best_series}-{total_tens}{suffix}\n"
+
+async def _render_table(header, bracket, suffix=""):
+    """Yield the lines of the full table of one group, streamed from the database."""
+    yield f"{header}\n"
+    position = 0
+    async for result in results.stream_bracket(bracket):
+        position += 1
+        yield _format_table_row(position, result, suffix)
+    if position == 0:
+        yield "В этой группе пока нет результатов.\n"
+
+async def render_publication(closing):
+    """Yield the lines of the season leaderboard: winners, detailed tables and the closing text."""
+    # Winners of the four groups (including children), filtered and sorted by the database
+    pro_top = await results.bracket(BRACKET_PRO, limit=1)
+    semi_pro_top = await results.bracket(BRACKET_ADVANCED, limit=1)
+    amateur_top = await results.bracket(BRACKET_AMATEUR, limit=1)
+    child_top = await results.bracket(BRACKET_CHILDREN, limit=1)
+    
+    yield "🏅 Наши победители 🏅\n\n"
+    
+    # Check if any group has participants
+    if not (pro_top or semi_pro_top or amateur_top or child_top):
+        yield "Пока нет участников ни в одной группе.\n"
+    else:
+        if pro_top:
+            yield _format_winner("👑 Профи", pro_top[0], "x")
+        if semi_pro_top:
+            yield _format_winner("🥈 Продвинутые", semi_pro_top[0])
+        if amateur_top:
+            yield _format_winner("🥉 Любители", amateur_top[0])
+        if child_top:
+            yield _format_winner("🌟 Дети", child_top[0])
+    
+    # Now show the detailed leaderboard tables
+    yield "\n📊 Подробная таблица 📊\n\n"
+    async for line in _render_table("👑 Группа Профи 👑", BRACKET_PRO, "x"):
+        yield line
+    yield "\n"
+    async for line in _render_table("🥈 Группа Продвинутые 🥈", BRACKET_ADVANCED):
+        yield line
+    yield "\n"
+    async for line in _render_table("🥉 Группа Любители 🥉", BRACKET_AMATEUR):
+        yield line
+    yield "\n"
+    async for line in _render_table("🌟 Группа Дети 🌟", BRACKET_CHILDREN):
+        yield line
+    
+    for line in closing:
+        yield line
+
 async def publish_leaderboard():
     """Publish leaderboard to all group chats and reset the database."""
+    bot = None
     try:
-        # Get all results from the database
-        results = get_all_results()
+        # The bracket queries read the child flags from consent.db
+        init_consent_db()
+        create_database()
         
-        if not results:
+        # Check if there is anything to publish
+        if not await results.exists():
             logger.info("No results found. Skipping leaderboard publication.")
             return  # Early return - don't send any messages
         
-        # Create bot instance
-        bot = Bot(token=BOT_TOKEN)
+        # Create bot instance; sends are paced by the outbound scheduler
+        bot = ExtBot(token=BOT_TOKEN, base_url=TELEGRAM_BASE_URL, rate_limiter=OutboundScheduler())
+        await bot.initialize()
         
         # Get bot information to use the real username
         bot_info = await bot.get_me()
         bot_username = f"@{bot_info.username}" if bot_info.username else ""
         
-        # Get all child user IDs first
-        child_user_ids = get_all_child_user_ids()
-        
-        # Filter results into four groups (including children)
-        pro_results = [r for r in results if r[4] >= 93 and r[0] not in child_user_ids]  # Best series at index 4
-        semi_pro_results = [r for r in results if 80 <= r[4] <= 92 and r[0] not in child_user_ids]
-        amateur_results = [r for r in results if r[4] <= 79 and r[0] not in child_user_ids]
-        child_results = [r for r in results if r[0] in child_user_ids]  # Using child_user_ids instead of r[6]
-        
-        # Sort each group by best_series and total_tens
-        pro_sorted = sorted(pro_results, key=lambda x: (x[4], x[5]), reverse=True)
-        semi_pro_sorted = sorted(semi_pro_results, key=lambda x: (x[4], x[5]), reverse=True)
-        amateur_sorted = sorted(amateur_results, key=lambda x: (x[4], x[5]), reverse=True)
-        child_sorted = sorted(child_results, key=lambda x: (x[4], x[5]), reverse=True)
-        
-        # Create message
-        message = "🏅 Наши победители 🏅\n\n"
-        
-        # Check if any group has participants
-        if not (pro_sorted or semi_pro_sorted or amateur_sorted or child_sorted):
-            message += "Пока нет участников ни в одной группе.\n"
-        else:
-            if pro_sorted:
-                _, first_name, last_name, username, score, tens = pro_sorted[0]
-                winner = format_display_name(first_name, last_name)
-                username_display = f" (@{username})" if username else ""
-                message += f"👑 Профи: {winner}{username_display} {score}-{tens}x\n"
-            if semi_pro_sorted:
-                _, first_name, last_name, username, score, tens = semi_pro_sorted[0]
-                winner = format_display_name(first_name, last_name)
-                username_display = f" (@{username})" if username else ""
-                message += f"🥈 Продвинутые: {winner}{username_display} {score}-{tens}\n"
-            if amateur_sorted:
-                _, first_name, last_name, username, score, tens = amateur_sorted[0]
-                winner = format_display_name(first_name, last_name)
-                username_display = f" (@{username})" if username else ""
-                message += f"🥉 Любители: {winner}{username_display} {score}-{tens}\n"
-            if child_sorted:
-                _, first_name, last_name, username, score, tens = child_sorted[0]
-                winner = format_display_name(first_name, last_name)
-                username_display = f" (@{username})" if username else ""
-                message += f"🌟 Дети: {winner}{username_display} {score}-{tens}\n"
-        
-        # Now show the detailed leaderboard tables
-        message += "\n📊 Подробная таблица 📊\n\n"
-        
-        # Pro group
-        message += "👑 Группа Профи 👑\n"
-        if not pro_sorted:
-            message += "В этой группе пока нет результатов.\n\n"
-        else:
-            for i, result in enumerate(pro_sorted, 1):
-                _, first_name, last_name, _, best_series, total_tens = result
-                display_name = format_display_name(first_name, last_name)
-                message += f"{i}. {display_name}: {best_series}-{total_tens}x\n"
-            message += "\n"
-        
-        # Semi-pro group
-        message += "🥈 Группа Продвинутые 🥈\n"
-        if not semi_pro_sorted:
-            message += "В этой группе пока нет результатов.\n\n"
-        else:
-            for i, result in enumerate(semi_pro_sorted, 1):
-                _, first_name, last_name, _, best_series, total_tens = result
-                display_name = format_display_name(first_name, last_name)
-                message += f"{i}. {display_name}: {best_series}-{total_tens}\n"
-            message += "\n"
-        
-        # Amateur group
-        message += "🥉 Группа Любители 🥉\n"
-        if not amateur_sorted:
-            message += "В этой группе пока нет результатов.\n\n"
-        else:
-            for i, result in enumerate(amateur_sorted, 1):
-                _, first_name, last_name, _, best_series, total_tens = result
-                display_name = format_display_name(first_name, last_name)
-                message += f"{i}. {display_name}: {best_series}-{total_tens}\n"
-            message += "\n"
-        
-        # Children group (new)
-        message += "🌟 Группа Дети 🌟\n"
-        if not child_sorted:
-            message += "В этой группе пока нет результатов.\n\n"
-        else:
-            for i, result in enumerate(child_sorted, 1):
-                _, first_name, last_name, _, best_series, total_tens = result
-                display_name = format_display_name(first_name, last_name)
-                message += f"{i}. {display_name}: {best_series}-{total_tens}\n"
-            message += "\n"
-            
         # Select a random congratulatory message
         random_congrats = random.choice(CONGRATULATORY_MESSAGES)
-        message += f"{random_congrats}\n"
-        message += f"\nОбнимаем мысленно и всегда рядом — ваш {bot_username} ☕️🧸"
-
-
+        closing = [
+            f"\n{random_congrats}\n",
+            f"\nОбнимаем мысленно и всегда рядом — ваш {bot_username} ☕️🧸"
+        ]
+        
         # Parse CHAT_ID to get multiple group IDs
         chat_ids = parse_chat_ids(CHAT_ID)
         
@@ -202,29 +352,39 @@ async def publish_leaderboard():
             
         logger.info(f"Attempting to publish leaderboard to {len(chat_ids)} groups: {chat_ids}")
         
-        # Send message to each group
-        success_count = 0
-        for chat_id in chat_ids:
-            try:
-                chat_id_int = int(chat_id)
-                await bot.send_message(chat_id=chat_id_int, text=message)
-                logger.info(f"Leaderboard published successfully to group {chat_id}")
-                success_count += 1
-            except TelegramError as e:
-                logger.error(f"Failed to send leaderboard to group {chat_id}: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error sending to group {chat_id}: {e}")
+        # Split into messages that fit Telegram's limit while the tables are still being
+        # rendered; every group gets the same messages and sends each one as soon as it is full
+        readers = range(len(chat_ids))
+        chunks = SharedChunks(iter_chunks(render_publication(closing)), readers)
+        
+        # Send to all groups at once (bounded), so a slow or failing group does not hold up the others
+        semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+        deliveries = await asyncio.gather(
+            *(deliver(bot, chat_id, chunks, reader, semaphore) for reader, chat_id in zip(readers, chat_ids))
+        )
+        await chunks.close()
+        logger.info(f"Leaderboard rendered as {chunks.rendered} messages")
+        logger.info(format_delivery_report(deliveries))
+        
+        if chunks.error is not None:
+            # Only part of the publication could go out; keep the season open
+            raise chunks.error
         
-        if success_count > 0:
-            # Reset the database for the next period only if at least one publish was successful
+        if delivery_policy_met(deliveries):
+            # Reset the database for the next period only once the delivery policy is met
             reset_database()  # Using our new function that handles complete reset
             logger.info("Database reset for next period")
         else:
-            logger.error("Failed to publish leaderboard to any group. Database not reset.")
+            logger.error(
+                f"Delivery policy '{PUBLISH_DELIVERY_POLICY}' not met. Database not reset."
+            )
         
     except Exception as e:
         logger.error(f"Error in publish_leaderboard: {e}")
         raise
+    finally:
+        if bot is not None:
+            await bot.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(publish_leaderboard())
@@ -16,6 +16,9 @@ from .consent import (
 from .membership import (
     is_user_in_chat,
     is_user_in_group,
+    invalidate_membership,
+    track_chat_member,
+    get_membership_cache_stats,
     _handle_telegram_error,
     _extract_new_group_id
 )
@@ -24,7 +27,16 @@ from .membership import (
 from .messages import handle_group_message
 
 # Import the leaderboard functions
-from .leaderboard import leaderboard, leaderboard_all
+from .leaderboard import (
+    leaderboard,
+    leaderboard_all,
+    stream_cached_render,
+    get_leaderboard_cache_stats,
+    BRACKET_NAMES
+)
+
+# Import the submission history and all-time best handlers
+from .history import history, history_page_callback, mybest, HISTORY_CALLBACK_PREFIX
 
 # Import and expose admin functionality
 from .admin import (
@@ -33,6 +45,11 @@ from .admin import (
     handle_admin_callback,
     modify_user_result,
     delete_user,
+    backup_command,
+    all_time_leaderboard,
+    metrics_command,
+    profile_start_command,
+    profile_stop_command,
     register_admin_handlers
 )
 
@@ -45,15 +62,30 @@ __all__ = [
     'CONSENT_DB',
     'is_user_in_chat',
     'is_user_in_group',
+    'invalidate_membership',
+    'track_chat_member',
+    'get_membership_cache_stats',
     '_handle_telegram_error',
     '_extract_new_group_id',
     'handle_group_message',
     'leaderboard',
     'leaderboard_all',
+    'stream_cached_render',
+    'get_leaderboard_cache_stats',
+    'BRACKET_NAMES',
+    'history',
+    'history_page_callback',
+    'mybest',
+    'HISTORY_CALLBACK_PREFIX',
     'is_admin',
     'handle_admin_command',
     'handle_admin_callback',
     'modify_user_result',
     'delete_user',
+    'backup_command',
+    'all_time_leaderboard',
+    'metrics_command',
+    'profile_start_command',
+    'profile_stop_command',
     'register_admin_handlers'
 ]
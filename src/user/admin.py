@@ -1,16 +1,17 @@
 import os
+import asyncio
 import logging
 from typing import List
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 
-from database import add_user_result, get_user_result, format_display_name
-from config import DB_PATH
-import sqlite3
-
-# Constants for the consent database
-CONSENT_DB = os.path.join(os.environ.get('DATA_DIR', './data'), 'consent.db')
+from database import results, consent, archive, format_display_name, run_backup
+from outbound import PRIORITY_BULK
+from chunking import iter_chunks
+from config import PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS
+from profiling import profiler
+import metrics
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +20,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Places shown by the all-time leaderboard unless /alltime is given a number
+ALL_TIME_DEFAULT_LIMIT = 50
+
+# Lines per section of the /metrics summary
+METRICS_SUMMARY_TOP = 10
+
+# Functions listed per ranking of a profile summary
+PROFILE_SUMMARY_TOP = 15
+
 # Load admin IDs from environment
 def get_admin_ids() -> List[int]:
     """Get the list of admin user IDs from environment variables."""
@@ -61,7 +71,9 @@ async def handle_admin_command(update: Update, context: ContextTypes.DEFAULT_TYP
         [InlineKeyboardButton("📋 Список всех пользователей", callback_data='admin_list_users')],
         [InlineKeyboardButton("🔄 Изменить результат пользователя", callback_data='admin_modify')],
         [InlineKeyboardButton("🗑️ Удалить пользователя", callback_data='admin_delete')],
-        [InlineKeyboardButton("👶 Изменить статус ребенка", callback_data='admin_child_status')]
+        [InlineKeyboardButton("👶 Изменить статус ребенка", callback_data='admin_child_status')],
+        [InlineKeyboardButton("🏛️ Рейтинг за все сезоны", callback_data='admin_all_time')],
+        [InlineKeyboardButton("💾 Резервная копия", callback_data='admin_backup')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -117,88 +129,364 @@ async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TY
         # List all users in the database
         logger.info(f"Admin {user_id} requested list of all users")
         try:
-            # Check if the database file exists
-            if not os.path.exists(DB_PATH):
-                await query.edit_message_text(
-                    "❌ База данных не найдена."
-                )
-                return
-            
-            # Connect to database
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Check if the table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_results'")
-            if not cursor.fetchone():
-                await query.edit_message_text(
-                    "❌ Таблица 'user_results' не найдена в базе данных."
-                )
-                conn.close()
-                return
-            
-            # Get all users - use first_name and last_name instead of full_name
-            cursor.execute("SELECT user_id, first_name, last_name, username, best_series, total_tens FROM user_results ORDER BY best_series DESC, total_tens DESC")
-            users = cursor.fetchall()
-            conn.close()
-            
-            if not users:
+            if not await results.exists():
                 await query.edit_message_text("📋 База данных пользователей пуста.")
                 return
             
-            # Get child status information from the consent database
-            child_status = {}
-            if os.path.exists(CONSENT_DB):
-                consent_conn = sqlite3.connect(CONSENT_DB)
-                consent_cursor = consent_conn.cursor()
-                
-                # Check if the user_consent table exists
-                consent_cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_consent'")
-                if consent_cursor.fetchone():
-                    # Get child status for all users
-                    consent_cursor.execute("SELECT user_id, is_child FROM user_consent")
-                    for user_id, is_child in consent_cursor.fetchall():
-                        child_status[user_id] = bool(is_child)
-                
-                consent_conn.close()
-                
-            # Format list of users
-            users_text = "📋 Список всех пользователей:\n\n"
-            
-            # Send the first message
-            sent_message = await query.edit_message_text(users_text)
-            
-            # Process all users in batches of 40
-            batch_count = 0
-            batch_text = ""
-            
-            for i, (uid, first_name, last_name, username, series, tens) in enumerate(users, 1):
-                display_name = format_display_name(first_name, last_name)
-                
-                # Add child status if available
-                child_indicator = " 👶" if child_status.get(uid, False) else ""
-                
-                # Add this user to current batch
-                batch_text += f"{i}. {display_name}{child_indicator} {f'@{username}' if username else ''} (ID: {uid}) - Серия: {series}, Десятки: {tens}\n"
-                
-                # When reached 40 users or at the end, send the batch
-                if i % 40 == 0 or i == len(users):
-                    # For first batch, update the initial message
-                    if batch_count == 0:
-                        await sent_message.edit_text(users_text + batch_text)
-                    else:
-                        # For subsequent batches, send new messages
-                        await query.message.reply_text(f"📋 Список пользователей (продолжение):\n\n{batch_text}")
-                    
-                    # Reset batch text and increment counter
-                    batch_text = ""
-                    batch_count += 1
+            # Messages are filled up to Telegram's size limit and sent as soon as they are full
+            first_message = True
+            async for chunk in iter_chunks(user_list_lines(), continuation_header=USER_LIST_CONTINUATION):
+                if first_message:
+                    # The first part replaces the admin menu message
+                    await query.edit_message_text(chunk)
+                    first_message = False
+                else:
+                    # Further parts are sent as new messages; they queue behind user replies
+                    await context.bot.send_message(
+                        chat_id=query.message.chat_id,
+                        text=chunk,
+                        rate_limit_args=PRIORITY_BULK
+                    )
             
         except Exception as e:
             logger.error(f"Error listing users: {e}")
             await query.edit_message_text(
                 f"❌ Произошла ошибка при получении списка пользователей:\n{str(e)}"
             )
+    
+    elif query.data == 'admin_all_time':
+        logger.info(f"Admin {user_id} requested the all-time leaderboard")
+        try:
+            first_message = True
+            async for chunk in all_time_chunks(ALL_TIME_DEFAULT_LIMIT):
+                if first_message:
+                    await query.edit_message_text(chunk)
+                    first_message = False
+                else:
+                    await context.bot.send_message(
+                        chat_id=query.message.chat_id,
+                        text=chunk,
+                        rate_limit_args=PRIORITY_BULK
+                    )
+        except Exception as e:
+            logger.error(f"Error building the all-time leaderboard: {e}")
+            await query.edit_message_text(f"❌ Произошла ошибка при построении рейтинга:\n{str(e)}")
+    
+    elif query.data == 'admin_backup':
+        logger.info(f"Admin {user_id} requested a backup")
+        await query.edit_message_text("⏳ Создаю резервную копию...")
+        await query.edit_message_text(await backup_now())
+
+# Header of every message of the user list after the first
+USER_LIST_CONTINUATION = "📋 Список пользователей (продолжение):\n\n"
+
+def format_user_line(position, row, child_status):
+    """Format one line of the admin user list."""
+    uid, first_name, last_name, username, series, tens = row
+    display_name = format_display_name(first_name, last_name)
+    
+    # Add child status if available
+    child_indicator = " 👶" if child_status.get(uid, False) else ""
+    
+    return f"{position}. {display_name}{child_indicator} {f'@{username}' if username else ''} (ID: {uid}) - Серия: {series}, Десятки: {tens}\n"
+
+async def user_list_lines():
+    """Yield the lines of the admin list of all users, best result first."""
+    # Get child status information from the consent database
+    child_status = await consent.child_status_map()
+    
+    yield "📋 Список всех пользователей:\n\n"
+    position = 0
+    # Users are read from the database page by page
+    async for row in results.stream_all():
+        position += 1
+        yield format_user_line(position, row, child_status)
+
+async def all_time_chunks(limit):
+    """Yield the all-time leaderboard as Telegram-sized message texts."""
+    rows = await archive.all_time(limit)
+    if not rows:
+        yield "🏛️ Архив результатов пуст."
+        return
+    
+    def lines():
+        yield f"🏛️ Рейтинг за все сезоны (топ {len(rows)}):\n\n"
+        for i, (uid, first_name, last_name, username, series, tens, _, seasons) in enumerate(rows, 1):
+            display_name = format_display_name(first_name, last_name)
+            yield f"{i}. {display_name} {f'@{username}' if username else ''} (ID: {uid}) - Серия: {series}, Десятки: {tens}, сезонов: {seasons}\n"
+    
+    async for chunk in iter_chunks(lines(), continuation_header="🏛️ Рейтинг за все сезоны (продолжение):\n\n"):
+        yield chunk
+
+async def all_time_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show every user's best result across all seasons (admin only)."""
+    # Silently ignore if not in private chat
+    if not await is_private_chat(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("У вас нет прав администратора.")
+        return
+    
+    limit = ALL_TIME_DEFAULT_LIMIT
+    if context.args:
+        try:
+            limit = int(context.args[0])
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            await update.message.reply_text(
+                "Неверный формат команды. Используйте:\n"
+                "/alltime [количество мест]"
+            )
+            return
+    
+    logger.info(f"Admin {user_id} requested the all-time leaderboard (top {limit})")
+    async for chunk in all_time_chunks(limit):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=chunk,
+            rate_limit_args=PRIORITY_BULK
+        )
+
+def format_backup_report(backup_results) -> str:
+    """Format the outcome of a backup run for an admin."""
+    if backup_results is None:
+        return "⏳ Резервное копирование уже выполняется, попробуйте чуть позже."
+    
+    lines = ["💾 Резервное копирование:\n"]
+    for result in backup_results:
+        if result.ok:
+            lines.append(
+                f"✅ {result.name}: {os.path.basename(result.path)}, "
+                f"{result.size / 1024:.0f} КБ, {result.seconds:.1f} с"
+            )
+        else:
+            lines.append(f"❌ {result.name}: {result.error}")
+    return "\n".join(lines)
+
+async def backup_now() -> str:
+    """Run a backup off the event loop and return the report text."""
+    # Snapshots can take a while, so they run in a worker thread instead of the DB executor
+    backup_results = await asyncio.to_thread(run_backup)
+    return format_backup_report(backup_results)
+
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Take an online backup of the databases right away (admin only)."""
+    # Silently ignore if not in private chat
+    if not await is_private_chat(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("У вас нет прав администратора.")
+        return
+    
+    logger.info(f"Admin {user_id} requested a backup")
+    await update.message.reply_text("⏳ Создаю резервную копию...")
+    await update.message.reply_text(await backup_now())
+
+def _latency_rows(histogram):
+    """Return (label values, count, total seconds, p50 ms, p95 ms) of every series of a histogram."""
+    rows = []
+    for values, (counts, total, count) in histogram.snapshot().items():
+        rows.append((
+            values, count, total,
+            histogram.quantile(counts, 0.5) * 1000,
+            histogram.quantile(counts, 0.95) * 1000
+        ))
+    return rows
+
+def _gauge_values(name):
+    metric = metrics.get_metric(name)
+    return metric.values() if metric is not None else {}
+
+def format_metrics_summary() -> str:
+    """Summarise the collected metrics for an admin."""
+    uptime_minutes = int(metrics.uptime_seconds() // 60)
+    lines = [f"📈 Метрики за {uptime_minutes // 60} ч {uptime_minutes % 60} мин работы\n"]
+    
+    handler_errors = metrics.HANDLER_ERRORS.values()
+    lines.append("⚙️ Обработчики (вызовов, p50/p95):")
+    handlers = sorted(_latency_rows(metrics.HANDLER_SECONDS), key=lambda row: -row[1])
+    for (handler, action), count, _, p50, p95 in handlers[:METRICS_SUMMARY_TOP]:
+        name = f"{handler} [{action}]" if action else handler
+        errors = handler_errors.get((handler, action), 0)
+        lines.append(f"• {name}: {count}, {p50:.1f}/{p95:.1f} мс" + (f", ошибок: {errors}" if errors else ""))
+    if not handlers:
+        lines.append("• пока нет данных")
+    
+    lines.append("\n🗄️ База данных (по общему времени):")
+    db_calls = sorted(_latency_rows(metrics.DB_SECONDS), key=lambda row: -row[2])
+    for (function,), count, total, p50, p95 in db_calls[:METRICS_SUMMARY_TOP]:
+        lines.append(f"• {function}: {count}, {p50:.1f}/{p95:.1f} мс, всего {total:.1f} с")
+    if not db_calls:
+        lines.append("• пока нет данных")
+    
+    requests = metrics.TELEGRAM_REQUESTS.values()
+    retries = metrics.TELEGRAM_RETRIES.values()
+    lines.append("\n📡 Telegram API (запросов, p50/p95):")
+    api_calls = sorted(_latency_rows(metrics.TELEGRAM_SECONDS), key=lambda row: -row[1])
+    for (method,), count, _, p50, p95 in api_calls[:METRICS_SUMMARY_TOP]:
+        line = f"• {method}: {count}, {p50:.0f}/{p95:.0f} мс"
+        if requests.get((method, 'error')):
+            line += f", ошибок: {requests[(method, 'error')]}"
+        if retries.get((method,)):
+            line += f", повторов после 429: {retries[(method,)]}"
+        lines.append(line)
+    if not api_calls:
+        lines.append("• пока нет данных")
+    
+    misses = _gauge_values('bot_cache_misses_total')
+    entries = _gauge_values('bot_cache_entries')
+    lines.append("\n🧠 Кэши:")
+    for (cache,), hits in sorted(_gauge_values('bot_cache_hits_total').items()):
+        lookups = hits + misses.get((cache,), 0)
+        hit_rate = f"{hits / lookups:.0%}" if lookups else "—"
+        lines.append(f"• {cache}: попаданий {hit_rate} ({hits} из {lookups}), записей: {entries.get((cache,), 0)}")
+    
+    queues = {name: _gauge_values(name).get((), 0) for name in (
+        'bot_write_queue_depth', 'bot_outbound_queue_depth', 'bot_write_batches_total'
+    )}
+    lines.append(
+        f"\n📥 Очереди: запись — {queues['bot_write_queue_depth']}, "
+        f"отправка — {queues['bot_outbound_queue_depth']}, "
+        f"пакетов записано: {queues['bot_write_batches_total']}"
+    )
+    return "\n".join(lines)
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show a short summary of the bot's metrics (admin only)."""
+    # Silently ignore if not in private chat
+    if not await is_private_chat(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("У вас нет прав администратора.")
+        return
+    
+    logger.info(f"Admin {user_id} requested the metrics summary")
+    async for chunk in iter_chunks(format_metrics_summary().splitlines(keepends=True)):
+        await update.message.reply_text(chunk)
+
+def parse_profile_limit(arg):
+    """Parse the /profile_start argument: seconds ("30", "30s") or updates ("200u").
+
+    Returns:
+        tuple: (seconds, updates), one of them None; None for an invalid argument
+    """
+    arg = arg.strip().lower()
+    unit = arg[-1:] if arg[-1:] in ('s', 'u') else 's'
+    try:
+        value = int(arg[:-1] if arg[-1:] in ('s', 'u') else arg)
+    except ValueError:
+        return None
+    if value <= 0:
+        return None
+    return (value, None) if unit == 's' else (None, value)
+
+def _format_function(func):
+    filename, line, name = func
+    if filename == '~':  # built-in functions
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+def format_profile_summary(result, limit=PROFILE_SUMMARY_TOP) -> str:
+    """Format the hotspots of a profiling session, by own and by cumulative time."""
+    stats = result.stats.stats  # {function: (primitive calls, calls, own time, cumulative time, callers)}
+    total_calls = sum(calls for _, calls, _, _, _ in stats.values())
+    lines = [
+        f"🔥 Профиль: {result.seconds:.1f} с, обновлений: {result.updates}, "
+        f"вызовов функций: {total_calls}\n"
+    ]
+    for title, index in (("По собственному времени:", 2), ("По времени с вложенными вызовами:", 3)):
+        lines.append(title)
+        ranked = sorted(stats.items(), key=lambda item: -item[1][index])[:limit]
+        for position, (func, (_, calls, own, cumulative, _)) in enumerate(ranked, 1):
+            lines.append(f"{position}. {own:.3f} / {cumulative:.3f} с, {calls}× {_format_function(func)}")
+        lines.append("")
+    return "\n".join(lines)
+
+async def send_profile(bot, chat_id, result) -> None:
+    """Send the hotspot summary and the .prof file of a profiling session."""
+    async for chunk in iter_chunks(format_profile_summary(result).splitlines(keepends=True)):
+        await bot.send_message(chat_id=chat_id, text=chunk)
+    with open(result.path, 'rb') as profile_file:
+        await bot.send_document(
+            chat_id=chat_id,
+            document=profile_file,
+            filename=os.path.basename(result.path),
+            caption="Профиль для pstats или snakeviz"
+        )
+
+async def profile_start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Start profiling the update dispatch for N seconds or N updates (admin only)."""
+    # Silently ignore if not in private chat
+    if not await is_private_chat(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("У вас нет прав администратора.")
+        return
+    
+    limit = parse_profile_limit(context.args[0]) if context.args else (PROFILE_DEFAULT_SECONDS, None)
+    if limit is None:
+        await update.message.reply_text(
+            "Неверный формат команды. Используйте:\n"
+            "/profile_start [секунды] — например, /profile_start 60\n"
+            "/profile_start [N]u — до N обработанных обновлений, например, /profile_start 200u"
+        )
+        return
+    seconds, updates = limit
+    
+    chat_id = update.effective_chat.id
+    bot = context.bot
+    
+    async def on_finish(result):
+        try:
+            await send_profile(bot, chat_id, result)
+        except Exception as e:
+            logger.error(f"Failed to send the profile to admin {user_id}: {e}")
+    
+    if not profiler.start(seconds=seconds, updates=updates, on_finish=on_finish):
+        await update.message.reply_text("Профилирование уже запущено. Остановить: /profile_stop")
+        return
+    
+    logger.info(f"Admin {user_id} started profiling ({seconds} s, {updates} updates)")
+    if updates:
+        scope = f"{updates} обновлений (не дольше {PROFILE_MAX_SECONDS} с)"
+    else:
+        scope = f"{min(seconds, PROFILE_MAX_SECONDS)} с"
+    await update.message.reply_text(
+        f"⏱️ Профилирование запущено на {scope}. Результат придёт сюда, остановить раньше: /profile_stop"
+    )
+
+async def profile_stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop the running profiling session and send its results (admin only)."""
+    # Silently ignore if not in private chat
+    if not await is_private_chat(update):
+        return
+    
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("У вас нет прав администратора.")
+        return
+    
+    result = profiler.stop()
+    if result is None:
+        await update.message.reply_text("Профилирование не запущено. Запустить: /profile_start")
+        return
+    
+    logger.info(f"Admin {user_id} stopped profiling")
+    await send_profile(context.bot, update.effective_chat.id, result)
 
 # Helper function to send responses that works with both message and callback query updates
 async def send_response(update: Update, text: str) -> None:
@@ -245,7 +533,7 @@ async def modify_user_result(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
         
         # Check if user exists
-        user_data = get_user_result(target_user_id)
+        user_data = await results.get(target_user_id)
         
         if not user_data:
             await send_response(update, f"Пользователь с ID {target_user_id} не найден в базе данных.")
@@ -259,7 +547,7 @@ async def modify_user_result(update: Update, context: ContextTypes.DEFAULT_TYPE)
         display_name = format_display_name(first_name, last_name)
         
         # Update user with all the required parameters
-        add_user_result(target_user_id, first_name, last_name, username, best_series, total_tens)
+        await results.add(target_user_id, first_name, last_name, username, best_series, total_tens)
         
         await send_response(update,
             f"Результат пользователя {display_name} (ID: {target_user_id}) обновлен:\n"
@@ -304,32 +592,13 @@ async def set_child_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             await send_response(update, "Статус должен быть 0 (взрослый) или 1 (ребенок).")
             return
         
-        # Check if the consent database exists
-        if not os.path.exists(CONSENT_DB):
-            await send_response(update, "❌ База данных согласий не найдена.")
-            return
-        
-        # Connect to consent database
-        conn = sqlite3.connect(CONSENT_DB)
-        cursor = conn.cursor()
-        
         # Check if user exists in consent database
-        cursor.execute('SELECT user_id, first_name, username FROM user_consent WHERE user_id = ?', (target_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            conn.close()
+        if not await consent.get_user(target_user_id):
             await send_response(update, f"Пользователь с ID {target_user_id} не найден в базе данных согласий.")
             return
         
-        # Update the user's is_child status
-        cursor.execute('UPDATE user_consent SET is_child = ? WHERE user_id = ?', (is_child, target_user_id))
-        conn.commit()
-        
-        # Get updated data
-        cursor.execute('SELECT user_id, first_name, username, is_child FROM user_consent WHERE user_id = ?', (target_user_id,))
-        updated_user = cursor.fetchone()
-        conn.close()
+        # Update the user's is_child status and get updated data
+        updated_user = await consent.set_child_status(target_user_id, is_child)
         
         if updated_user:
             username = updated_user[2] or ""
@@ -375,7 +644,7 @@ async def delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         target_user_id = int(context.args[0])
         
         # Check if user exists and get their name before deletion
-        user_data = get_user_result(target_user_id)
+        user_data = await results.get(target_user_id)
         
         if not user_data:
             await send_response(update, f"Пользователь с ID {target_user_id} не найден в базе данных.")
@@ -387,23 +656,8 @@ async def delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         username = user_data[3]
         display_name = format_display_name(first_name, last_name)
         
-        # Connect to the database using the centralized path
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Begin transaction to ensure data integrity during multiple operations
-        conn.execute("BEGIN TRANSACTION")
-        try:
-            # Delete from user_results table only, as user_sessions doesn't exist in schema
-            cursor.execute("DELETE FROM user_results WHERE user_id = ?", (target_user_id,))
-            # Commit the transaction
-            conn.commit()
-        except Exception as e:
-            # If any error occurs, rollback the transaction
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        # Delete the current result and the submission history; past seasons and consent are kept
+        await results.delete(target_user_id)
         
         await send_response(update,
             f"Пользователь {display_name} (ID: {target_user_id}) удален из базы данных."
@@ -424,4 +678,9 @@ def register_admin_handlers(application):
     application.add_handler(CallbackQueryHandler(handle_admin_callback, pattern=r'^admin_'))
     application.add_handler(CommandHandler("modify_user", modify_user_result))
     application.add_handler(CommandHandler("delete_user", delete_user))
-    application.add_handler(CommandHandler("set_child_status", set_child_status))
\ No newline at end of file
+    application.add_handler(CommandHandler("set_child_status", set_child_status))
+    application.add_handler(CommandHandler("backup", backup_command))
+    application.add_handler(CommandHandler("alltime", all_time_leaderboard))
+    application.add_handler(CommandHandler("metrics", metrics_command))
+    application.add_handler(CommandHandler("profile_start", profile_start_command))
+    application.add_handler(CommandHandler("profile_stop", profile_stop_command))
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Module for the /history and /mybest commands: a user's past results."""
+
+import logging
+from datetime import datetime
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from database import results, consent, archive
+from .messages import handle_group_message  # Import from the same package
+
+logger = logging.getLogger(__name__)
+
+# Submissions shown per page
+HISTORY_PAGE_SIZE = 10
+
+# Callback data of the "older" button: history:<ts>:<id> of the last row shown
+HISTORY_CALLBACK_PREFIX = "history:"
+
+# Seasons listed by /mybest, newest first
+MYBEST_SEASONS_SHOWN = 20
+
+def _format_score(best_series, total_tens):
+    suffix = "x" if best_series >= 93 else ""
+    return f"{best_series}-{total_tens}{suffix}"
+
+def _format_season(ended_on):
+    if ended_on is None:
+        return "текущий сезон"
+    return "сезон до " + datetime.strptime(ended_on, "%Y-%m-%d").strftime("%d.%m.%Y")
+
+def _format_history(rows, first_page):
+    """Format one page of submissions, newest first."""
+    parts = ["📜 Твоя история результатов:\n\n" if first_page else "📜 Ранее:\n\n"]
+    for _, best_series, total_tens, ts, _ in rows:
+        when = datetime.fromtimestamp(ts).strftime("%d.%m.%Y %H:%M")
+        parts.append(f"{when} — {_format_score(best_series, total_tens)}\n")
+    return "".join(parts)
+
+async def _history_page(user_id, before=None):
+    """Return the text and keyboard of one history page, or (None, None) if it is empty."""
+    # One extra row tells whether an older page exists
+    rows = await results.history(user_id, before, HISTORY_PAGE_SIZE + 1)
+    if not rows:
+        return None, None
+
+    keyboard = None
+    if len(rows) > HISTORY_PAGE_SIZE:
+        rows = rows[:HISTORY_PAGE_SIZE]
+        last_id, _, _, last_ts, _ = rows[-1]
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("⬅️ Ранее", callback_data=f"{HISTORY_CALLBACK_PREFIX}{last_ts}:{last_id}")
+        ]])
+    return _format_history(rows, before is None), keyboard
+
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the newest page of the user's submission history."""
+    if await handle_group_message(update, context):
+        return
+
+    user_id = update.message.from_user.id
+    if not await consent.check(user_id):
+        await update.message.reply_text(
+            "Историю результатов покажу после согласия на обработку данных. 📝\n"
+            "Используй команду /start, и вернёмся к мишеням. 🎯"
+        )
+        return
+
+    text, keyboard = await _history_page(user_id)
+    if text is None:
+        await update.message.reply_text("Вы еще не отправили никаких результатов.")
+        return
+    await update.message.reply_text(text, reply_markup=keyboard)
+
+async def history_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the next older page when the "older" button is pressed."""
+    query = update.callback_query
+    await query.answer()
+
+    try:
+        ts, submission_id = query.data[len(HISTORY_CALLBACK_PREFIX):].split(":")
+        before = (int(ts), int(submission_id))
+    except ValueError:
+        logger.warning(f"Malformed history callback data: {query.data}")
+        return
+
+    # Pages are always read for the user who pressed the button
+    text, keyboard = await _history_page(query.from_user.id, before)
+    if text is None:
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+    await query.message.reply_text(text, reply_markup=keyboard)
+    # The button has done its job on the previous page
+    await query.edit_message_reply_markup(reply_markup=None)
+
+def _format_seasons(seasons):
+    """Format a user's all-time best and their result in each season."""
+    _, best_ended_on, best_series, total_tens = max(seasons, key=lambda row: (row[2], row[3], row[0]))
+    parts = [
+        "🏆 Твой лучший результат за все сезоны:\n",
+        f"{_format_score(best_series, total_tens)} ({_format_season(best_ended_on)})\n\n",
+        "По сезонам:\n"
+    ]
+    for _, ended_on, best_series, total_tens in seasons[:MYBEST_SEASONS_SHOWN]:
+        parts.append(f"{_format_season(ended_on)} — {_format_score(best_series, total_tens)}\n")
+    if len(seasons) > MYBEST_SEASONS_SHOWN:
+        parts.append(f"...и еще сезонов: {len(seasons) - MYBEST_SEASONS_SHOWN}\n")
+    return "".join(parts)
+
+async def mybest(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the user's best result across all seasons and their result per season."""
+    if await handle_group_message(update, context):
+        return
+
+    user_id = update.message.from_user.id
+    if not await consent.check(user_id):
+        await update.message.reply_text(
+            "Лучший результат покажу после согласия на обработку данных. 📝\n"
+            "Используй команду /start, и вернёмся к мишеням. 🎯"
+        )
+        return
+
+    seasons = await archive.seasons_of(user_id)
+    if not seasons:
+        await update.message.reply_text("Вы еще не отправили никаких результатов.")
+        return
+    await update.message.reply_text(_format_seasons(seasons))
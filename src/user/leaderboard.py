@@ -3,169 +3,166 @@
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from database import get_all_results, get_user_result, format_display_name
-from database.consent_db import get_all_child_user_ids, is_child_user  # Import the new functions
+from cache import TTLCache
+from chunking import iter_chunks
+from database import (
+    results,
+    consent,
+    format_display_name,
+    get_results_version,
+    BRACKET_PRO,
+    BRACKET_ADVANCED,
+    BRACKET_AMATEUR,
+    BRACKET_CHILDREN
+)
 from .messages import handle_group_message  # Import from the same package
 
 logger = logging.getLogger(__name__)
 
-async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Display the current leaderboard of best results, filtered by user's skill group."""
-    if await handle_group_message(update, context):
+# Group names as shown to users
+BRACKET_NAMES = {
+    BRACKET_PRO: "Профи",
+    BRACKET_ADVANCED: "Продвинутые",
+    BRACKET_AMATEUR: "Любители",
+    BRACKET_CHILDREN: "Дети"
+}
+
+# Group titles shown in the per-group leaderboard
+GROUP_TITLES = {
+    BRACKET_PRO: "🏆 Группа Профи 🏆",
+    BRACKET_ADVANCED: "🏆 Группа Продвинутые 🏆",
+    BRACKET_AMATEUR: "🏆 Группа Любители 🏆",
+    BRACKET_CHILDREN: "🏆 Группа Дети 🏆"
+}
+
+# Section headers of the all-groups leaderboard, in display order
+ALL_GROUP_HEADERS = [
+    (BRACKET_PRO, "👑 Группа Профи 👑"),
+    (BRACKET_ADVANCED, "🥈 Группа Продвинутые 🥈"),
+    (BRACKET_AMATEUR, "🥉 Группа Любители 🥉"),
+    (BRACKET_CHILDREN, "🎯 Группа Дети 🎯")
+]
+
+# Rendered leaderboard messages (lists of message chunks) keyed by (view, bracket, results version)
+_render_cache = TTLCache(maxsize=32)
+
+NO_RESULTS_TEXT = "Пока нет результатов для отображения."
+
+async def stream_cached_render(view, bracket, render):
+    """
+    Yield the message chunks of a leaderboard view, rendering it only when results changed.
+    
+    Entries are keyed by view, bracket and results version, so any change to
+    results or child status makes the old entries unreachable. On a miss the
+    chunks are yielded as soon as they fill up and cached once the view is complete.
+    
+    Args:
+        view: Name of the leaderboard view
+        bracket: Bracket shown by the view, or None for multi-bracket views
+        render: Function returning an async iterable of the view's lines
+    """
+    key = (view, bracket, get_results_version())
+    chunks = _render_cache.get(key)
+    if chunks is not None:
+        for chunk in chunks:
+            yield chunk
         return
-        
-    user_id = update.message.from_user.id
-    user_result = get_user_result(user_id)
     
-    results = get_all_results()
-    
-    if not results:
-        await update.message.reply_text("Пока нет результатов для отображения.")
+    chunks = []
+    async for chunk in iter_chunks(render()):
+        chunks.append(chunk)
+        yield chunk
+    _render_cache.set(key, chunks)
+
+async def reply_cached_render(message, view, bracket, render):
+    """Reply to a message with a leaderboard view, one message per chunk."""
+    async for chunk in stream_cached_render(view, bracket, render):
+        await message.reply_text(chunk)
+
+def get_leaderboard_cache_stats():
+    """Return hit/miss counters of the rendered leaderboard cache."""
+    return _render_cache.stats()
+
+def _format_row(position, result, suffix=""):
+    """Format one leaderboard line with the display name cut to 20 characters."""
+    # Unpack new result format
+    _, first_name, last_name, _, best_series, total_tens = result
+    display_name = format_display_name(first_name, last_name)
+    
+    name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
+    return f"{position}. {name_display}: {best_series}-{total_tens}{suffix}\n"
+
+async def _render_rows(bracket, limit):
+    """Yield the formatted rows of a group's top results, streamed from the database."""
+    suffix = "x" if bracket == BRACKET_PRO else ""
+    position = 0
+    async for result in results.stream_bracket(bracket, limit=limit):
+        position += 1
+        yield _format_row(position, result, suffix)
+
+async def render_group_leaderboard(bracket):
+    """Yield the lines of the top-50 leaderboard for one group."""
+    if not await results.exists():
+        yield NO_RESULTS_TEXT
         return
     
-    # Get all child user IDs
-    child_user_ids = get_all_child_user_ids()
-    
-    # Determine if current user is a child
-    user_is_child = is_child_user(user_id)
+    yield f"{GROUP_TITLES[bracket]}\n\n"
     
-    # Determine user's group - if child, use the children group
-    if user_is_child:
-        user_group = "Дети"
-    else:
-        user_group = "Любители"  # Default group if user has no results
-        if user_result:
-            best_series = user_result[4]  # Updated index for best_series
-            if best_series >= 93:
-                user_group = "Профи"
-            elif best_series >= 80:
-                user_group = "Продвинутые"
-            else:
-                user_group = "Любители"
+    # Only the top 50 of the group are loaded, already sorted by the database
+    empty = True
+    async for row in _render_rows(bracket, 50):
+        empty = False
+        yield row
+    if empty:
+        yield "В этой группе пока нет результатов."
+
+async def render_all_leaderboard():
+    """Yield the lines of the top-30 leaderboard covering every group."""
+    if not await results.exists():
+        yield NO_RESULTS_TEXT
+        return
     
-    # Filter results based on user's group
-    if user_group == "Дети":
-        # Only show children's results to children
-        filtered_results = [r for r in results if r[0] in child_user_ids]
-        group_title = "🏆 Группа Дети 🏆"
-    elif user_group == "Профи":
-        # Filter out children from adult groups
-        filtered_results = [r for r in results if r[4] >= 93 and r[0] not in child_user_ids]
-        group_title = "🏆 Группа Профи 🏆"
-    elif user_group == "Продвинутые":
-        filtered_results = [r for r in results if 80 <= r[4] <= 92 and r[0] not in child_user_ids]
-        group_title = "🏆 Группа Продвинутые 🏆"
-    else:  # Любители
-        filtered_results = [r for r in results if r[4] <= 79 and r[0] not in child_user_ids]
-        group_title = "🏆 Группа Любители 🏆"
+    yield "🏆 Лучшие из лучших! Топ-30 в каждой группе! 🏆\n\n"
     
-    # Sort results by best_series (descending) and then by total_tens (descending)
-    sorted_results = sorted(filtered_results, key=lambda x: (x[4], x[5]), reverse=True)  # Updated indexes
+    for bracket, header in ALL_GROUP_HEADERS:
+        yield f"{header}\n"
+        
+        # Top 30 of each group, filtered and sorted by the database
+        empty = True
+        async for row in _render_rows(bracket, 30):
+            empty = False
+            yield row
+        if empty:
+            yield "В этой группе пока нет результатов.\n"
+        
+        # Blank line between groups, none after the last one
+        if bracket != BRACKET_CHILDREN:
+            yield "\n"
+
+async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Display the current leaderboard of best results, filtered by user's skill group."""
+    if await handle_group_message(update, context):
+        return
+        
+    user_id = update.message.from_user.id
     
-    # Format the leaderboard message
-    leaderboard_text = f"{group_title}\n\n"
+    # A season started by the publish script shows at once, not at the next season check
+    await results.refresh_season()
     
-    if not sorted_results:
-        leaderboard_text += "В этой группе пока нет результатов."
-    else:
-        for i, result in enumerate(sorted_results[:50], 1):  # Show top 50 results
-            # Unpack new result format
-            _, first_name, last_name, _, best_series, total_tens = result
-            display_name = format_display_name(first_name, last_name)
-            
-            name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
-            if user_group == "Профи":
-                leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}x\n"
-            else:
-                leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}\n"
+    # Determine user's group from the rank index - children always see the children group
+    user_group = await results.bracket_of(user_id)
+    if user_group is None:
+        # Default group if user has no results
+        user_group = BRACKET_CHILDREN if await consent.is_child(user_id) else BRACKET_AMATEUR
     
-    await update.message.reply_text(leaderboard_text)
+    await reply_cached_render(
+        update.message, 'group', user_group, lambda: render_group_leaderboard(user_group)
+    )
 
 async def leaderboard_all(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Display top results for all skill groups, including a separate children's category."""
     if await handle_group_message(update, context):
         return
-        
-    results = get_all_results()
-    
-    if not results:
-        await update.message.reply_text("Пока нет результатов для отображения.")
-        return
-        
-    # Get all child user IDs
-    child_user_ids = get_all_child_user_ids()
-    
-    # Filter children results and adult results separately
-    children_results = [r for r in results if r[0] in child_user_ids]
-    adult_results = [r for r in results if r[0] not in child_user_ids]
-    
-    # Filter adult results into three groups
-    pro_results = [r for r in adult_results if r[4] >= 93]  # Updated index for best_series
-    semi_pro_results = [r for r in adult_results if 80 <= r[4] < 93]  # Updated index for best_series
-    amateur_results = [r for r in adult_results if r[4] < 80]  # Updated index for best_series
-    
-    # Sort each group by best_series and total_tens
-    pro_sorted = sorted(pro_results, key=lambda x: (x[4], x[5]), reverse=True)[:30]  # Updated indexes
-    semi_pro_sorted = sorted(semi_pro_results, key=lambda x: (x[4], x[5]), reverse=True)[:30]  # Updated indexes
-    amateur_sorted = sorted(amateur_results, key=lambda x: (x[4], x[5]), reverse=True)[:30]  # Updated indexes
-    children_sorted = sorted(children_results, key=lambda x: (x[4], x[5]), reverse=True)[:30]  # Updated indexes
-    
-    # Format the message
-    leaderboard_text = "🏆 Лучшие из лучших! Топ-30 в каждой группе! 🏆\n\n"
-    
-    # Pro group
-    leaderboard_text += "👑 Группа Профи 👑\n"
-    if not pro_sorted:
-        leaderboard_text += "В этой группе пока нет результатов.\n\n"
-    else:
-        for i, result in enumerate(pro_sorted, 1):
-            # Unpack new result format
-            _, first_name, last_name, _, best_series, total_tens = result
-            display_name = format_display_name(first_name, last_name)
-            
-            name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
-            leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}x\n"
-        leaderboard_text += "\n"
-    
-    # Semi-pro group
-    leaderboard_text += "🥈 Группа Продвинутые 🥈\n"
-    if not semi_pro_sorted:
-        leaderboard_text += "В этой группе пока нет результатов.\n\n"
-    else:
-        for i, result in enumerate(semi_pro_sorted, 1):
-            # Unpack new result format
-            _, first_name, last_name, _, best_series, total_tens = result
-            display_name = format_display_name(first_name, last_name)
-            
-            name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
-            leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}\n"
-        leaderboard_text += "\n"
-    
-    # Amateur group
-    leaderboard_text += "🥉 Группа Любители 🥉\n"
-    if not amateur_sorted:
-        leaderboard_text += "В этой группе пока нет результатов.\n\n"
-    else:
-        for i, result in enumerate(amateur_sorted, 1):
-            # Unpack new result format
-            _, first_name, last_name, _, best_series, total_tens = result
-            display_name = format_display_name(first_name, last_name)
-            
-            name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
-            leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}\n"
-        leaderboard_text += "\n"
-    
-    # Children group
-    leaderboard_text += "🎯 Группа Дети 🎯\n"
-    if not children_sorted:
-        leaderboard_text += "В этой группе пока нет результатов.\n"
-    else:
-        for i, result in enumerate(children_sorted, 1):
-            # Unpack new result format
-            _, first_name, last_name, _, best_series, total_tens = result
-            display_name = format_display_name(first_name, last_name)
-            
-            name_display = display_name[:20] + "..." if len(display_name) > 20 else display_name
-            leaderboard_text += f"{i}. {name_display}: {best_series}-{total_tens}\n"
     
-    await update.message.reply_text(leaderboard_text)
+    await results.refresh_season()
+    await reply_cached_render(update.message, 'all', None, render_all_leaderboard)
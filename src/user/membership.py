@@ -1,9 +1,20 @@
+import asyncio
 import logging
 import re
 from typing import Tuple, Optional, List
 
-from telegram import Bot
+from telegram import Bot, ChatMember, Update
 from telegram.error import TelegramError, BadRequest, Forbidden, TimedOut
+from telegram.ext import ContextTypes
+
+from cache import TTLCache
+from database import membership, get_member_status, is_chat_tracked
+from config import (
+    MEMBERSHIP_POSITIVE_TTL,
+    MEMBERSHIP_NEGATIVE_TTL,
+    MEMBERSHIP_CACHE_SIZE,
+    MEMBERSHIP_CHECK_TIMEOUT
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -11,38 +22,143 @@ logger = logging.getLogger(__name__)
 # Store the current group IDs in memory (initialized from config)
 _current_group_ids = None
 
+# Membership answers keyed by (chat_id, user_id), with separate TTLs for yes and no
+_membership_cache = TTLCache(maxsize=MEMBERSHIP_CACHE_SIZE)
+
+# get_chat results for the configured groups, kept for the process lifetime
+_chat_cache = {}
+
+# Chat member statuses that count as being in the group
+MEMBER_STATUSES = ["member", "administrator", "creator"]
+
 # ==== GROUP MEMBERSHIP FUNCTIONS ====
+def _get_group_ids() -> List[str]:
+    """Return the configured group IDs, parsing CHAT_ID on first use."""
+    global _current_group_ids
+    
+    # Initialize _current_group_ids from config if not set yet
+    if _current_group_ids is None:
+        from config import CHAT_ID
+        # Parse multiple chat IDs from CHAT_ID string
+        if isinstance(CHAT_ID, str):
+            # Split by comma, semicolon, or space
+            ids = re.split(r'[,;\s]+', CHAT_ID.strip())
+            _current_group_ids = [id.strip() for id in ids if id.strip()]
+        else:
+            _current_group_ids = [str(CHAT_ID)]
+        logger.info(f"Initialized group IDs: {_current_group_ids}")
+    
+    return _current_group_ids
+
+def invalidate_membership(user_id: Optional[int] = None) -> None:
+    """
+    Drop cached membership answers so the next check asks Telegram again.
+    
+    Args:
+        user_id: Only forget this user's entries; clear the whole cache if None
+    """
+    if user_id is None:
+        _membership_cache.clear()
+        return
+    
+    for group_id_str in _get_group_ids():
+        try:
+            _membership_cache.invalidate((int(group_id_str), user_id))
+        except ValueError:
+            continue
+
+def get_membership_cache_stats():
+    """Return hit/miss counters of the membership cache."""
+    return _membership_cache.stats()
+
+async def _get_group_chat(bot: Bot, chat_id: int):
+    """Return the Chat object for a configured group, fetching it only once."""
+    chat = _chat_cache.get(chat_id)
+    if chat is None:
+        chat = await bot.get_chat(chat_id)
+        _chat_cache[chat_id] = chat
+    return chat
+
+def _is_member(member: ChatMember) -> bool:
+    """Check if a ChatMember status means the user is in the group."""
+    if member.status == ChatMember.RESTRICTED:
+        return bool(getattr(member, "is_member", False))
+    return member.status in MEMBER_STATUSES
+
 async def is_user_in_chat(bot: Bot, user_id: int, chat_id: int) -> bool:
     """
     Checks if a user is in the specified chat (group or supergroup).
     
+    Answers are cached for MEMBERSHIP_POSITIVE_TTL / MEMBERSHIP_NEGATIVE_TTL seconds.
+    
     :param bot: Bot object
     :param user_id: User ID to check
     :param chat_id: Chat ID
     :return: True if the user is in the chat, otherwise False
     """
+    cached = _membership_cache.get((chat_id, user_id))
+    if cached is not None:
+        return cached
+    
     try:
         # 1. Check if the chat is a group or supergroup
-        chat = await bot.get_chat(chat_id)
+        chat = await _get_group_chat(bot, chat_id)
         if chat.type not in ["group", "supergroup"]:
             logger.warning(f"Chat {chat_id} is not a group: {chat.type}")
             return False
 
         # 2. Check if the user is in the chat
         member = await bot.get_chat_member(chat_id, user_id)
-        is_member = member.status in ["member", "administrator", "creator"]
+        is_member = _is_member(member)
         
         logger.info(f"User {user_id} {'is' if is_member else 'is NOT'} a member of group {chat_id}")
+        if is_chat_tracked(chat_id):
+            # Later changes arrive as chat_member updates, so the answer can be stored for good
+            await membership.record(chat_id, user_id, is_member)
+        _membership_cache.set(
+            (chat_id, user_id),
+            is_member,
+            ttl=MEMBERSHIP_POSITIVE_TTL if is_member else MEMBERSHIP_NEGATIVE_TTL
+        )
         return is_member
 
     except TelegramError as e:
         logger.error(f"Telegram error when checking chat membership: {e}")
         return False
 
+async def _check_group(bot: Bot, user_id: int, group_id_str: str) -> bool:
+    """
+    Checks membership in a single configured group, bounded by MEMBERSHIP_CHECK_TIMEOUT.
+    
+    Errors and timeouts are logged and count as "not a member" so that the
+    remaining groups can still answer.
+    """
+    try:
+        # Convert group_id to int
+        group_id = int(group_id_str)
+        
+        logger.info(f"Checking membership of user {user_id} in group {group_id}")
+        
+        return await asyncio.wait_for(
+            is_user_in_chat(bot=bot, user_id=user_id, chat_id=group_id),
+            timeout=MEMBERSHIP_CHECK_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Timed out checking group {group_id_str} after {MEMBERSHIP_CHECK_TIMEOUT}s")
+    except TelegramError as e:
+        # Log the error but let the other groups answer
+        logger.warning(f"Error checking group {group_id_str}: {e}")
+    except Exception as e:
+        logger.warning(f"Unexpected error checking group {group_id_str}: {e}")
+    return False
+
 async def is_user_in_group(user_id: int, bot: Bot) -> Tuple[bool, str]:
     """
     Checks if a user is a member of any group specified in CHAT_ID.
     
+    All groups are queried concurrently, so the latency stays close to a
+    single round trip regardless of how many groups are configured.
+    
     Args:
         user_id: User ID to check
         bot: Bot object
@@ -50,49 +166,77 @@ async def is_user_in_group(user_id: int, bot: Bot) -> Tuple[bool, str]:
     Returns:
         Tuple (is_member, error_message)
     """
-    global _current_group_ids
+    group_ids = _get_group_ids()
     
-    # Initialize _current_group_ids from config if not set yet
-    if _current_group_ids is None:
-        from config import CHAT_ID
-        # Parse multiple chat IDs from CHAT_ID string
-        if isinstance(CHAT_ID, str):
-            # Split by comma, semicolon, or space
-            ids = re.split(r'[,;\s]+', CHAT_ID.strip())
-            _current_group_ids = [id.strip() for id in ids if id.strip()]
-        else:
-            _current_group_ids = [str(CHAT_ID)]
-        logger.info(f"Initialized group IDs: {_current_group_ids}")
-    
-    if not _current_group_ids:
+    if not group_ids:
         logger.error("No valid group IDs found in configuration")
         return False, "Не настроены группы для проверки. Пожалуйста, свяжитесь с администратором."
     
-    for group_id_str in _current_group_ids:
+    # Answer from the local membership table first; only unknown groups go to Telegram
+    unknown_group_ids = []
+    for group_id_str in group_ids:
         try:
-            # Convert group_id to int
-            group_id = int(group_id_str)
-            
-            logger.info(f"Checking membership of user {user_id} in group {group_id}")
-            
-            # Check membership in this group
-            is_member = await is_user_in_chat(bot=bot, user_id=user_id, chat_id=group_id)
-            
-            if is_member:
+            known = get_member_status(int(group_id_str), user_id)
+        except ValueError:
+            known = None
+        if known:
+            return True, ""
+        if known is None:
+            unknown_group_ids.append(group_id_str)
+    
+    # Check the remaining groups at once; the first positive answer wins and cancels the rest
+    tasks = [
+        asyncio.create_task(_check_group(bot, user_id, group_id_str))
+        for group_id_str in unknown_group_ids
+    ]
+    try:
+        for next_finished in asyncio.as_completed(tasks):
+            if await next_finished:
                 # User is in at least one of the groups
                 return True, ""
-                
-        except TelegramError as e:
-            # Log the error but continue checking other groups
-            logger.warning(f"Error checking group {group_id_str}: {e}")
-            continue
-        except Exception as e:
-            logger.warning(f"Unexpected error checking group {group_id_str}: {e}")
-            continue
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
     
     # User is not in any of the groups
     return False, "Вы не являетесь участником ни одной из разрешенных групп. Пожалуйста, присоединитесь к группе для использования бота."
 
+async def track_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Keep the local membership table in sync with chat_member / my_chat_member updates.
+    
+    Updates for chats other than the configured groups are ignored.
+    """
+    member_update = update.chat_member or update.my_chat_member
+    if not member_update:
+        return
+    
+    chat_id = member_update.chat.id
+    if str(chat_id) not in _get_group_ids():
+        return
+    
+    new_member = member_update.new_chat_member
+    try:
+        if update.my_chat_member:
+            # The bot's own status changed: member updates only arrive while it is an administrator
+            if new_member.status in [ChatMember.ADMINISTRATOR, ChatMember.OWNER]:
+                await membership.track_chat(chat_id)
+                logger.info(f"Tracking members of group {chat_id}")
+            else:
+                await membership.untrack_chat(chat_id)
+            _chat_cache.pop(chat_id, None)
+            invalidate_membership()
+            return
+        
+        user_id = new_member.user.id
+        is_member = _is_member(new_member)
+        await membership.record(chat_id, user_id, is_member)
+        _membership_cache.invalidate((chat_id, user_id))
+        logger.info(f"User {user_id} {'joined' if is_member else 'left'} group {chat_id}")
+    except Exception as e:
+        logger.error(f"Error updating membership table for chat {chat_id}: {e}")
+
 async def _handle_telegram_error(e: TelegramError, bot: Bot, user_id: int) -> Tuple[bool, str]:
     """
     Handles Telegram API errors when checking group membership.
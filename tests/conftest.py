@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The bot reads its configuration from the environment on import
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bot-tests-')
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+os.environ.setdefault('CHAT_ID', '-1001000000001')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+@pytest.fixture
+def databases():
+    """Fresh results and consent databases, with the registry and rank index loaded."""
+    from config import DATA_DIR
+    from database import (
+        close_connections, shutdown_db_executor, init_consent_db, create_database, load_rank_index
+    )
+
+    close_connections()
+    for name in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    init_consent_db()
+    create_database()
+    load_rank_index()
+    yield
+    shutdown_db_executor()
+    close_connections()
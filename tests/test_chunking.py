@@ -0,0 +1,62 @@
+import asyncio
+
+from chunking import TELEGRAM_MESSAGE_LIMIT, iter_chunks, message_length, send_chunked
+
+EMOJI = '🎯'  # outside the BMP: two UTF-16 code units
+
+
+def chunks_of(lines, **kwargs):
+    async def collect():
+        return [chunk async for chunk in iter_chunks(lines, **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_message_length_counts_utf16_code_units():
+    assert message_length('abc') == 3
+    assert message_length(EMOJI) == 2
+    assert message_length('Профи') == 5
+
+
+def test_emoji_text_exactly_at_the_limit_is_one_message():
+    line = EMOJI * 2047 + 'x\n'
+    assert message_length(line) == TELEGRAM_MESSAGE_LIMIT
+    assert chunks_of([line]) == [line]
+
+
+def test_one_code_unit_over_the_limit_starts_a_new_message():
+    first = EMOJI * 2047 + '\n'  # 4095 code units
+    chunks = chunks_of([first, 'ab\n'])
+    assert chunks == [first, 'ab\n']
+    assert all(message_length(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks)
+
+
+def test_line_longer_than_the_limit_is_cut():
+    line = EMOJI * 3000 + '\n'
+    chunks = chunks_of(['head\n', line, 'tail\n'])
+    assert all(message_length(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks)
+    assert ''.join(chunks) == 'head\n' + line + 'tail\n'
+    assert len(chunks) == 3
+
+
+def test_continuation_header_counts_towards_the_limit():
+    lines = [f'{i}. {EMOJI * 10}\n' for i in range(1000)]
+    chunks = chunks_of(lines, limit=500, continuation_header='(cont.)\n')
+    assert all(message_length(chunk) <= 500 for chunk in chunks)
+    assert not chunks[0].startswith('(cont.)')
+    assert all(chunk.startswith('(cont.)\n') for chunk in chunks[1:])
+    assert ''.join(chunk.removeprefix('(cont.)\n') for chunk in chunks) == ''.join(lines)
+
+
+def test_whitespace_only_chunks_are_dropped():
+    assert chunks_of(['\n', '  \n']) == []
+
+
+def test_send_chunked_sends_each_chunk():
+    sent = []
+
+    async def send(text):
+        sent.append(text)
+
+    count = asyncio.run(send_chunked(send, (f'{i}\n' for i in range(3000)), limit=100))
+    assert count == len(sent) > 1
+    assert ''.join(sent) == ''.join(f'{i}\n' for i in range(3000))
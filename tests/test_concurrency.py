@@ -0,0 +1,116 @@
+import asyncio
+import json
+import time
+import warnings
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+from concurrency import OrderedApplication
+
+HANDLER_SECONDS = 0.2
+
+
+class SlowApplication(OrderedApplication):
+    """Records when each update finished instead of running handlers."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.finished = []
+
+    async def process_update(self, update):
+        await asyncio.sleep(HANDLER_SECONDS)
+        self.finished.append((update.update_id, time.perf_counter()))
+
+
+def build_update(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            'text': 'x'
+        }
+    }, None)
+
+
+class StubRequest(BaseRequest):
+    """Answers the Bot API calls of initialize() and shutdown() locally."""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        result = {'id': 1, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+
+def build_application():
+    return (
+        Application.builder()
+        .token('123456:TEST')
+        .application_class(SlowApplication)
+        .concurrent_updates(4)
+        .request(StubRequest())
+        .get_updates_request(StubRequest())
+        .build()
+    )
+
+
+async def dispatch_all(application, updates):
+    with warnings.catch_warnings():
+        # The application is not started, so its tasks are not tracked; the test awaits them
+        warnings.simplefilter('ignore')
+        futures = [application.dispatch(update) for update in updates]
+    started = time.perf_counter()
+    await asyncio.gather(*futures)
+    return started
+
+
+def test_busy_user_does_not_delay_other_users():
+    application = build_application()
+    updates = [build_update(i, 1) for i in range(6)] + [build_update(100, 2)]
+
+    started = asyncio.run(dispatch_all(application, updates))
+
+    finished = dict(application.finished)
+    # The other user's update gets a free slot right away
+    assert finished[100] - started < 2 * HANDLER_SECONDS
+    # The busy user's updates still run one after the other, in order
+    assert [update_id for update_id, _ in application.finished if update_id != 100] == list(range(6))
+    assert finished[5] - started >= 6 * HANDLER_SECONDS * 0.9
+    assert not application.user_queues
+
+
+def test_stop_processes_updates_waiting_in_user_queues():
+    async def run():
+        application = build_application()
+        await application.initialize()
+        await application.start()
+        for update in [build_update(i, 1) for i in range(4)] + [build_update(100, 2)]:
+            await application.update_queue.put(update)
+        # Let the fetcher hand the updates to the per-user queues
+        while not application.update_queue.empty():
+            await asyncio.sleep(0)
+        assert application.user_queues[1]
+
+        await asyncio.wait_for(application.stop(), 10 * HANDLER_SECONDS)
+        await application.shutdown()
+        return application
+
+    application = asyncio.run(run())
+    # stop() returned only after every fetched update was processed, in order per user
+    assert [update_id for update_id, _ in application.finished if update_id != 100] == list(range(4))
+    assert 100 in dict(application.finished)
+    assert not application.user_queues
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from database import connection
+from database.connection import ConnectionManager, JOURNAL_MODES, SYNCHRONOUS_LEVELS, pragma_keyword
+
+
+def test_pragma_keyword_accepts_known_values_in_any_case():
+    assert pragma_keyword('SQLITE_JOURNAL_MODE', ' wal ', JOURNAL_MODES) == 'WAL'
+    assert pragma_keyword('synchronous', 'full', SYNCHRONOUS_LEVELS) == 'FULL'
+    assert pragma_keyword('synchronous', 2, SYNCHRONOUS_LEVELS) == '2'
+
+
+@pytest.mark.parametrize('value', ['WAL; DROP TABLE results', 'FULL --', '', '4'])
+def test_pragma_keyword_rejects_anything_else(value):
+    with pytest.raises(ValueError):
+        pragma_keyword('synchronous', value, SYNCHRONOUS_LEVELS)
+
+
+def test_invalid_settings_are_not_executed(tmp_path, monkeypatch):
+    manager = ConnectionManager(os.path.join(tmp_path, 'test.db'), 1)
+    try:
+        with pytest.raises(ValueError):
+            with manager.write(synchronous='FULL; DROP TABLE t'):
+                pass
+        with manager.write(synchronous='full') as conn:
+            conn.execute('CREATE TABLE t (x INTEGER)')
+
+        monkeypatch.setattr(connection, 'SQLITE_JOURNAL_MODE', 'WAL; DROP TABLE t')
+        with pytest.raises(ValueError):
+            with manager.read():
+                pass
+    finally:
+        manager.close()
@@ -0,0 +1,76 @@
+import random
+
+from database import consent_db, results_db
+from database.rank_index import (
+    RankIndex, rank_index, get_bracket, BRACKETS, BRACKET_PRO, BRACKET_ADVANCED, BRACKET_AMATEUR, BRACKET_CHILDREN
+)
+
+
+def seed(users, child_share=0.1, seed=1):
+    """Submit random results in a random user order, with some consenting children."""
+    rng = random.Random(seed)
+    user_ids = list(range(1, users + 1))
+    rng.shuffle(user_ids)
+    for user_id in user_ids:
+        if rng.random() < child_share:
+            consent_db.save_user_consent(user_id, None, 'Kid')
+            consent_db.update_child_status(user_id, 1)
+    # Few distinct scores, so most buckets hold ties
+    results_db.submit_user_results([
+        (user_id, f'User{user_id}', None, None, rng.choice([70, 79, 80, 92, 93, 100]), rng.randint(0, 2))
+        for user_id in user_ids
+    ])
+
+
+def assert_matches_sql():
+    for bracket in BRACKETS:
+        rows = results_db.get_bracket_results(bracket)
+        assert rank_index.top(bracket, len(rows) + 5) == [row[0] for row in rows]
+        assert rank_index.top(bracket, 7) == [row[0] for row in rows[:7]]
+        assert rank_index.size(bracket) == len(rows)
+        for row in rows:
+            better = sum(1 for other in rows if (other[4], other[5]) > (row[4], row[5]))
+            assert rank_index.rank(row[0])[:3] == (bracket, better + 1, len(rows))
+
+
+def test_rank_and_top_match_sql_brackets(databases):
+    seed(300)
+    assert_matches_sql()
+
+    # Rebuilt from the database, the index still agrees
+    results_db.load_rank_index()
+    assert_matches_sql()
+
+
+def test_child_status_moves_user_between_brackets(databases):
+    seed(100, child_share=0)
+    user_id = results_db.get_bracket_results(BRACKET_PRO, 1)[0][0]
+
+    consent_db.save_user_consent(user_id, None, 'Kid')
+    consent_db.update_child_status(user_id, 1)
+    assert rank_index.get_bracket(user_id) == BRACKET_CHILDREN
+    assert_matches_sql()
+
+    consent_db.update_child_status(user_id, 0)
+    assert rank_index.get_bracket(user_id) == BRACKET_PRO
+    assert_matches_sql()
+
+
+def test_ties_are_ordered_by_user_id():
+    index = RankIndex()
+    index.load([(5, 95, 3), (2, 95, 3), (9, 96, 0), (1, 95, 3)], set())
+    index.update(0, 95, 3, False)
+
+    assert index.top(BRACKET_PRO, 3) == [9, 0, 1]
+    assert index.top(BRACKET_PRO, 10) == [9, 0, 1, 2, 5]
+    # Tied users share a rank
+    assert index.rank(2) == (BRACKET_PRO, 2, 5, 0)
+    assert index.rank(9) == (BRACKET_PRO, 1, 5, 100)
+
+
+def test_bracket_bounds():
+    assert get_bracket(93) == BRACKET_PRO
+    assert get_bracket(92) == BRACKET_ADVANCED
+    assert get_bracket(80) == BRACKET_ADVANCED
+    assert get_bracket(79) == BRACKET_AMATEUR
+    assert get_bracket(100, is_child=True) == BRACKET_CHILDREN
@@ -0,0 +1,76 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from config import DB_PATH
+from database import consent_db, results_db, results, get_results_version
+from database.rank_index import rank_index, BRACKET_CHILDREN, BRACKET_PRO
+
+
+def submission(user_id, best_series=95, total_tens=5):
+    return (user_id, f'User{user_id}', None, None, best_series, total_tens)
+
+
+def test_submit_and_consent_change_do_not_block_each_other(databases):
+    rounds = 100
+    errors = []
+    consent_results = []
+
+    def submit():
+        try:
+            for i in range(rounds):
+                results_db.submit_user_results([submission(1000 + i), submission(1, 90 + i % 10)])
+        except Exception as e:
+            errors.append(e)
+
+    def change_consent():
+        try:
+            for i in range(rounds):
+                consent_results.append(consent_db.save_user_consent(2000 + i, None, 'Kid'))
+                consent_db.update_child_status(2000 + i, 1)
+                consent_results.append(consent_db.revoke_user_consent(2000 + i))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit), threading.Thread(target=change_consent)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert all(consent_results)
+    # A lock wait would stall for the SQLite busy timeout (5 s by default)
+    assert time.monotonic() - started < 4
+
+
+def test_rank_index_follows_committed_submissions(databases):
+    consent_db.save_user_consent(7, None, 'Kid')
+    consent_db.update_child_status(7, 1)
+
+    results_db.submit_user_results([submission(5, 96, 3), submission(7, 96, 3)])
+
+    assert rank_index.get_bracket(5) == BRACKET_PRO
+    assert rank_index.get_bracket(7) == BRACKET_CHILDREN
+
+
+def test_refresh_season_picks_up_rollover_by_another_process(databases):
+    results_db.submit_user_results([submission(5, 96, 3)])
+    assert rank_index.rank(5) is not None
+
+    # The publish script rolls the season over through its own connection
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute('INSERT INTO season_results (season, user_id, best_series, total_tens) '
+                     'SELECT 1, user_id, best_series, total_tens FROM user_results')
+        conn.execute('DELETE FROM user_results')
+        conn.execute('INSERT INTO seasons (started_at) VALUES (0)')
+    conn.close()
+
+    version = get_results_version()
+    assert asyncio.run(results.refresh_season())
+    assert rank_index.rank(5) is None
+    assert get_results_version() != version
+    assert not asyncio.run(results.refresh_season())
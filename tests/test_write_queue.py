@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+
+from database import results_db
+from database.write_queue import WriteQueue
+
+
+def submission(user_id, best_series=90, total_tens=5):
+    return (user_id, f'User{user_id}', None, None, best_series, total_tens)
+
+
+def stored_user_ids():
+    with results_db._db().read() as conn:
+        return {row[0] for row in conn.execute('SELECT user_id FROM user_results')}
+
+
+def test_concurrent_submissions_share_batches(databases):
+    async def run():
+        queue = WriteQueue(batch_size=10, flush_interval_ms=50)
+        queue.start()
+        outcomes = await asyncio.gather(*(queue.submit(*submission(i)) for i in range(25)))
+        # A worse result of an existing user in its own batch
+        worse = await queue.submit(*submission(0, 80))
+        await queue.drain()
+        return queue, outcomes, worse
+
+    queue, outcomes, worse = asyncio.run(run())
+    assert [outcome.status for outcome in outcomes] == [results_db.SUBMIT_CREATED] * 25
+    assert worse.status == results_db.SUBMIT_WORSE
+    assert queue.written == 26
+    assert queue.batches == 4  # 10 + 10 + 5, then the late one
+    assert stored_user_ids() == set(range(25))
+
+
+def test_drain_flushes_full_queue_and_waiting_submissions(databases):
+    async def run():
+        queue = WriteQueue(batch_size=4, flush_interval_ms=50, maxsize=2)
+        queue.start()
+        # More submissions than the queue holds: most wait for room in submit()
+        early = [asyncio.create_task(queue.submit(*submission(i))) for i in range(20)]
+        await asyncio.sleep(0)
+        assert queue._putting > 0
+        drain = asyncio.create_task(queue.drain())
+        await asyncio.sleep(0)
+        # Submissions made while draining take the direct path
+        late = [asyncio.create_task(queue.submit(*submission(100 + i))) for i in range(5)]
+        return await asyncio.wait_for(asyncio.gather(*early, *late, drain), 10), queue
+
+    outcomes, queue = asyncio.run(run())
+    assert all(outcome.status == results_db.SUBMIT_CREATED for outcome in outcomes[:-1])
+    assert queue.written == 20
+    assert not queue.running
+    assert stored_user_ids() == set(range(20)) | set(range(100, 105))
+
+
+def test_failing_submission_does_not_fail_its_batch(databases):
+    async def run():
+        queue = WriteQueue(batch_size=3, flush_interval_ms=1000)
+        queue.start()
+        # best_series is NOT NULL in the history table, so this one fails the batch transaction
+        outcomes = await asyncio.gather(
+            queue.submit(*submission(1)),
+            queue.submit(*submission(2, None)),
+            queue.submit(*submission(3)),
+            return_exceptions=True
+        )
+        await queue.drain()
+        return queue, outcomes
+
+    queue, outcomes = asyncio.run(run())
+    assert outcomes[0].status == results_db.SUBMIT_CREATED
+    assert isinstance(outcomes[1], sqlite3.IntegrityError)
+    assert outcomes[2].status == results_db.SUBMIT_CREATED
+    assert queue.batches == 1
+    assert stored_user_ids() == {1, 3}
+
+
+def test_submit_without_running_queue_writes_directly(databases):
+    async def run():
+        queue = WriteQueue()
+        return await queue.submit(*submission(9))
+
+    assert asyncio.run(run()).status == results_db.SUBMIT_CREATED
+    assert stored_user_ids() == {9}
+
@@ -0,0 +1,305 @@
+"""Benchmark of the leaderboard rendering paths at 10k to 1M shooters.
+
+Seeds scoreboard.db and consent.db in a throwaway data directory with a
+realistic spread of results and a configurable share of children, then times
+every rendering path of the bot at each size:
+
+    leaderboard[<group>]  /leaderboard, top 50 of one group
+    leaderboard_all       /leaderboard_all, top 30 of every group
+    publish               the season publication with the full tables
+    admin_list            the admin list of all users
+
+Each path is timed in stages: ``query`` (the SQL, which also filters the
+group and sorts it on the score index), ``format`` (building the lines),
+``chunk`` (packing them into Telegram messages) and ``end_to_end`` (the real
+async generator through the DB executor, as the bot runs it). Peak Python
+memory of the end-to-end run is measured with tracemalloc.
+
+Example:
+    python tools/bench_leaderboard.py --sizes 10000,100000 --json bench.json
+    python tools/bench_leaderboard.py --sizes 10000,100000 --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from itertools import chain
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+FIRST_NAMES = [
+    'Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Андрей', 'Ольга',
+    'Михаил', 'Наталья', 'Иван', 'Татьяна', 'Алексей', 'Екатерина', 'Никита', 'Юлия'
+]
+LAST_NAMES = [
+    'Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Васильев', 'Петрова', 'Соколов',
+    'Михайлова', 'Новиков', 'Фёдорова', 'Морозов', 'Волкова', 'Константинопольский'
+]
+
+# Rows inserted per transaction while seeding
+SEED_BATCH = 50_000
+
+STAGES = ('query', 'format', 'chunk', 'end_to_end')
+
+# One rendering path: blocking query, line formatting of its rows, and the bot's own async renderer
+RenderPath = namedtuple('RenderPath', ['query', 'format', 'render', 'continuation_header'])
+
+
+def random_user(user_id, is_child):
+    """A user row with a plausible (best_series, total_tens) pair."""
+    series = round(random.gauss(72, 10) if is_child else random.gauss(84, 7))
+    series = max(30, min(100, series))
+    if series >= 93:
+        # Central tens of a pro series
+        tens = random.randint(series - 90, 10)
+    else:
+        # Same bounds as the bot's input check: 10 * tens <= series <= 10 * tens + 9 * (10 - tens)
+        tens = random.randint(max(0, series - 90), series // 10)
+    last_name = random.choice(LAST_NAMES) if random.random() < 0.8 else None
+    username = f'shooter{user_id}' if random.random() < 0.6 else None
+    return (user_id, random.choice(FIRST_NAMES), last_name, username, series, tens)
+
+
+def seed(first_user_id, count, child_share):
+    """Add ``count`` users with consent (a share of them children) to both databases."""
+    from config import DB_PATH, CONSENT_DB_PATH
+    from database import get_manager
+
+    for start in range(first_user_id, first_user_id + count, SEED_BATCH):
+        end = min(start + SEED_BATCH, first_user_id + count)
+        children = [random.random() < child_share for _ in range(start, end)]
+        users = [random_user(user_id, is_child) for user_id, is_child in zip(range(start, end), children)]
+        with get_manager(DB_PATH).write() as conn:
+            conn.executemany('''
+                INSERT INTO user_results (user_id, first_name, last_name, username, best_series, total_tens)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', users)
+        with get_manager(CONSENT_DB_PATH).write() as conn:
+            conn.executemany('''
+                INSERT INTO user_consent (user_id, username, first_name, consent_given, is_child)
+                VALUES (?, ?, ?, 1, ?)
+            ''', [(u[0], u[3], u[1], int(is_child)) for u, is_child in zip(users, children)])
+
+
+def render_paths():
+    """The rendering paths of the bot, by name."""
+    import publish_leaderboard
+    from database import (
+        get_bracket_results, get_child_status_map, BRACKETS, BRACKET_PRO
+    )
+    from database.results_db import iter_all_results, iter_bracket_results
+    from user.leaderboard import _format_row, render_group_leaderboard, render_all_leaderboard
+    from user.admin import format_user_line, user_list_lines, USER_LIST_CONTINUATION
+
+    def suffix(bracket):
+        return 'x' if bracket == BRACKET_PRO else ''
+
+    def format_groups(groups, format_row):
+        return [
+            format_row(position, row, suffix(bracket))
+            for bracket, rows in groups
+            for position, row in enumerate(rows, 1)
+        ]
+
+    paths = {}
+    for bracket in BRACKETS:
+        paths[f'leaderboard[{bracket}]'] = RenderPath(
+            query=lambda b=bracket: [(b, get_bracket_results(b, 50))],
+            format=lambda groups: format_groups(groups, _format_row),
+            render=lambda b=bracket: render_group_leaderboard(b),
+            continuation_header=''
+        )
+    paths['leaderboard_all'] = RenderPath(
+        query=lambda: [(b, get_bracket_results(b, 30)) for b in BRACKETS],
+        format=lambda groups: format_groups(groups, _format_row),
+        render=render_all_leaderboard,
+        continuation_header=''
+    )
+    paths['publish'] = RenderPath(
+        query=lambda: [(b, list(chain.from_iterable(iter_bracket_results(b)))) for b in BRACKETS],
+        format=lambda groups: format_groups(groups, publish_leaderboard._format_table_row),
+        render=lambda: publish_leaderboard.render_publication([]),
+        continuation_header=''
+    )
+    paths['admin_list'] = RenderPath(
+        query=lambda: (list(chain.from_iterable(iter_all_results())), get_child_status_map()),
+        format=lambda result: [
+            format_user_line(position, row, result[1]) for position, row in enumerate(result[0], 1)
+        ],
+        render=user_list_lines,
+        continuation_header=USER_LIST_CONTINUATION
+    )
+    return paths
+
+
+async def run_end_to_end(path):
+    """Run a path as the bot does; chunks are counted, not kept, as if they were sent."""
+    from chunking import iter_chunks
+
+    messages = 0
+    characters = 0
+    async for chunk in iter_chunks(path.render(), continuation_header=path.continuation_header):
+        messages += 1
+        characters += len(chunk)
+    return messages, characters
+
+
+async def bench_path(path, repeat):
+    from chunking import iter_chunks
+
+    timings = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = path.query()
+        timings['query'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        lines = path.format(rows)
+        timings['format'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        chunks = [chunk async for chunk in iter_chunks(lines, continuation_header=path.continuation_header)]
+        timings['chunk'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        messages, characters = await run_end_to_end(path)
+        timings['end_to_end'].append(time.perf_counter() - started)
+
+    # A separate pass for memory, since tracing slows everything down
+    tracemalloc.start()
+    await run_end_to_end(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {f'{stage}_ms': statistics.median(values) * 1000 for stage, values in timings.items()}
+    result.update({
+        'lines': len(lines),
+        'messages': messages,
+        'characters': characters,
+        'chunked_messages': len(chunks),
+        'peak_memory_bytes': peak
+    })
+    return result
+
+
+async def run(args):
+    from database import (
+        create_database, init_consent_db, load_rank_index, bump_results_version,
+        shutdown_db_executor, close_connections
+    )
+    from database.consent_db import load_consent_registry
+
+    create_database()
+    init_consent_db()
+    paths = render_paths()
+    # The bot modules configure INFO logging on import; only warnings matter here
+    logging.getLogger().setLevel(logging.WARNING)
+    selected = {name: path for name, path in paths.items() if not args.paths or name in args.paths}
+
+    report = {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'child_share': args.child_share,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'sizes': {}
+    }
+    seeded = 0
+    try:
+        for size in sorted(args.sizes):
+            # Sizes grow on top of each other
+            started = time.perf_counter()
+            seed(args.first_user_id + seeded, size - seeded, args.child_share)
+            seeded = size
+            load_consent_registry()
+            load_rank_index()
+            bump_results_version()
+            seed_seconds = time.perf_counter() - started
+            print(f'{size} users seeded in {seed_seconds:.1f} s')
+
+            size_report = {'seed_seconds': seed_seconds, 'paths': {}}
+            for name, path in selected.items():
+                result = await bench_path(path, args.repeat)
+                size_report['paths'][name] = result
+                print(
+                    f"  {name:<22}" + ''.join(f"{stage} {result[f'{stage}_ms']:9.1f} ms  " for stage in STAGES)
+                    + f"lines {result['lines']:>8}  messages {result['messages']:>6}  "
+                    f"peak {result['peak_memory_bytes'] / 2**20:7.1f} MiB"
+                )
+            size_report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['sizes'][str(size)] = size_report
+    finally:
+        shutdown_db_executor()
+        close_connections()
+    return report
+
+
+def print_comparison(report, previous):
+    """Print the end-to-end time of every path against a previous report."""
+    print('\nChange against the previous run (end_to_end, new / old):')
+    for size, size_report in report['sizes'].items():
+        old_size = previous.get('sizes', {}).get(size)
+        if not old_size:
+            continue
+        for name, result in size_report['paths'].items():
+            old = old_size['paths'].get(name)
+            if not old or not old['end_to_end_ms']:
+                continue
+            ratio = result['end_to_end_ms'] / old['end_to_end_ms']
+            print(f"  {size:>8} {name:<22} {old['end_to_end_ms']:9.1f} ms -> {result['end_to_end_ms']:9.1f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the leaderboard rendering paths.')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Comma-separated numbers of users to benchmark at')
+    parser.add_argument('--child-share', type=float, default=0.05, help='Share of users who are children')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per path; the median is reported')
+    parser.add_argument('--paths', help='Comma-separated paths to run (default: all)')
+    parser.add_argument('--first-user-id', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the generated users')
+    parser.add_argument('--data-dir', help='Data directory (default: a new temporary directory)')
+    parser.add_argument('--json', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    args.paths = set(args.paths.split(',')) if args.paths else None
+    random.seed(args.seed)
+
+    # The bot's configuration is read from the environment on import
+    os.environ['DATA_DIR'] = args.data_dir or tempfile.mkdtemp(prefix='bench-')
+    os.environ.setdefault('BOT_TOKEN', '123456:BENCH')
+    os.environ.setdefault('CHAT_ID', '-1001000000001')
+    print(f"Data directory: {os.environ['DATA_DIR']}")
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if previous is not None:
+        print_comparison(report, previous)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""Local stand-in for the Telegram Bot API, for end-to-end tests without network.
+
+Implements the methods the bot and the publish script use (getMe, getChat,
+getChatMember, sendMessage, editMessageText, sendDocument, setMyCommands,
+getUpdates and the few calls python-telegram-bot makes on its own) with
+canned answers. Latency, server errors and 429 "Too Many Requests" answers
+can be injected, and Telegram's message limits can be enforced, to see how
+the bot's outbound scheduler and retries behave.
+
+With ``--update-rate`` the server also generates traffic for long polling:
+every fake user sends /start, accepts the consent and then submits results
+and commands.
+
+Example:
+    python tools/fake_bot_api.py --port 8081 --latency-ms 40 --flood-rate 0.01 --users 200 --update-rate 50
+    TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot python src/main.py
+
+Counters are served as JSON at /stats and printed on exit.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import signal
+import sys
+import time
+from collections import defaultdict, deque
+
+import tornado.web
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+from outbound import TokenBucket  # noqa: E402
+from webhook_sender import build_update, COMMANDS  # noqa: E402
+from loadtest import build_callback_update, random_result, BOT_USER  # noqa: E402
+
+# Methods that post a message into a chat and count against Telegram's limits
+MESSAGE_METHODS = ('sendMessage', 'editMessageText', 'sendDocument')
+
+# Methods answered with a plain True
+TRUE_METHODS = (
+    'setMyCommands', 'deleteMyCommands', 'answerCallbackQuery',
+    'setWebhook', 'deleteWebhook', 'close', 'logOut'
+)
+
+
+class FakeBotApi:
+    """State and behaviour of the fake Bot API server."""
+
+    def __init__(self, args):
+        self.args = args
+        self.calls = defaultdict(int)
+        self.statuses = defaultdict(int)
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._updates = deque()
+        self._new_updates = asyncio.Event()
+        self._user_steps = defaultdict(int)
+        self._closing = False
+        self._global_bucket = TokenBucket(30, 1)
+        self._group_buckets = {}
+        self.generated = 0
+
+    # --- answers -----------------------------------------------------------
+
+    def _message(self, params, **extra):
+        chat_id = int(params.get('chat_id', 0))
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup'},
+            'from': BOT_USER
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        message.update(extra)
+        return message
+
+    def _is_member(self, user_id):
+        return (user_id % 100) >= self.args.non_member_share * 100
+
+    def _result(self, method, params):
+        """Return (found, result) for a successful call."""
+        if method == 'getMe':
+            return True, BOT_USER
+        if method == 'getChat':
+            chat_id = int(params['chat_id'])
+            return True, {'id': chat_id, 'type': 'supergroup', 'title': f'Группа {chat_id}'}
+        if method == 'getChatMember':
+            user_id = int(params['user_id'])
+            status = 'member' if self._is_member(user_id) else 'left'
+            return True, {'status': status, 'user': {'id': user_id, 'is_bot': False, 'first_name': str(user_id)}}
+        if method in ('sendMessage', 'editMessageText'):
+            return True, self._message(params)
+        if method == 'sendDocument':
+            document = {'file_id': f'doc{next(self._message_ids)}', 'file_unique_id': 'doc', 'file_name': 'document'}
+            return True, self._message(params, document=document, caption=params.get('caption', ''))
+        if method in TRUE_METHODS:
+            return True, True
+        return False, None
+
+    # --- injected failures -------------------------------------------------
+
+    def _limit_delay(self, params):
+        """Seconds until Telegram would accept another message, 0 if it accepts one now."""
+        delay = self._global_bucket.delay()
+        chat_id = int(params.get('chat_id', 0))
+        group_bucket = None
+        if chat_id < 0:
+            group_bucket = self._group_buckets.setdefault(chat_id, TokenBucket(20, 60))
+            delay = max(delay, group_bucket.delay())
+        if delay == 0:
+            self._global_bucket.take()
+            if group_bucket is not None:
+                group_bucket.take()
+        return delay
+
+    @staticmethod
+    def _error(code, description, retry_after=None):
+        body = {'ok': False, 'error_code': code, 'description': description}
+        if retry_after is not None:
+            body['parameters'] = {'retry_after': retry_after}
+        return code, body
+
+    # --- dispatch ----------------------------------------------------------
+
+    async def call(self, method, params):
+        """Answer one Bot API request. Returns (HTTP status, JSON body)."""
+        self.calls[method] += 1
+        if method == 'getUpdates':
+            status, body = 200, {'ok': True, 'result': await self._get_updates(params)}
+        else:
+            status, body = await self._call(method, params)
+        self.statuses[status] += 1
+        return status, body
+
+    async def _call(self, method, params):
+        latency = random.uniform(
+            max(0.0, self.args.latency_ms - self.args.jitter_ms),
+            self.args.latency_ms + self.args.jitter_ms
+        )
+        if latency:
+            await asyncio.sleep(latency / 1000)
+
+        if random.random() < self.args.error_rate:
+            return self._error(502, 'Bad Gateway')
+        if random.random() < self.args.flood_rate:
+            return self._error(429, f'Too Many Requests: retry after {self.args.retry_after}', self.args.retry_after)
+        if self.args.enforce_limits and method in MESSAGE_METHODS:
+            delay = self._limit_delay(params)
+            if delay > 0:
+                retry_after = math.ceil(delay)
+                return self._error(429, f'Too Many Requests: retry after {retry_after}', retry_after)
+
+        found, result = self._result(method, params)
+        if not found:
+            return self._error(404, 'Not Found')
+        return 200, {'ok': True, 'result': result}
+
+    async def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        # Updates below the offset were confirmed by the client
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0 and not self._closing:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+    # --- generated traffic -------------------------------------------------
+
+    def _next_update(self):
+        """The next update of a random fake user: /start, consent, then results and commands."""
+        user_id = self.args.first_user_id + random.randrange(self.args.users)
+        step = self._user_steps[user_id]
+        self._user_steps[user_id] += 1
+        update_id = next(self._update_ids)
+        if step == 0:
+            return build_update(update_id, user_id, '/start')
+        if step == 1:
+            return build_callback_update(update_id, user_id, 'agree')
+        if random.random() < self.args.command_share:
+            return build_update(update_id, user_id, random.choice(COMMANDS))
+        return build_update(update_id, user_id, random_result())
+
+    async def generate_updates(self):
+        """Queue synthetic updates at ``update_rate`` per second for getUpdates."""
+        tick = 0.01
+        owed = 0.0
+        while not self.args.max_updates or self.generated < self.args.max_updates:
+            owed += self.args.update_rate * tick
+            while owed >= 1 and (not self.args.max_updates or self.generated < self.args.max_updates):
+                self._updates.append(self._next_update())
+                self.generated += 1
+                owed -= 1
+            self._new_updates.set()
+            await asyncio.sleep(tick)
+
+    def close(self):
+        """Release pending long polls so the server can stop."""
+        self._closing = True
+        self._new_updates.set()
+
+    def stats(self):
+        return {
+            'calls': dict(self.calls),
+            'statuses': {str(code): count for code, count in self.statuses.items()},
+            'updates_generated': self.generated,
+            'updates_pending': len(self._updates)
+        }
+
+
+class BotApiHandler(tornado.web.RequestHandler):
+    """Serves /bot<token>/<method> like api.telegram.org."""
+
+    def initialize(self, api):
+        self.api = api
+
+    def _params(self):
+        if self.request.headers.get('Content-Type', '').startswith('application/json') and self.request.body:
+            return json.loads(self.request.body)
+        params = {}
+        arguments = dict(self.request.query_arguments)
+        arguments.update(self.request.body_arguments)
+        for name, values in arguments.items():
+            value = values[-1].decode('utf-8')
+            # python-telegram-bot sends non-string values JSON-encoded
+            try:
+                params[name] = json.loads(value)
+            except ValueError:
+                params[name] = value
+        for name in self.request.files:
+            params[name] = 'file'
+        return params
+
+    async def post(self, token, method):
+        status, body = await self.api.call(method, self._params())
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps(body))
+
+    get = post
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    def initialize(self, api):
+        self.api = api
+
+    def get(self):
+        self.finish(self.api.stats())
+
+
+async def run(args):
+    api = FakeBotApi(args)
+    app = tornado.web.Application([
+        (r'/bot([^/]+)/([A-Za-z]+)', BotApiHandler, {'api': api}),
+        (r'/stats', StatsHandler, {'api': api})
+    ])
+    server = app.listen(args.port, address=args.host)
+    print(f'Fake Bot API listening on http://{args.host}:{args.port}/bot (stats at /stats)')
+    generator = asyncio.create_task(api.generate_updates()) if args.update_rate > 0 else None
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    if generator is not None:
+        generator.cancel()
+    server.stop()
+    api.close()
+    await asyncio.sleep(0.1)  # let the released long polls finish
+    print(json.dumps(api.stats(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a fake Telegram Bot API for offline end-to-end tests.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Mean delay of every answer')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random spread around the mean delay')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of calls answered with 502 Bad Gateway')
+    parser.add_argument('--flood-rate', type=float, default=0, help='Share of calls answered with 429 Too Many Requests')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after of injected 429 answers (seconds)')
+    parser.add_argument('--enforce-limits', action='store_true',
+                        help="Answer 429 beyond Telegram's limits of 30 messages/s and 20 messages/min per group")
+    parser.add_argument('--non-member-share', type=float, default=0, help='Share of users that are not group members')
+    parser.add_argument('--users', type=int, default=100, help='Number of fake users sending updates')
+    parser.add_argument('--first-user-id', type=int, default=10_000_000)
+    parser.add_argument('--update-rate', type=float, default=0, help='Updates per second queued for getUpdates')
+    parser.add_argument('--max-updates', type=int, default=0, help='Stop generating after this many updates (0 = no limit)')
+    parser.add_argument('--command-share', type=float, default=0.2, help='Share of generated updates that are commands')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""Offline load test that drives the bot's real handlers with synthetic updates.
+
+The application is built by ``main.build_application()``, so updates go
+through the same handler graph, per-user ordering and write-behind queue as
+in production. Bot API calls are answered by a stub request object instead of
+Telegram, and the databases live in a throwaway data directory, so nothing
+leaves the machine.
+
+Every fake user first sends /start and accepts the consent. Then a mix of
+result submissions, /status and /leaderboard is processed with the requested
+concurrency. Throughput and p50/p95/p99 latency are reported per handler.
+
+Example:
+    python tools/loadtest.py --users 500 --updates 20000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+
+# Share of each synthetic update in the mixed phase, by handler
+DEFAULT_MIX = {'result': 0.7, 'status': 0.2, 'leaderboard': 0.1}
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}
+
+# Group every fake user belongs to
+GROUP_ID = -1001000000001
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(share * len(sorted_values)))
+    return sorted_values[index]
+
+
+def make_stub_request(latency_ms):
+    """Create a request object that answers Bot API calls locally."""
+    from telegram.request import BaseRequest
+
+    class StubRequest(BaseRequest):
+        """Canned Bot API responses with an optional simulated round trip."""
+
+        def __init__(self):
+            self.calls = defaultdict(int)
+            self._message_ids = iter(range(1, 1 << 62))
+
+        @property
+        def read_timeout(self):
+            return None
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        def _message(self, params):
+            chat_id = int(params.get('chat_id', 0))
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup'},
+                'from': BOT_USER,
+                'text': params.get('text', '')
+            }
+
+        def _result(self, endpoint, params):
+            if endpoint == 'getMe':
+                return BOT_USER
+            if endpoint.startswith('send') or endpoint.startswith('edit'):
+                return self._message(params)
+            if endpoint == 'getChatMember':
+                user_id = int(params['user_id'])
+                return {'status': 'member', 'user': {'id': user_id, 'is_bot': False, 'first_name': str(user_id)}}
+            if endpoint == 'getChat':
+                return {'id': int(params['chat_id']), 'type': 'supergroup', 'title': 'Load test group'}
+            return True
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None,
+                             write_timeout=None, connect_timeout=None, pool_timeout=None):
+            endpoint = url.rsplit('/', 1)[-1]
+            self.calls[endpoint] += 1
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+            params = request_data.parameters if request_data is not None else {}
+            body = {'ok': True, 'result': self._result(endpoint, params)}
+            return 200, json.dumps(body).encode('utf-8')
+
+    return StubRequest()
+
+
+def build_callback_update(update_id, user_id, data):
+    """Build the JSON body of an inline button press in a private chat."""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'Стрелок {user_id}', 'username': f'shooter{user_id}'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': 'consent'
+            }
+        }
+    }
+
+
+def random_result():
+    """A submission that passes the bot's input checks."""
+    total_tens = random.randint(0, 10)
+    if random.random() < 0.2:
+        return f'{random.randint(93, 100)} {total_tens}'
+    low = total_tens * 10
+    high = min(92, total_tens * 10 + (10 - total_tens) * 9)
+    if low > high:
+        return f'{random.randint(93, 100)} {total_tens}'
+    return f'{random.randint(low, high)} {total_tens}'
+
+
+async def run(args):
+    # Imported here: config reads the environment prepared in main() on import
+    from telegram import Update
+    from webhook_sender import build_update
+    import main as bot
+    from database import write_queue, shutdown_db_executor, close_connections
+
+    # The handlers log every update at INFO level
+    logging.getLogger().setLevel(args.log_level)
+
+    bot.create_database()
+    bot.init_consent_db()
+    bot.init_membership_db()
+    bot.load_rank_index()
+
+    request = make_stub_request(args.api_latency_ms)
+    application = bot.build_application(request=request, paced=args.paced)
+
+    errors = defaultdict(int)
+
+    async def count_error(update, context):
+        errors[type(context.error).__name__] += 1
+
+    application.add_error_handler(count_error)
+
+    latencies = defaultdict(list)
+    update_ids = iter(range(1, 1 << 62))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def feed(label, body):
+        async with semaphore:
+            update = Update.de_json(body, application.bot)
+            started = time.perf_counter()
+            # Queued per user like updates from Telegram
+            await application.dispatch(update)
+            latencies[label].append(time.perf_counter() - started)
+
+    async def phase(items):
+        started = time.perf_counter()
+        await asyncio.gather(*(feed(label, body) for label, body in items))
+        return time.perf_counter() - started
+
+    users = [args.first_user_id + i for i in range(args.users)]
+    labels = list(args.mix)
+    weights = [args.mix[label] for label in labels]
+
+    def mixed_update(user_id):
+        label = random.choices(labels, weights)[0]
+        text = random_result() if label == 'result' else f'/{label}'
+        return label, build_update(next(update_ids), user_id, text)
+
+    phase_seconds = {}
+    write_queue.start()
+    await application.initialize()
+    # Running, so the per-user tasks are tracked like in production
+    await application.start()
+    try:
+        # Consent first, so the mixed phase exercises the full submission path
+        phase_seconds['start'] = await phase(
+            [('start', build_update(next(update_ids), user_id, '/start')) for user_id in users]
+        )
+        phase_seconds['consent'] = await phase(
+            [('consent', build_callback_update(next(update_ids), user_id, 'agree')) for user_id in users]
+        )
+        mixed = [mixed_update(random.choice(users)) for _ in range(args.updates)]
+        phase_seconds['mixed'] = mixed_seconds = await phase(mixed)
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await write_queue.drain()
+        shutdown_db_executor()
+        close_connections()
+
+    report = {
+        'users': args.users,
+        'updates': args.updates,
+        'concurrency': args.concurrency,
+        'paced': args.paced,
+        'api_latency_ms': args.api_latency_ms,
+        'phase_seconds': phase_seconds,
+        'mixed_seconds': mixed_seconds,
+        'updates_per_second': args.updates / mixed_seconds if mixed_seconds else 0.0,
+        'write_batches': write_queue.batches,
+        'api_calls': dict(request.calls),
+        'errors': dict(errors),
+        'handlers': {}
+    }
+    # Throughput of a handler: its updates over the duration of the phase it ran in
+    for label, values in latencies.items():
+        values.sort()
+        seconds = phase_seconds.get(label, mixed_seconds)
+        report['handlers'][label] = {
+            'count': len(values),
+            'per_second': len(values) / seconds if seconds else 0.0,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': values[-1] * 1000
+        }
+    return report
+
+
+def print_report(report):
+    print(
+        f"{report['updates']} mixed updates from {report['users']} users in {report['mixed_seconds']:.2f} s "
+        f"({report['updates_per_second']:.0f} updates/s, concurrency {report['concurrency']}, "
+        f"{'paced' if report['paced'] else 'unpaced'}, API latency {report['api_latency_ms']} ms)"
+    )
+    print(f"{'handler':<12}{'count':>8}{'per s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, stats in report['handlers'].items():
+        print(
+            f"{label:<12}{stats['count']:>8}{stats['per_second']:>10.0f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        )
+    print(f"Write batches: {report['write_batches']}")
+    print('Bot API calls: ' + ', '.join(f'{name}: {count}' for name, count in sorted(report['api_calls'].items())))
+    if report['errors']:
+        print('Handler errors: ' + ', '.join(f'{name}: {count}' for name, count in sorted(report['errors'].items())))
+
+
+def parse_mix(value):
+    """Parse a mix such as result=0.7,status=0.2,leaderboard=0.1."""
+    mix = {}
+    for part in value.split(','):
+        label, _, share = part.partition('=')
+        if label not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'unknown handler {label!r}, expected one of {", ".join(DEFAULT_MIX)}')
+        mix[label] = float(share)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the bot handlers with synthetic updates, offline.')
+    parser.add_argument('--users', type=int, default=200, help='Number of distinct fake users')
+    parser.add_argument('--updates', type=int, default=5000, help='Updates in the mixed phase')
+    parser.add_argument('--concurrency', type=int, default=32, help='Updates processed at once')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Shares of the mixed phase, e.g. result=0.7,status=0.2,leaderboard=0.1')
+    parser.add_argument('--api-latency-ms', type=float, default=0, help='Simulated Bot API round trip')
+    parser.add_argument('--paced', action='store_true', help='Keep the outbound rate limiter (30 messages/s)')
+    parser.add_argument('--first-user-id', type=int, default=10_000_000)
+    parser.add_argument('--data-dir', help='Data directory (default: a new temporary directory)')
+    parser.add_argument('--json', help='Also write the report as JSON to this file')
+    parser.add_argument('--log-level', default='WARNING', help='Log level of the bot while the test runs')
+    parser.add_argument('--seed', type=int, help='Random seed for a repeatable update mix')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # The bot's configuration is read from the environment on import
+    os.environ['DATA_DIR'] = args.data_dir or tempfile.mkdtemp(prefix='loadtest-')
+    os.environ['CHAT_ID'] = str(GROUP_ID)
+    os.environ.setdefault('BOT_TOKEN', '123456:LOADTEST')
+    os.environ['BACKUP_INTERVAL_HOURS'] = '0'
+    os.environ['UPDATE_CONCURRENCY'] = str(args.concurrency)
+    print(f"Data directory: {os.environ['DATA_DIR']}")
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
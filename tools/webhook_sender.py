@@ -0,0 +1,149 @@
+"""Stand-in for Telegram that posts synthetic updates to the bot's webhook listener.
+
+Used to load-test webhook mode offline: it sends private text messages (result
+submissions and commands) from a pool of fake users, with the secret token
+header Telegram would send, and reports response codes and latency.
+
+The bot registers its webhook with setWebhook on start, so offline runs point
+it at tools/fake_bot_api.py. Without WEBHOOK_SECRET_TOKEN the secret the bot
+generated is read from DATA_DIR/webhook_secret; use the same DATA_DIR.
+
+Example:
+    python tools/fake_bot_api.py --port 8081
+    BOT_MODE=webhook WEBHOOK_URL=https://bot.example.com TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot python src/main.py
+    python tools/webhook_sender.py --updates 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+
+import httpx
+
+# Reuse the bot's configuration for the listener address and secret token
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, WEBHOOK_SECRET_FILE  # noqa: E402
+
+
+
+def default_secret():
+    """The bot's secret: WEBHOOK_SECRET_TOKEN, else the one it generated for this run."""
+    if WEBHOOK_SECRET_TOKEN:
+        return WEBHOOK_SECRET_TOKEN
+    try:
+        with open(WEBHOOK_SECRET_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Texts the fake users send, weighted towards result submissions
+COMMANDS = ['/status', '/leaderboard', '/leaderboard_all', '/help']
+
+
+def build_update(update_id, user_id, text):
+    """Build the JSON body of a private text message update."""
+    user = {
+        'id': user_id,
+        'is_bot': False,
+        'first_name': f'Стрелок {user_id}',
+        'username': f'shooter{user_id}',
+        'language_code': 'ru'
+    }
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+        'from': user,
+        'text': text
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return {'update_id': update_id, 'message': message}
+
+
+def random_text(command_share):
+    if random.random() < command_share:
+        return random.choice(COMMANDS)
+    return f'{random.randint(60, 100)} {random.randint(0, 10)}'
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(share * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def run(args):
+    url = args.url or f'http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}'
+    headers = {}
+    if args.secret:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = args.secret
+
+    update_ids = itertools.count(args.first_update_id)
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for _ in range(args.updates):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            user_id = args.first_user_id + random.randrange(args.users)
+            body = build_update(next(update_ids), user_id, random_text(args.command_share))
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=body, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'Sent {args.updates} updates to {url} in {elapsed:.2f} s ({args.updates / elapsed:.0f} updates/s)')
+    print('Responses: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+    print(
+        'Latency ms: '
+        f'p50 {percentile(latencies, 0.50) * 1000:.1f}, '
+        f'p95 {percentile(latencies, 0.95) * 1000:.1f}, '
+        f'p99 {percentile(latencies, 0.99) * 1000:.1f}, '
+        f'max {latencies[-1] * 1000 if latencies else 0:.1f}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Post synthetic Telegram updates to the webhook listener.')
+    parser.add_argument('--url', help='Webhook URL (default: local listener from the bot configuration)')
+    parser.add_argument('--secret', default=default_secret(),
+                        help='Secret token header value (default: WEBHOOK_SECRET_TOKEN, else the secret '
+                             'the bot generated in DATA_DIR/webhook_secret)')
+    parser.add_argument('--updates', type=int, default=1000, help='Number of updates to send')
+    parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+    parser.add_argument('--users', type=int, default=500, help='Number of distinct fake users')
+    parser.add_argument('--first-user-id', type=int, default=10_000_000)
+    parser.add_argument('--first-update-id', type=int, default=1)
+    parser.add_argument('--command-share', type=float, default=0.2, help='Share of updates that are commands')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()